@@ -1,3 +1,38 @@
+import os
+
 DB_PATH = "netfx.db"
 WINDOW_TITLE = "NetFX Onboarding Tool"
 WINDOW_SIZE = "1100x700"
+# number of read-only connections; 0 = single shared connection
+DB_POOL_SIZE = 0
+# seconds a connection waits on a locked database before raising
+DB_BUSY_TIMEOUT = 5.0
+# rows per executemany() batch in the bulk insert APIs
+BULK_CHUNK_SIZE = 500
+# rows fetched per page by the paginated list views
+PAGE_SIZE = 500
+# rows per fetchmany() call in the streaming iter_* reads
+ITER_BATCH_SIZE = 256
+# entries in DBManager's read-through query cache; 0 disables it
+DB_CACHE_SIZE = 2048
+# record per-method / per-SQL timings for DBManager.stats(); off by default,
+# NETFX_DB_STATS=1 in the environment (or main.py --stats) turns it on
+DB_STATS = os.environ.get("NETFX_DB_STATS", "").strip().lower() in ("1", "true", "yes", "on")
+# statements slower than this (ms) go to the slow-query log with their plan
+DB_SLOW_QUERY_MS = 50.0
+# directory for online snapshots of the database (db.backup)
+BACKUP_DIR = "backups"
+# snapshots kept per database; older ones are deleted after each snapshot
+BACKUP_KEEP = 10
+# database pages copied per backup step, with the writer lock held
+BACKUP_PAGES = 256
+# seconds the backup sleeps between steps so writers are not starved
+BACKUP_PAUSE = 0.005
+# minutes between automatic snapshots while the app runs; 0 = off
+BACKUP_INTERVAL = 0
+# serve reads from an in-memory copy of the database (db.replica)
+DB_REPLICA = False
+# report results kept per DBManager (db.reports); each is a full result set
+REPORT_CACHE_SIZE = 16
+# seconds closing the app waits for a cancelled export to clean up its .part file
+EXPORT_CLOSE_TIMEOUT = 5.0
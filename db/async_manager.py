@@ -0,0 +1,219 @@
+# db/async_manager.py
+"""Asyncio facade over DBManager.
+
+    adb = AsyncDBManager(readers=4)
+    clients = await adb.fetch_all_clients()
+    rid = await adb.insert_ratesheet(sds, None, '2025-01-01', None, 'Rates: A')
+    await adb.close()
+
+Reads run on a thread pool sized to the connection pool's readers, each
+on its own connection, so a slow read does not hold up the event loop or
+the other reads. Writes run on one dedicated thread in the order they were
+called. Cancelling an awaiting task drops a job that has not started yet.
+A running job is interrupted at its next SQLite progress check (a write's
+transaction then rolls back); the check is only installed on the
+connections a job borrows, while it holds them.
+
+    python -m db.async_manager [--db PATH] [--readers N] [--requests N]
+
+benchmarks sequential against concurrent reads. Concurrent reads only
+finish sooner with cores to spare: on one CPU the two are level.
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_PATH
+from .db_manager import DBManager
+
+# VM instructions between cancellation checks
+PROGRESS_STEPS = 1000
+
+READ_METHODS = (
+    'fetch_all_clients', 'fetch_client_by_sds', 'fetch_client_summaries',
+    'fetch_merchants_by_client', 'fetch_all_merchants', 'fetch_merchant_by_id', 'fetch_merchant_by_name',
+    'fetch_ratesheets_by_client', 'fetch_all_ratesheets', 'fetch_ratesheets_by_merchant', 'fetch_ratesheet_by_id',
+    'fetch_merchants_page', 'fetch_ratesheets_page', 'fetch_merchants_by_ids', 'fetch_ratesheets_by_ids',
+    'estimate_count', 'search', 'report',
+    'active_ratesheet', 'active_ratesheets',
+    'fetch_rate_tiers', 'price_batch', 'fetch_ratesheet_rates', 'cross_rate', 'cross_rates',
+    'fetch_limits', 'check_limits',
+    'fetch_intermediaries', 'fetch_intermediary', 'fetch_intermediary_links',
+    'merchants_via_intermediary', 'intermediary_routes', 'intermediary_path',
+    'changes_since', 'latest_change_seq',
+    'stats', 'cache_stats',
+)
+WRITE_METHODS = (
+    'insert_client', 'update_client', 'delete_client', 'insert_clients',
+    'insert_merchant', 'update_merchant', 'delete_merchant', 'insert_merchants',
+    'insert_ratesheet', 'update_ratesheet', 'delete_ratesheet', 'insert_ratesheets',
+    'insert_rate_tier', 'insert_rate_tiers', 'update_rate_tier', 'delete_rate_tier',
+    'set_ratesheet_rate', 'set_ratesheet_rates', 'set_limit', 'delete_limit', 'record_trades',
+    'insert_intermediary', 'update_intermediary', 'delete_intermediary',
+    'insert_intermediary_link', 'delete_intermediary_link',
+    'compact_changes', 'recount_active_ratesheets', 'seed_sample_data',
+)
+
+_job = threading.local()
+
+
+def _cancel_requested():
+    flag = getattr(_job, 'cancel', None)
+    return 1 if flag is not None and flag.is_set() else 0
+
+
+class AsyncDBManager:
+    """Awaitable DBManager. Wraps `db` if given, else opens one with
+    `readers` pooled read connections (kwargs go to DBManager)."""
+    def __init__(self, path=None, readers=4, db=None, max_pending=None, **kwargs):
+        if db is None:
+            db = DBManager(path or DB_PATH, pool_size=readers, **kwargs)
+            self._owns_db = True
+        else:
+            self._owns_db = False
+        self.db = db
+        # without pooled readers every read takes the writer lock anyway
+        workers = max(1, db.pool.size)
+        self._reads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db-read')
+        self._writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        # bounds queued reads so a flood of callers gets back-pressure
+        self._max_pending = max_pending or workers * 4
+        self._read_slots = None
+
+    # ---- plumbing ----
+    def _submit(self, executor, fn, args, kwargs):
+        """Queue fn on `executor` now; returns an awaitable for its result."""
+        loop = asyncio.get_running_loop()
+        flag = threading.Event()
+
+        def job():
+            if flag.is_set():
+                raise asyncio.CancelledError()
+            _job.cancel = flag
+            try:
+                # only the connections this job borrows check for cancellation
+                with self.db.pool.progress_handler(_cancel_requested, PROGRESS_STEPS):
+                    return fn(self.db, *args, **kwargs)
+            finally:
+                _job.cancel = None
+
+        return self._wait(loop.run_in_executor(executor, job), flag)
+
+    @staticmethod
+    async def _wait(future, flag):
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # not started: the executor drops it; running: the progress
+            # handler interrupts its current statement
+            flag.set()
+            raise
+
+    async def run_read(self, fn, *args, **kwargs):
+        """Run fn(db, *args, **kwargs) on a read worker."""
+        if self._read_slots is None:
+            self._read_slots = asyncio.Semaphore(self._max_pending)
+        async with self._read_slots:
+            return await self._submit(self._reads, fn, args, kwargs)
+
+    def run_write(self, fn, *args, **kwargs):
+        """Run fn(db, *args, **kwargs) on the writer thread.
+
+        Queued at call time, not at first await, so writes execute in the
+        order they were called. fn may open db.transaction() to group
+        several writes into one commit.
+        """
+        return self._submit(self._writes, fn, args, kwargs)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._writes.shutdown(wait=True)
+        self._reads.shutdown(wait=True)
+        if self._owns_db:
+            self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def _read_method(name):
+    fn = getattr(DBManager, name)
+
+    async def method(self, *args, **kwargs):
+        return await self.run_read(fn, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = f"Awaitable DBManager.{name}()."
+    return method
+
+
+def _write_method(name):
+    fn = getattr(DBManager, name)
+
+    def method(self, *args, **kwargs):
+        return self.run_write(fn, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = f"Awaitable DBManager.{name}(), run in call order."
+    return method
+
+
+for _name in READ_METHODS:
+    setattr(AsyncDBManager, _name, _read_method(_name))
+for _name in WRITE_METHODS:
+    setattr(AsyncDBManager, _name, _write_method(_name))
+
+
+# ---- benchmark ----
+async def _bench(adb, requests):
+    db = adb.db
+    with db.pool.read() as conn:
+        names = [r[0] for r in conn.execute(
+            "SELECT entity_name FROM clients ORDER BY random() LIMIT ?", (requests,))]
+    if not names:
+        raise SystemExit("no clients to search; seed or import data first")
+    # first and last words of real names: selective multi-term FTS queries
+    # whose cost is inside SQLite, which runs without the GIL
+    queries = []
+    for i in range(requests):
+        words = names[i % len(names)].split()
+        queries.append(f"{words[0]} {words[-1][:3]}" if len(words) > 1 else words[0])
+
+    start = time.perf_counter()
+    for q in queries:
+        await adb.search(q, limit=50)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(adb.search(q, limit=50) for q in queries))
+    concurrent = time.perf_counter() - start
+    return sequential, concurrent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.async_manager")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AsyncDBManager(args.db, readers=args.readers, cache_size=0, stats=False) as adb:
+            return await _bench(adb, args.requests)
+
+    sequential, concurrent = asyncio.run(run())
+    print(f"[bench] {args.requests} searches, {args.readers} readers, {os.cpu_count()} CPU(s)")
+    print(f"[bench] sequential: {sequential * 1000:.1f} ms ({args.requests / sequential:.0f}/s)")
+    print(f"[bench] concurrent: {concurrent * 1000:.1f} ms ({args.requests / concurrent:.0f}/s), "
+          f"{sequential / concurrent:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
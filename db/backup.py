@@ -0,0 +1,250 @@
+# db/backup.py
+"""Online snapshots of the database.
+
+    backups = BackupManager(db)
+    info = backups.snapshot()           # backups/netfx-20250101-120000.db
+    backups.start(interval=60)          # every hour, on a daemon thread
+    backups.restore(backups.snapshots()[0])
+
+Snapshots go through SQLite's online backup API in page batches (see
+ConnectionPool.backup), so the app keeps working while one runs. Each is
+written to a .part file and renamed when complete. Only the newest `keep`
+are retained.
+
+    python -m db.backup snapshot|list|restore|schedule [--db PATH] [--dir DIR] ...
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from config import DB_PATH, BACKUP_DIR, BACKUP_KEEP, BACKUP_PAGES, BACKUP_PAUSE
+
+
+class ProgressPrinter:
+    """progress(remaining, total) callback printing percent done and
+    throughput at most every `every` seconds."""
+    def __init__(self, label, page_size, every=0.5):
+        self.label = label
+        self.page_size = page_size
+        self.every = every
+        self._start = time.perf_counter()
+        self._last = 0.0
+
+    def __call__(self, remaining, total):
+        now = time.perf_counter()
+        if remaining and now - self._last < self.every:
+            return
+        self._last = now
+        done = total - remaining
+        elapsed = max(now - self._start, 1e-9)
+        print(f"[backup] {self.label}: {done * 100 // max(total, 1)}% ({done}/{total} pages, "
+              f"{done * self.page_size / elapsed / 1e6:.1f} MB/s)")
+
+
+class BackupManager:
+    """Snapshots, retention and restore for one DBManager."""
+    def __init__(self, db, directory=BACKUP_DIR, keep=BACKUP_KEEP, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+        self.db = db
+        self.directory = Path(directory)
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self._stop = None
+        self._thread = None
+        self._lock = threading.Lock()   # one snapshot or restore at a time
+
+    @property
+    def _stem(self):
+        return self.db.path.stem or 'db'
+
+    def _page_size(self):
+        with self.db.pool.read() as conn:
+            return conn.execute("PRAGMA page_size").fetchone()[0]
+
+    # ---- snapshots ----
+    def snapshot(self, label=None, progress=None):
+        """Write a consistent copy of the database to the backup directory.
+        Returns a dict with path, pages, bytes, seconds and mb_per_s."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            name = f"{self._stem}-{stamp}{'-' + label if label else ''}.db"
+            path = self.directory / name
+            n = 1
+            while path.exists():
+                n += 1
+                path = self.directory / name.replace('.db', f'-{n}.db')
+            part = path.with_name(path.name + '.part')
+            page_size = self._page_size()
+            if progress is None:
+                progress = ProgressPrinter(path.name, page_size)
+            copied = [0]
+
+            def report(remaining, total):
+                copied[0] = total
+                progress(remaining, total)
+
+            start = time.perf_counter()
+            target = sqlite3.connect(part)
+            try:
+                self.db.pool.backup(target, pages=self.pages, pause=self.pause, progress=report)
+                # a self-contained file, whatever the live journal mode is
+                target.execute("PRAGMA journal_mode = DELETE")
+            except BaseException:
+                target.close()
+                part.unlink(missing_ok=True)
+                raise
+            target.close()
+            os.replace(part, path)
+            seconds = time.perf_counter() - start
+        size = path.stat().st_size
+        info = {
+            'path': str(path),
+            'pages': copied[0],
+            'bytes': size,
+            'seconds': round(seconds, 3),
+            'mb_per_s': round(size / max(seconds, 1e-9) / 1e6, 1),
+        }
+        print(f"[backup] wrote {path} ({size / 1e6:.1f} MB in {seconds:.2f}s, {info['mb_per_s']} MB/s)")
+        self.prune()
+        return info
+
+    def snapshots(self):
+        """Snapshot files of this database, newest first."""
+        if not self.directory.is_dir():
+            return []
+        found = [p for p in self.directory.glob(f"{self._stem}-*.db") if p.is_file()]
+        return sorted(found, key=lambda p: (p.stat().st_mtime, p.name), reverse=True)
+
+    def prune(self):
+        """Delete all but the newest `keep` snapshots; returns the removed paths."""
+        if not self.keep:
+            return []
+        removed = self.snapshots()[self.keep:]
+        for p in removed:
+            p.unlink(missing_ok=True)
+            print(f"[backup] pruned {p}")
+        return removed
+
+    # ---- restore ----
+    def restore(self, snapshot, progress=None, safety=True):
+        """Replace the live database with `snapshot`.
+
+        The snapshot is integrity-checked first and, with `safety`, the
+        current state is snapshotted before it is overwritten. Caches are
+        dropped and migrations re-applied afterwards, so an older snapshot
+        is brought up to the current schema.
+        """
+        snapshot = Path(snapshot)
+        source = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+        try:
+            check = source.execute("PRAGMA quick_check").fetchone()[0]
+            if check != 'ok':
+                raise ValueError(f"{snapshot} failed integrity check: {check}")
+            if safety:
+                self.snapshot(label='pre-restore')
+            page_size = source.execute("PRAGMA page_size").fetchone()[0]
+            if progress is None:
+                progress = ProgressPrinter(f"restore {snapshot.name}", page_size)
+            with self._lock:
+                self.db.pool.restore(source, progress=progress)
+        finally:
+            source.close()
+        self.db.reset_caches()
+        self.db.ensure_schema()
+        print(f"[backup] restored {self.db.path} from {snapshot}")
+
+    # ---- schedule ----
+    def start(self, interval):
+        """Take a snapshot every `interval` minutes on a daemon thread."""
+        if self._thread is not None:
+            return self
+        self._stop = threading.Event()
+
+        def run(stop=self._stop):
+            while not stop.wait(interval * 60):
+                try:
+                    # daily counts go stale at midnight; the snapshot gets fresh ones
+                    self.db.recount_active_ratesheets()
+                    self.snapshot(progress=lambda remaining, total: None)
+                except Exception as ex:
+                    print(f"[backup] scheduled snapshot failed: {ex}")
+
+        self._thread = threading.Thread(target=run, name='db-backup', daemon=True)
+        self._thread.start()
+        print(f"[backup] snapshots every {interval} min to {self.directory}")
+        return self
+
+    def stop(self, wait=True):
+        """Stop the schedule; with `wait`, let a snapshot in progress finish."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        if wait:
+            self._thread.join()
+        self._thread = None
+
+
+def _restore_offline(path, snapshot):
+    # no manager: the target may be from another schema version, and the
+    # app must not have it open
+    source = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    target = sqlite3.connect(path)
+    try:
+        check = source.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            raise SystemExit(f"{snapshot} failed integrity check: {check}")
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        printer = ProgressPrinter(f"restore {Path(snapshot).name}", page_size)
+        source.backup(target, pages=BACKUP_PAGES, progress=lambda status, remaining, total: printer(remaining, total))
+    finally:
+        target.close()
+        source.close()
+    print(f"[backup] restored {path} from {snapshot}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.backup")
+    parser.add_argument("command", choices=("snapshot", "list", "restore", "schedule"))
+    parser.add_argument("snapshot", nargs="?", help="snapshot file (restore)")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="backup directory (default: %(default)s)")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    parser.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages per step")
+    parser.add_argument("--pause", type=float, default=BACKUP_PAUSE, help="seconds between steps")
+    parser.add_argument("--interval", type=float, default=60, help="minutes between snapshots (schedule)")
+    args = parser.parse_args(argv)
+
+    if args.command == "restore":
+        if not args.snapshot:
+            parser.error("restore needs a snapshot file")
+        _restore_offline(args.db, args.snapshot)
+        return 0
+
+    from .db_manager import DBManager
+    db = DBManager(args.db, cache_size=0, stats=False)
+    backups = BackupManager(db, args.dir, keep=args.keep, pages=args.pages, pause=args.pause)
+    try:
+        if args.command == "snapshot":
+            backups.snapshot()
+        elif args.command == "list":
+            for p in backups.snapshots():
+                print(f"{p}  {p.stat().st_size / 1e6:.1f} MB  "
+                      f"{datetime.fromtimestamp(p.stat().st_mtime):%Y-%m-%d %H:%M:%S}")
+        else:
+            backups.start(args.interval)
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                backups.stop()
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
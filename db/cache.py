@@ -0,0 +1,91 @@
+# db/cache.py
+import threading
+from collections import OrderedDict
+
+
+class EntityCache:
+    """Bounded LRU of query results with tag-based invalidation.
+
+    Every entry carries a set of tags such as ('merchants', 42) or
+    ('ratesheets', ('client', 43468172)); invalidating a tag drops exactly
+    the entries that carry it. Readers snapshot `generation` before they
+    query and only store their result if no invalidation ran meanwhile, so a
+    slow read can't re-cache data a concurrent write has just replaced.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = int(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()   # key -> (value, tags)
+        self._by_tag = {}               # tag -> set(keys)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, tags, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._by_tag.pop(tag, ()):
+                    if self._drop(key):
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[1]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+        return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,52 @@
+# db/changes.py
+"""Change-data-capture journal from the command line.
+
+    python -m db.changes status [--db PATH]
+    python -m db.changes since SEQ [--limit N] [--db PATH]   # JSON lines
+    python -m db.changes compact [--before SEQ] [--db PATH]
+
+A downstream sync keeps the last seq it applied and asks for what came
+after it; `since 0` on a fresh consumer is a full load. Entries carry the
+row's current state, so inserts and updates are applied as upserts.
+"""
+import argparse
+import json
+import sys
+from config import DB_PATH, PAGE_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.changes")
+    parser.add_argument("command", choices=("status", "since", "compact"))
+    parser.add_argument("seq", nargs="?", type=int, default=0, help="last seq already applied (since)")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE, help="entries per batch (since)")
+    parser.add_argument("--all", action="store_true", help="keep fetching batches until caught up (since)")
+    parser.add_argument("--before", type=int, help="also drop tombstones up to this seq (compact)")
+    args = parser.parse_args(argv)
+
+    from .db_manager import DBManager
+    db = DBManager(args.db, cache_size=0, stats=False)
+    try:
+        if args.command == "status":
+            with db.pool.read_primary() as conn:
+                entries, oldest = conn.execute("SELECT COUNT(*), MIN(seq) FROM change_log").fetchone()
+            print(f"{args.db}: {entries} journal entries, oldest seq {oldest}, latest seq {db.latest_change_seq()}")
+        elif args.command == "since":
+            seq = args.seq
+            while True:
+                batch = db.changes_since(seq, args.limit)
+                for entry in batch:
+                    sys.stdout.write(json.dumps(entry, default=str) + "\n")
+                if not batch or not args.all:
+                    break
+                seq = batch[-1]['seq']
+        else:
+            db.compact_changes(before=args.before)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,74 +1,156 @@
 # db/db_manager.py
+import json
+import re
 import sqlite3
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from .models import Client, Merchant, ClientRatesheet
-from config import DB_PATH
+from .migrations import migrate, current_version
+from .models import RateTier, ChangeJournal, ClientSummary, normalize_pair
+from .cache import EntityCache
+from .events import EventBus, ChangeEvent, INSERT, UPDATE, DELETE
+from .limits import LimitIndex, normalize_currency
+from .metrics import QueryStats, instrument
+from .pool import ConnectionPool
+from .ratesheet_index import ActiveRatesheetIndex, as_of_key
+from .reports import ReportEngine
+from .transaction import UnitOfWork
+from config import DB_PATH, DB_POOL_SIZE, DB_BUSY_TIMEOUT, BULK_CHUNK_SIZE, PAGE_SIZE, ITER_BATCH_SIZE, DB_CACHE_SIZE
+from config import DB_STATS, DB_SLOW_QUERY_MS, DB_REPLICA
 
+CLIENT_FIELDS = ('sds_id', 'entity_name', 'bank_user_id', 'timezone', 'end_of_day')
+MERCHANT_FIELDS = ('client_sds_id', 'merchant_name', 'merchant_code')
+RATESHEET_FIELDS = ('client_sds_id', 'merchant_id', 'effective_date', 'expiry_date', 'rate_details')
+RATE_TIER_FIELDS = ('ratesheet_id', 'currency_pair', 'min_amount', 'max_amount', 'margin_bps', 'spread')
+PAGED_TABLES = ('clients', 'merchants', 'client_ratesheets')
+
+
+# ---- cache tags ----
+# A query is tagged with what can add rows to it, each returned row with
+# what can change or remove it; writes invalidate the matching tags.
+def _client_tags(row):
+    return [('clients', row['sds_id'])]
+
+def _merchant_tags(row):
+    return [('merchants', row['merchant_id']), ('clients', row['client_sds_id'])]
+
+def _ratesheet_tags(row):
+    tags = [('ratesheets', row['ratesheet_id']), ('clients', row['client_sds_id'])]
+    if row.get('merchant_id') is not None:
+        tags.append(('merchants', row['merchant_id']))
+    return tags
+
+def _new_merchant_tags(client_sds_id, merchant_id):
+    tags = [('merchants', '*'), ('merchants', merchant_id)]
+    if client_sds_id is not None:
+        tags.append(('merchants', ('client', client_sds_id)))
+    return tags
+
+def _rate_tier_tags(row):
+    # tiers cascade away with their ratesheet, and with its client
+    return [('rate_tiers', row['tier_id']), ('ratesheets', row['ratesheet_id']), ('clients', row['client_sds_id'])]
+
+def _new_ratesheet_tags(client_sds_id, merchant_id, ratesheet_id):
+    tags = [('ratesheets', '*'), ('ratesheets', ratesheet_id)]
+    if client_sds_id is not None:
+        tags.append(('ratesheets', ('client', client_sds_id)))
+    if merchant_id is not None:
+        tags.append(('ratesheets', ('merchant', merchant_id)))
+    return tags
+
+
+@instrument
 class DBManager:
-    def __init__(self, path=DB_PATH):
+    """Data access for clients, merchants and ratesheets.
+
+    pool_size=0 keeps the classic single-connection mode. pool_size=N opens
+    one writer plus N read-only readers over a WAL database so reads from
+    background threads don't wait on an in-progress write.
+
+    cache_size>0 puts a read-through LRU of fetch_* results in front of
+    the database; insert_*/update_*/delete_* invalidate the affected entries
+    when their transaction commits. cache_size=0 disables it.
+
+    stats=True times every public method and every SQL statement (see
+    stats()); statements slower than slow_query_ms are logged with their
+    query plan.
+
+    replica=True serves reads from an in-memory copy of the database,
+    loaded at startup and kept current after every commit (see db.replica).
+    """
+    # not timed by @instrument: context managers and the stats API itself
+    UNTIMED = ('transaction', 'close', 'stats', 'export_stats', 'reset_stats', 'cache_stats', 'reset_caches', 'subscribe')
+
+    def __init__(self, path=DB_PATH, pool_size=DB_POOL_SIZE, busy_timeout=DB_BUSY_TIMEOUT,
+                 cache_size=DB_CACHE_SIZE, stats=DB_STATS, slow_query_ms=DB_SLOW_QUERY_MS, replica=DB_REPLICA):
         self.path = Path(path)
         print(f"[DBManager] opening DB at: {self.path.resolve()}")
-        self.conn = sqlite3.connect(str(self.path))
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.metrics = QueryStats(slow_query_ms) if stats else None
+        self.pool = ConnectionPool(self.path, readers=pool_size, busy_timeout=busy_timeout,
+                                   metrics=self.metrics, replica=replica)
+        # the writer connection; kept as .conn for existing callers
+        self.conn = self.pool.writer
+        self.uow = UnitOfWork(self.pool)
+        self.cache = EntityCache(cache_size) if cache_size else None
+        self._active_index = None
+        self._ratesheet_generation = 0
+        self._rate_engine = None
+        self._rate_tier_generation = 0
+        self._cross_engine = None
+        self._reports = None
+        self._limit_index = None
+        self._limit_generation = 0
+        self.events = EventBus()
+        if self.pool.pooled:
+            print(f"[DBManager] pooled mode: 1 writer + {pool_size} readers (WAL)")
         self.ensure_schema()
-        self._ensure_seeded_children()
+        self.recount_active_ratesheets()
 
     def ensure_schema(self):
-        cur = self.conn.cursor()
-        cur.execute(Client.create_table_sql())
-        cur.execute(Merchant.create_table_sql())
-        cur.execute(ClientRatesheet.create_table_sql())
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_merchants_client ON merchants(client_sds_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_ratesheets_client ON client_ratesheets(client_sds_id)")
-        self.conn.commit()
-
-        cur.execute("SELECT COUNT(1) as c FROM clients")
-        count = cur.fetchone()["c"]
-        if count == 0:
-            print("[DBManager] clients table empty — seeding clients")
+        """Apply pending migrations; a single PRAGMA read when current."""
+        with self.pool.write() as conn:
+            applied = migrate(conn)
+            version = current_version(conn)
+        if not applied:
+            print(f"[DBManager] schema current (v{version})")
+        if self.pool.replicated and (applied or self.pool.replica is None):
+            replica = self.pool.load_replica()
+            print(f"[DBManager] in-memory replica: {replica.bytes / 1e6:.1f} MB x {len(replica.connections)} "
+                  f"loaded in {replica.seconds * 1000:.0f} ms")
+        return applied
+
+    # ---- Sample data (opt-in: python -m db.migrations seed) ----
+    def _has_rows(self, table):
+        with self.pool.read() as conn:
+            return conn.execute(f"SELECT EXISTS(SELECT 1 FROM {table})").fetchone()[0] == 1
+
+    def seed_sample_data(self):
+        """Insert the demo clients, merchants and ratesheets into empty tables."""
+        if self._has_rows('clients'):
+            print("[seed] clients present; skipping clients")
+        else:
             self._insert_sample_clients()
+        if self._has_rows('merchants'):
+            print("[seed] merchants present; skipping merchants & ratesheets")
         else:
-            print(f"[DBManager] clients present: {count}")
+            self._insert_sample_merchants_and_ratesheets()
 
     def _insert_sample_clients(self):
-        cur = self.conn.cursor()
+        clients = [
+            (43468172, 'TOMIAREFMNGMCU', 'bankuser1', 'UTC+0', '04:53'),
+            (45430188, 'Amazon', 'bankuser2', 'UTC+0', '05:00'),
+            (80014612, 'Systirch', 'bankuser3', 'UTC+1', '23:30'),
+        ]
         try:
-            clients = [
-                (43468172, 'TOMIAREFMNGMCU', 'bankuser1', 'UTC+0', '04:53'),
-                (45430188, 'Amazon', 'bankuser2', 'UTC+0', '05:00'),
-                (80014612, 'Systirch', 'bankuser3', 'UTC+1', '23:30'),
-            ]
-            cur.executemany(
-                'INSERT OR IGNORE INTO clients(sds_id, entity_name, bank_user_id, timezone, end_of_day) VALUES (?,?,?,?,?)',
-                clients
-            )
-            self.conn.commit()
+            self.insert_clients(clients)
             print(f"[seed] inserted/ignored {len(clients)} clients")
         except Exception as ex:
-            self.conn.rollback()
             print("[seed] ERROR inserting clients:", ex)
             raise
 
-    def _ensure_seeded_children(self):
-        cur = self.conn.cursor()
-        cur.execute("SELECT COUNT(1) as c FROM merchants")
-        merchants_count = cur.fetchone()["c"]
-        if merchants_count == 0:
-            print("[DBManager] merchants table empty — seeding merchants & ratesheets")
-            self._insert_sample_merchants_and_ratesheets()
-        else:
-            print(f"[DBManager] merchants present: {merchants_count}")
-
-        cur.execute("SELECT COUNT(1) as c FROM client_ratesheets")
-        rs_count = cur.fetchone()["c"]
-        print(f"[DBManager] ratesheets present: {rs_count}")
-
     def _insert_sample_merchants_and_ratesheets(self):
-        cur = self.conn.cursor()
         try:
-            cur.execute("SELECT sds_id FROM clients")
-            clients = [row["sds_id"] for row in cur.fetchall()]
+            clients = {c["sds_id"] for c in self.fetch_all_clients()}
             if not clients:
                 print("[seed] no clients present; aborting merchant/ratesheet seed")
                 return
@@ -78,21 +160,15 @@ class DBManager:
                 (43468172, 'Tomia Merchant B', 'TMB'),
                 (45430188, 'Amazon Merchant', 'AMZ'),
             ]
-
-            inserted_merchant_map = {}
             for client_sds, name, code in merchants_to_seed:
-                cur.execute("SELECT 1 FROM clients WHERE sds_id = ?", (client_sds,))
-                if cur.fetchone() is None:
+                if client_sds not in clients:
                     print(f"[seed] skipping merchant '{name}' because client {client_sds} not found")
-                    continue
-                cur.execute(
-                    'INSERT INTO merchants(client_sds_id, merchant_name, merchant_code) VALUES (?,?,?)',
-                    (client_sds, name, code)
-                )
-                mid = cur.lastrowid
+            merchants_to_seed = [m for m in merchants_to_seed if m[0] in clients]
+            mids = self.insert_merchants(merchants_to_seed)
+            inserted_merchant_map = {}
+            for (client_sds, name, code), mid in zip(merchants_to_seed, mids):
                 inserted_merchant_map[name] = mid
                 print(f"[seed] inserted merchant '{name}' id={mid} for client {client_sds}")
-            self.conn.commit()
 
             ratesheets_to_seed = [
                 ('Tomia Merchant A', 43468172, '2025-01-01', '2025-12-31', 'Rates: A'),
@@ -100,45 +176,209 @@ class DBManager:
                 ('Amazon Merchant', 45430188, '2025-02-01', '2026-02-01', 'Amazon rates'),
                 (None, 80014612, '2025-03-01', '2026-03-01', 'Systirch general rates'),
             ]
-            rs_inserted = 0
+            rows = []
             for merchant_name, client_sds, eff, exp, details in ratesheets_to_seed:
-                merchant_id = inserted_merchant_map.get(merchant_name) if merchant_name else None
-                cur.execute("SELECT 1 FROM clients WHERE sds_id = ?", (client_sds,))
-                if cur.fetchone() is None:
+                if client_sds not in clients:
                     print(f"[seed] skipping ratesheet for client {client_sds} (client not found)")
                     continue
-                cur.execute(
-                    'INSERT INTO client_ratesheets(client_sds_id, merchant_id, effective_date, expiry_date, rate_details) VALUES (?,?,?,?,?)',
-                    (client_sds, merchant_id, eff, exp, details)
-                )
-                rs_inserted += 1
-            self.conn.commit()
-            print(f"[seed] inserted {rs_inserted} ratesheets")
+                merchant_id = inserted_merchant_map.get(merchant_name) if merchant_name else None
+                rows.append((client_sds, merchant_id, eff, exp, details))
+            rs_ids = self.insert_ratesheets(rows)
+            print(f"[seed] inserted {len(rs_ids)} ratesheets")
         except Exception as ex:
-            self.conn.rollback()
             print("[seed] ERROR inserting merchants/ratesheets:", ex)
             raise
 
+    # ---- Transactions ----
+    def transaction(self):
+        """Unit of work: `with db.transaction() as tx:` groups any number of
+        insert_*/update_*/delete_* calls into one commit. Nested blocks become
+        savepoints. tx.statements / tx.elapsed report what the outermost
+        block did; finished transactions are kept in db.transaction_log."""
+        return self.uow.begin()
+
+    @property
+    def transaction_log(self):
+        return list(self.uow.history)
+
+    @contextmanager
+    def _write(self):
+        """Writer connection for one mutating call: joins the caller's open
+        transaction, otherwise commits on its own."""
+        if self.uow.active:
+            with self.pool.write() as conn:
+                yield conn
+        else:
+            with self.transaction() as tx:
+                yield tx.conn
+
+    # ---- Streaming reads ----
+    def _iter_rows(self, sql, params=(), batch_size=None):
+        """Yield dict rows lazily, fetchmany() batch_size at a time.
+
+        The generator keeps its connection until exhausted or closed: in
+        pooled mode that is a reader of its own, so other reads carry on
+        meanwhile; in single-connection mode other threads wait for it.
+        """
+        batch_size = max(1, int(batch_size or ITER_BATCH_SIZE))
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            try:
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cur.close()
+
+    # ---- Entity cache ----
+    def _cached(self, key, tags, row_tags, load):
+        """Read-through lookup. `tags` describe the query (who can add rows to
+        it); `row_tags(row)` describes each row returned (who can change or
+        remove it). Reads inside a transaction bypass the cache: they may see
+        uncommitted data."""
+        if self.cache is None or self.uow.active:
+            return load()
+        hit, value = self.cache.get(key)
+        if not hit:
+            generation = self.cache.generation
+            value = load()
+            tags = set(tags)
+            for row in (value if isinstance(value, list) else [value] if value else []):
+                tags.update(row_tags(row))
+            self.cache.put(key, value, tags, generation)
+        # hand out copies so callers can't mutate cached rows
+        if isinstance(value, list):
+            return [dict(row) for row in value]
+        return dict(value) if value else value
+
+    def _invalidate(self, *tags):
+        self.uow.on_commit(lambda: self._apply_invalidation(tags))
+
+    def _apply_invalidation(self, tags):
+        if self.cache is not None:
+            self.cache.invalidate(tags)
+        if any(t[0] == 'ratesheets' for t in tags):
+            self._ratesheet_generation += 1
+            self._active_index = None
+        if any(t[0] in ('rate_tiers', 'ratesheets') for t in tags):
+            # deleting a ratesheet cascades to its tiers
+            self._rate_tier_generation += 1
+            self._rate_engine = None
+        if any(t[0] in ('limits', 'clients', 'merchants') for t in tags):
+            # limits cascade away with their client or merchant
+            self._limit_generation += 1
+            self._limit_index = None
+        if self._cross_engine is not None:
+            for t in tags:
+                # ('ratesheets', id) covers update/delete of one sheet; the
+                # quotes of an updated sheet are simply reloaded on next use
+                if t[0] == 'ratesheets' and isinstance(t[1], int):
+                    self._cross_engine.invalidate(t[1])
+
+    # ---- Change events ----
+    def subscribe(self, fn, entities=None):
+        """fn(events) after each commit, with ChangeEvent(entity, id, op)
+        for every row it inserted, updated or deleted (cascades included).
+        Returns an unsubscribe function."""
+        return self.events.subscribe(fn, entities)
+
+    def _emit(self, entity, ids, op):
+        """Publish (entity, id, op) for `ids` once the transaction commits.
+        Registered after the write's _invalidate(), so subscribers that
+        re-read see fresh data."""
+        if not self.events.active:
+            return
+        events = [ChangeEvent(entity, i, op) for i in ids]
+        if events:
+            self.uow.on_commit(lambda: self.events.publish(events))
+
+    def _emit_update(self, entity, old_id, new_id, rowcount):
+        if not rowcount:
+            return
+        if new_id is None or new_id == old_id:
+            self._emit(entity, [old_id], UPDATE)
+        else:
+            self._emit(entity, [old_id], DELETE)
+            self._emit(entity, [new_id], INSERT)
+
+    def reset_caches(self):
+        """Forget every cached row and derived index, e.g. after the file
+        was replaced underneath the manager by a restore."""
+        if self.cache is not None:
+            self.cache.clear()
+        self._ratesheet_generation += 1
+        self._active_index = None
+        self._rate_tier_generation += 1
+        self._rate_engine = None
+        self._limit_generation += 1
+        self._limit_index = None
+        if self._cross_engine is not None:
+            self._cross_engine.clear()
+        if self._reports is not None:
+            # the journal seq of a restored file may repeat an earlier one
+            self._reports.clear()
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the entity cache (None if disabled)."""
+        return self.cache.stats() if self.cache is not None else None
+
+    # ---- Instrumentation ----
+    def stats(self):
+        """Latency histograms per method and per SQL text, rows returned /
+        touched, the slow-query log, cache counters and recent transactions."""
+        data = self.metrics.snapshot() if self.metrics is not None else {}
+        data['cache'] = self.cache_stats()
+        data['transactions'] = [s.as_dict() for s in self.transaction_log]
+        return data
+
+    def export_stats(self, path):
+        """Write stats() to `path` as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=2, default=str)
+        print(f"[DBManager] stats written to {path}")
+
+    def reset_stats(self):
+        if self.metrics is not None:
+            self.metrics.reset()
+
+    def _fetch_one(self, sql, params):
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            return dict(row) if row else None
+
     # ---- Client CRUD ----
     def fetch_all_clients(self):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM clients ORDER BY entity_name')
-        return [dict(row) for row in cur.fetchall()]
+        return self._cached(
+            ('all_clients',), [('clients', '*')], _client_tags,
+            lambda: list(self.iter_all_clients())
+        )
+
+    def iter_all_clients(self, batch_size=None):
+        return self._iter_rows('SELECT * FROM clients ORDER BY entity_name', batch_size=batch_size)
 
     def fetch_client_by_sds(self, sds_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM clients WHERE sds_id = ?', (sds_id,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+        return self._cached(
+            ('client', sds_id), [('clients', sds_id)], _client_tags,
+            lambda: self._fetch_one('SELECT * FROM clients WHERE sds_id = ?', (sds_id,))
+        )
 
     def insert_client(self, sds_id, entity_name, bank_user_id=None, timezone=None, end_of_day=None):
-        cur = self.conn.cursor()
-        cur.execute(
-            'INSERT OR IGNORE INTO clients(sds_id, entity_name, bank_user_id, timezone, end_of_day) VALUES (?,?,?,?,?)',
-            (sds_id, entity_name, bank_user_id, timezone, end_of_day)
-        )
-        self.conn.commit()
-        return cur.lastrowid
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'INSERT OR IGNORE INTO clients(sds_id, entity_name, bank_user_id, timezone, end_of_day) VALUES (?,?,?,?,?)',
+                (sds_id, entity_name, bank_user_id, timezone, end_of_day)
+            )
+            if cur.rowcount:
+                self._invalidate(('clients', '*'), ('clients', sds_id))
+                self._emit('client', [sds_id], INSERT)
+            return cur.lastrowid
 
     def update_client(self, sds_id, data: dict):
         if not data:
@@ -150,47 +390,166 @@ class DBManager:
             vals.append(v)
         vals.append(sds_id)
         sql = f"UPDATE clients SET {', '.join(keys)} WHERE sds_id = ?"
-        cur = self.conn.cursor()
-        cur.execute(sql, vals)
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, vals)
+            self._invalidate(('clients', sds_id))
+            if 'sds_id' in data:
+                self._invalidate(('clients', '*'), ('clients', data['sds_id']))
+            self._emit_update('client', sds_id, data.get('sds_id'), cur.rowcount)
+            return cur.rowcount
 
     def delete_client(self, sds_id):
-        cur = self.conn.cursor()
-        cur.execute('DELETE FROM clients WHERE sds_id = ?', (sds_id,))
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            merchant_ids = ratesheet_ids = ()
+            if self.cache is not None or self.events.active:
+                # merchants and ratesheets cascade away
+                cur.execute('SELECT merchant_id FROM merchants WHERE client_sds_id = ?', (sds_id,))
+                merchant_ids = [mid for (mid,) in cur.fetchall()]
+                for mid in merchant_ids:
+                    self._invalidate(('merchants', mid), ('ratesheets', ('merchant', mid)))
+                if self.events.active:
+                    cur.execute('SELECT ratesheet_id FROM client_ratesheets WHERE client_sds_id = ?', (sds_id,))
+                    ratesheet_ids = [rid for (rid,) in cur.fetchall()]
+            cur.execute('DELETE FROM clients WHERE sds_id = ?', (sds_id,))
+            self.uow.on_commit(self._clear_cross_rates)
+            self._invalidate(
+                ('clients', sds_id),
+                ('merchants', ('client', sds_id)),
+                ('ratesheets', ('client', sds_id)),
+            )
+            if cur.rowcount:
+                self._emit('ratesheet', ratesheet_ids, DELETE)
+                self._emit('merchant', merchant_ids, DELETE)
+                self._emit('client', [sds_id], DELETE)
+            return cur.rowcount
+
+    # ---- Client summaries ----
+    def fetch_client_summaries(self, sds_ids=None):
+        """Clients with merchant_count, ratesheet_count, active_ratesheet_count
+        (sheets in force today) and last_change_at, read from the
+        trigger-maintained client_summary table. All clients ordered by
+        entity_name, or those in `sds_ids` in that order.
+
+        Read-only: a row last counted on an earlier day (see
+        recount_active_ratesheets) is recounted in the query.
+        """
+        today = ClientSummary.TODAY
+        sql = (
+            "SELECT c.*, s.merchant_count, s.ratesheet_count, "
+            f"CASE WHEN s.active_as_of = {today} THEN s.active_ratesheet_count "
+            f"ELSE {ClientSummary.active_count_sql('s.sds_id', today)} END AS active_ratesheet_count, "
+            "s.last_change_at "
+            "FROM clients c JOIN client_summary s ON s.sds_id = c.sds_id "
+        )
+        if sds_ids is None:
+            with self.pool.read() as conn:
+                return [dict(row) for row in conn.execute(sql + "ORDER BY c.entity_name")]
+        sds_ids = list(sds_ids)
+        rows = {row['sds_id']: row for row in self._fetch_by_ids(sql + "WHERE c.sds_id IN ({marks})", sds_ids)}
+        return [rows[s] for s in sds_ids if s in rows]
+
+    def recount_active_ratesheets(self):
+        """Store today's active_ratesheet_count for rows last counted on an
+        earlier day; maintenance, run at startup and by the backup schedule.
+        Readers already count stale rows inline, so what they see does not
+        change and there is nothing to invalidate or publish; this only
+        spares them that work. Returns the number of rows recounted."""
+        today = ClientSummary.TODAY
+        with self._write() as conn:
+            cur = conn.execute(
+                "UPDATE client_summary SET "
+                f"active_ratesheet_count = {ClientSummary.active_count_sql('client_summary.sds_id', today)}, "
+                f"active_as_of = {today} WHERE active_as_of < {today}"
+            )
+            if cur.rowcount:
+                print(f"[DBManager] recounted active ratesheets of {cur.rowcount} clients")
+            return cur.rowcount
+
+    # ---- Reports ----
+    def reports(self):
+        """The ReportEngine (db.reports), created on first use."""
+        if self._reports is None:
+            self._reports = ReportEngine(self)
+        return self._reports
+
+    def report(self, name, offset=0, limit=PAGE_SIZE, **params):
+        """One page of report `name` (see db.reports.REPORTS); cached until
+        the next commit."""
+        return self.reports().page(name, offset=offset, limit=limit, **params)
 
     # ---- Merchant CRUD ----
     def fetch_merchants_by_client(self, client_sds_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM merchants WHERE client_sds_id = ? ORDER BY merchant_name', (client_sds_id,))
-        return [dict(row) for row in cur.fetchall()]
+        return self._cached(
+            ('merchants_by_client', client_sds_id), [('merchants', ('client', client_sds_id))], _merchant_tags,
+            lambda: list(self.iter_merchants_by_client(client_sds_id))
+        )
+
+    def iter_merchants_by_client(self, client_sds_id, batch_size=None):
+        return self._iter_rows(
+            'SELECT * FROM merchants WHERE client_sds_id = ? ORDER BY merchant_name', (client_sds_id,),
+            batch_size=batch_size
+        )
 
     def fetch_all_merchants(self):
-        cur = self.conn.cursor()
-        cur.execute(
+        return self._cached(
+            ('all_merchants',), [('merchants', '*')], _merchant_tags,
+            lambda: list(self.iter_all_merchants())
+        )
+
+    def iter_all_merchants(self, batch_size=None):
+        return self._iter_rows(
             "SELECT m.*, c.entity_name AS client_name "
             "FROM merchants m "
             "LEFT JOIN clients c ON m.client_sds_id = c.sds_id "
-            "ORDER BY m.merchant_name"
+            "ORDER BY m.merchant_name",
+            batch_size=batch_size
         )
-        return [dict(row) for row in cur.fetchall()]
 
     def fetch_merchant_by_id(self, merchant_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM merchants WHERE merchant_id = ?', (merchant_id,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+        return self._cached(
+            ('merchant', merchant_id), [('merchants', merchant_id)], _merchant_tags,
+            lambda: self._fetch_one('SELECT * FROM merchants WHERE merchant_id = ?', (merchant_id,))
+        )
 
-    def insert_merchant(self, client_sds_id, merchant_name, merchant_code=None):
-        cur = self.conn.cursor()
-        cur.execute(
-            'INSERT INTO merchants (client_sds_id, merchant_name, merchant_code) VALUES (?, ?, ?)',
-            (client_sds_id, merchant_name, merchant_code)
+    def fetch_merchant_by_name(self, client_sds_id, merchant_name):
+        """A client's merchant whose name matches ignoring case and
+        surrounding whitespace (str.strip().lower(), so non-ASCII letters
+        fold too)."""
+        name = (merchant_name or '').strip()
+        return self._cached(
+            ('merchant_by_name', client_sds_id, name.lower()),
+            [('merchants', ('client', client_sds_id)), ('merchants', 'by_name')], _merchant_tags,
+            lambda: self._merchant_by_name(client_sds_id, name)
+        )
+
+    def _merchant_by_name(self, client_sds_id, name):
+        # the NOCASE index finds an unpadded name differing in ASCII case;
+        # padded or non-ASCII variants fall back to comparing in Python
+        found = self._fetch_one(
+            'SELECT * FROM merchants WHERE client_sds_id = ? AND merchant_name = ? COLLATE NOCASE '
+            'ORDER BY merchant_id LIMIT 1',
+            (client_sds_id, name)
         )
-        self.conn.commit()
-        return cur.lastrowid
+        if found:
+            return found
+        key = name.lower()
+        for m in self.fetch_merchants_by_client(client_sds_id):
+            if (m['merchant_name'] or '').strip().lower() == key:
+                return m
+        return None
+
+    def insert_merchant(self, client_sds_id, merchant_name, merchant_code=None):
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'INSERT INTO merchants (client_sds_id, merchant_name, merchant_code) VALUES (?, ?, ?)',
+                (client_sds_id, merchant_name, merchant_code)
+            )
+            self._invalidate(*_new_merchant_tags(client_sds_id, cur.lastrowid))
+            self._emit('merchant', [cur.lastrowid], INSERT)
+            return cur.lastrowid
 
     def update_merchant(self, merchant_id, data: dict):
         if not data:
@@ -202,53 +561,89 @@ class DBManager:
             vals.append(v)
         vals.append(merchant_id)
         sql = f"UPDATE merchants SET {', '.join(keys)} WHERE merchant_id = ?"
-        cur = self.conn.cursor()
-        cur.execute(sql, vals)
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, vals)
+            self._invalidate(('merchants', merchant_id))
+            if 'merchant_name' in data:
+                self._invalidate(('merchants', 'by_name'))
+            if 'client_sds_id' in data or 'merchant_id' in data:
+                self._invalidate(*_new_merchant_tags(data.get('client_sds_id'), data.get('merchant_id')))
+            self._emit_update('merchant', merchant_id, data.get('merchant_id'), cur.rowcount)
+            return cur.rowcount
 
     def delete_merchant(self, merchant_id):
-        cur = self.conn.cursor()
-        cur.execute('DELETE FROM merchants WHERE merchant_id = ?', (merchant_id,))
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            ratesheet_ids = ()
+            if self.events.active:
+                # their merchant_id is set to NULL by the foreign key
+                cur.execute('SELECT ratesheet_id FROM client_ratesheets WHERE merchant_id = ?', (merchant_id,))
+                ratesheet_ids = [rid for (rid,) in cur.fetchall()]
+            cur.execute('DELETE FROM merchants WHERE merchant_id = ?', (merchant_id,))
+            self._invalidate(('merchants', merchant_id), ('ratesheets', ('merchant', merchant_id)))
+            if cur.rowcount:
+                self._emit('merchant', [merchant_id], DELETE)
+                self._emit('ratesheet', ratesheet_ids, UPDATE)
+            return cur.rowcount
 
     # ---- Ratesheet CRUD ----
     def fetch_ratesheets_by_client(self, client_sds_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM client_ratesheets WHERE client_sds_id = ? ORDER BY effective_date DESC', (client_sds_id,))
-        return [dict(row) for row in cur.fetchall()]
+        return self._cached(
+            ('ratesheets_by_client', client_sds_id), [('ratesheets', ('client', client_sds_id))], _ratesheet_tags,
+            lambda: list(self.iter_ratesheets_by_client(client_sds_id))
+        )
+
+    def iter_ratesheets_by_client(self, client_sds_id, batch_size=None):
+        return self._iter_rows(
+            'SELECT * FROM client_ratesheets WHERE client_sds_id = ? ORDER BY effective_date DESC', (client_sds_id,),
+            batch_size=batch_size
+        )
 
     def fetch_all_ratesheets(self):
-        cur = self.conn.cursor()
-        cur.execute(
+        return self._cached(
+            ('all_ratesheets',), [('ratesheets', '*')], _ratesheet_tags,
+            lambda: list(self.iter_all_ratesheets())
+        )
+
+    def iter_all_ratesheets(self, batch_size=None):
+        return self._iter_rows(
             "SELECT r.*, c.entity_name AS client_name, m.merchant_name "
             "FROM client_ratesheets r "
             "LEFT JOIN clients c ON r.client_sds_id = c.sds_id "
             "LEFT JOIN merchants m ON r.merchant_id = m.merchant_id "
-            "ORDER BY r.effective_date DESC"
+            "ORDER BY r.effective_date DESC",
+            batch_size=batch_size
         )
-        return [dict(row) for row in cur.fetchall()]
 
     def fetch_ratesheets_by_merchant(self, merchant_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM client_ratesheets WHERE merchant_id = ? ORDER BY effective_date DESC', (merchant_id,))
-        return [dict(row) for row in cur.fetchall()]
+        return self._cached(
+            ('ratesheets_by_merchant', merchant_id), [('ratesheets', ('merchant', merchant_id))], _ratesheet_tags,
+            lambda: list(self.iter_ratesheets_by_merchant(merchant_id))
+        )
+
+    def iter_ratesheets_by_merchant(self, merchant_id, batch_size=None):
+        return self._iter_rows(
+            'SELECT * FROM client_ratesheets WHERE merchant_id = ? ORDER BY effective_date DESC', (merchant_id,),
+            batch_size=batch_size
+        )
 
     def fetch_ratesheet_by_id(self, ratesheet_id):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM client_ratesheets WHERE ratesheet_id = ?', (ratesheet_id,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+        return self._cached(
+            ('ratesheet', ratesheet_id), [('ratesheets', ratesheet_id)], _ratesheet_tags,
+            lambda: self._fetch_one('SELECT * FROM client_ratesheets WHERE ratesheet_id = ?', (ratesheet_id,))
+        )
 
     def insert_ratesheet(self, client_sds_id, merchant_id, effective_date, expiry_date, rate_details):
-        cur = self.conn.cursor()
-        cur.execute(
-            'INSERT INTO client_ratesheets (client_sds_id, merchant_id, effective_date, expiry_date, rate_details) VALUES (?, ?, ?, ?, ?)',
-            (client_sds_id, merchant_id, effective_date, expiry_date, rate_details)
-        )
-        self.conn.commit()
-        return cur.lastrowid
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'INSERT INTO client_ratesheets (client_sds_id, merchant_id, effective_date, expiry_date, rate_details) VALUES (?, ?, ?, ?, ?)',
+                (client_sds_id, merchant_id, effective_date, expiry_date, rate_details)
+            )
+            self._invalidate(*_new_ratesheet_tags(client_sds_id, merchant_id, cur.lastrowid))
+            self._emit('ratesheet', [cur.lastrowid], INSERT)
+            return cur.lastrowid
 
     def update_ratesheet(self, ratesheet_id, data: dict):
         if not data:
@@ -260,17 +655,873 @@ class DBManager:
             vals.append(v)
         vals.append(ratesheet_id)
         sql = f"UPDATE client_ratesheets SET {', '.join(keys)} WHERE ratesheet_id = ?"
-        cur = self.conn.cursor()
-        cur.execute(sql, vals)
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, vals)
+            self._invalidate(('ratesheets', ratesheet_id))
+            if {'client_sds_id', 'merchant_id', 'ratesheet_id'} & set(data):
+                self._invalidate(*_new_ratesheet_tags(
+                    data.get('client_sds_id'), data.get('merchant_id'), data.get('ratesheet_id')))
+            self._emit_update('ratesheet', ratesheet_id, data.get('ratesheet_id'), cur.rowcount)
+            return cur.rowcount
 
     def delete_ratesheet(self, ratesheet_id):
-        cur = self.conn.cursor()
-        cur.execute('DELETE FROM client_ratesheets WHERE ratesheet_id = ?', (ratesheet_id,))
-        self.conn.commit()
-        return cur.rowcount
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM client_ratesheets WHERE ratesheet_id = ?', (ratesheet_id,))
+            self._invalidate(('ratesheets', ratesheet_id))
+            if cur.rowcount:
+                self._emit('ratesheet', [ratesheet_id], DELETE)
+            return cur.rowcount
+
+    # ---- Active ratesheet resolution ----
+    _ACTIVE_SQL = (
+        "SELECT * FROM client_ratesheets WHERE {scope} "
+        "AND (effective_date <= ? OR effective_date IS NULL) "
+        "AND (expiry_date IS NULL OR expiry_date = '' OR expiry_date >= ?) "
+        "ORDER BY effective_date DESC, ratesheet_id DESC LIMIT 1"
+    )
+
+    def active_ratesheet(self, client_sds_id, merchant_id=None, as_of=None):
+        """The ratesheet in force on `as_of` (date or 'YYYY-MM-DD', default
+        today): the merchant's own sheet if one is active, else the client's
+        default sheet (merchant_id NULL). None if neither applies.
+
+        Each step is one LIMIT 1 walk down the (merchant_id, effective_date)
+        or (client_sds_id, effective_date) index.
+        """
+        day = as_of_key(as_of)
+        if merchant_id is not None:
+            row = self._fetch_one(
+                self._ACTIVE_SQL.format(scope="merchant_id = ? AND client_sds_id = ?"),
+                (merchant_id, client_sds_id, day, day)
+            )
+            if row:
+                return row
+        return self._fetch_one(
+            self._ACTIVE_SQL.format(scope="client_sds_id = ? AND merchant_id IS NULL"),
+            (client_sds_id, day, day)
+        )
+
+    def active_ratesheets(self, requests):
+        """Batch active_ratesheet() over (client_sds_id, merchant_id, as_of)
+        tuples; returns a list of ratesheet dicts (or None) in input order.
+
+        Served from an in-memory interval index built on first use and
+        dropped whenever a ratesheet changes.
+        """
+        index = self.ratesheet_index()
+        out = []
+        for client_sds_id, merchant_id, as_of in requests:
+            row = index.resolve(client_sds_id, merchant_id, as_of)
+            out.append(dict(row) if row else None)
+        return out
+
+    def ratesheet_index(self):
+        index = self._active_index
+        if index is None:
+            generation = self._ratesheet_generation
+            index = ActiveRatesheetIndex(self.iter_ratesheets())
+            # don't keep an index that raced a write or saw uncommitted rows
+            if generation == self._ratesheet_generation and not self.uow.active:
+                self._active_index = index
+        return index
+
+    def iter_ratesheets(self, batch_size=None):
+        """Every ratesheet row, unjoined and in no particular order."""
+        return self._iter_rows('SELECT * FROM client_ratesheets', batch_size=batch_size)
+
+    # ---- Rate tiers ----
+    def fetch_rate_tiers(self, ratesheet_id):
+        """Tiers of one ratesheet ordered by (currency_pair, min_amount), with
+        the ratesheet's client_sds_id."""
+        return self._cached(
+            ('rate_tiers', ratesheet_id), [('rate_tiers', ('ratesheet', ratesheet_id))], _rate_tier_tags,
+            lambda: list(self._iter_rows(
+                "SELECT t.*, r.client_sds_id FROM rate_tiers t "
+                "JOIN client_ratesheets r ON r.ratesheet_id = t.ratesheet_id "
+                "WHERE t.ratesheet_id = ? ORDER BY t.currency_pair, t.min_amount",
+                (ratesheet_id,)
+            ))
+        )
+
+    def iter_rate_tiers(self, batch_size=None):
+        """Every tier row, in no particular order."""
+        return self._iter_rows('SELECT * FROM rate_tiers', batch_size=batch_size)
+
+    def insert_rate_tier(self, ratesheet_id, currency_pair, min_amount=0, max_amount=None,
+                         margin_bps=0, spread=0):
+        pair = RateTier.normalize_pair(currency_pair)
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'INSERT INTO rate_tiers (ratesheet_id, currency_pair, min_amount, max_amount, margin_bps, spread) VALUES (?, ?, ?, ?, ?, ?)',
+                (ratesheet_id, pair, min_amount or 0, max_amount, margin_bps or 0, spread or 0)
+            )
+            self._invalidate(('rate_tiers', ('ratesheet', ratesheet_id)))
+            self._emit('rate_tier', [cur.lastrowid], INSERT)
+            return cur.lastrowid
+
+    def insert_rate_tiers(self, rows, chunk_size=None):
+        """Bulk insert_rate_tier(). Rows are (ratesheet_id, currency_pair,
+        min_amount, max_amount, margin_bps, spread) tuples or dicts; returns
+        tier_ids in order."""
+        def normalized():
+            for row in rows:
+                vals = list(self._row_values(row, RATE_TIER_FIELDS))
+                vals[1] = RateTier.normalize_pair(vals[1])
+                for i in (2, 4, 5):
+                    vals[i] = vals[i] or 0
+                yield tuple(vals)
+        return self._bulk_insert(
+            'INSERT INTO rate_tiers (ratesheet_id, currency_pair, min_amount, max_amount, margin_bps, spread) VALUES (?, ?, ?, ?, ?, ?)',
+            normalized(), RATE_TIER_FIELDS, chunk_size,
+            tags=lambda vals, rowid: [('rate_tiers', ('ratesheet', vals[0]))], entity='rate_tier'
+        )
+
+    def update_rate_tier(self, tier_id, data: dict):
+        if not data:
+            return 0
+        data = dict(data)
+        if 'currency_pair' in data:
+            data['currency_pair'] = RateTier.normalize_pair(data['currency_pair'])
+        keys = []
+        vals = []
+        for k, v in data.items():
+            keys.append(f"{k} = ?")
+            vals.append(v)
+        vals.append(tier_id)
+        sql = f"UPDATE rate_tiers SET {', '.join(keys)} WHERE tier_id = ?"
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, vals)
+            self._invalidate(('rate_tiers', tier_id))
+            if 'ratesheet_id' in data:
+                self._invalidate(('rate_tiers', ('ratesheet', data['ratesheet_id'])))
+            self._emit_update('rate_tier', tier_id, data.get('tier_id'), cur.rowcount)
+            return cur.rowcount
+
+    def delete_rate_tier(self, tier_id):
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM rate_tiers WHERE tier_id = ?', (tier_id,))
+            self._invalidate(('rate_tiers', tier_id))
+            if cur.rowcount:
+                self._emit('rate_tier', [tier_id], DELETE)
+            return cur.rowcount
+
+    def rate_engine(self):
+        """Vectorised RateTierEngine over all tiers (needs numpy).
+
+        Built on first use and dropped whenever a tier or ratesheet changes.
+        """
+        engine = self._rate_engine
+        if engine is None:
+            from pricing.tiers import RateTierEngine
+            generation = self._rate_tier_generation
+            engine = RateTierEngine(self.iter_rate_tiers())
+            if generation == self._rate_tier_generation and not self.uow.active:
+                self._rate_engine = engine
+        return engine
+
+    def price_batch(self, ratesheet_ids, pairs, amounts, mid=None):
+        """RateTierEngine.price() over the current tiers."""
+        return self.rate_engine().price(ratesheet_ids, pairs, amounts, mid=mid)
+
+    # ---- Ratesheet rates and cross rates ----
+    def fetch_ratesheet_rates(self, ratesheet_id):
+        """Directly quoted {currency_pair: rate} of one ratesheet."""
+        rows = self._cached(
+            ('ratesheet_rates', ratesheet_id), [('ratesheet_rates', ratesheet_id)],
+            lambda row: [('ratesheets', row['ratesheet_id']), ('clients', row['client_sds_id'])],
+            lambda: list(self._iter_rows(
+                "SELECT q.*, r.client_sds_id FROM ratesheet_rates q "
+                "JOIN client_ratesheets r ON r.ratesheet_id = q.ratesheet_id "
+                "WHERE q.ratesheet_id = ? ORDER BY q.currency_pair",
+                (ratesheet_id,)
+            ))
+        )
+        return {row['currency_pair']: row['rate'] for row in rows}
+
+    def iter_ratesheet_rates(self, batch_size=None):
+        return self._iter_rows('SELECT * FROM ratesheet_rates', batch_size=batch_size)
+
+    def set_ratesheet_rate(self, ratesheet_id, currency_pair, rate):
+        """Insert or replace one direct quote; rate None deletes it."""
+        return self.set_ratesheet_rates(ratesheet_id, {currency_pair: rate})
+
+    def set_ratesheet_rates(self, ratesheet_id, rates: dict):
+        """Upsert several quotes of one ratesheet ({pair: rate}, None deletes).
+
+        Built cross-rate matrices take each change incrementally on commit.
+        """
+        changes = [(normalize_pair(pair), rate) for pair, rate in rates.items()]
+        with self._write() as conn:
+            cur = conn.cursor()
+            count = 0
+            for pair, rate in changes:
+                if rate is None:
+                    cur.execute('DELETE FROM ratesheet_rates WHERE ratesheet_id = ? AND currency_pair = ?',
+                                (ratesheet_id, pair))
+                else:
+                    cur.execute(
+                        'INSERT INTO ratesheet_rates (ratesheet_id, currency_pair, rate) VALUES (?, ?, ?) '
+                        'ON CONFLICT(ratesheet_id, currency_pair) DO UPDATE SET '
+                        'rate = excluded.rate, updated_at = CURRENT_TIMESTAMP',
+                        (ratesheet_id, pair, rate)
+                    )
+                count += cur.rowcount
+            self._invalidate(('ratesheet_rates', ratesheet_id))
+            self.uow.on_commit(lambda: self._apply_rate_changes(ratesheet_id, changes))
+            # upserts are reported as updates
+            self._emit('ratesheet_rate', [(ratesheet_id, p) for p, r in changes if r is not None], UPDATE)
+            self._emit('ratesheet_rate', [(ratesheet_id, p) for p, r in changes if r is None], DELETE)
+            return count
+
+    def _apply_rate_changes(self, ratesheet_id, changes):
+        engine = self._cross_engine
+        if engine is not None:
+            for pair, rate in changes:
+                engine.apply(ratesheet_id, pair, rate)
+
+    def _clear_cross_rates(self):
+        if self._cross_engine is not None:
+            self._cross_engine.clear()
+
+    def cross_engine(self):
+        """CrossRateEngine over ratesheet_rates (needs numpy)."""
+        if self._cross_engine is None:
+            from pricing.cross import CrossRateEngine
+            self._cross_engine = CrossRateEngine(self.fetch_ratesheet_rates)
+        return self._cross_engine
+
+    def cross_rate_matrix(self, ratesheet_id):
+        # inside a transaction the quotes may be uncommitted: don't keep them
+        return self.cross_engine().matrix(ratesheet_id, cache=not self.uow.active)
+
+    def cross_rate(self, ratesheet_id, currency_pair):
+        """Rate for any pair derivable from the ratesheet's quotes, else None."""
+        return self.cross_rate_matrix(ratesheet_id).rate(currency_pair)
+
+    def cross_rates(self, ratesheet_id):
+        """{pair: rate} for every derived (not directly quoted) pair."""
+        return self.cross_rate_matrix(ratesheet_id).crosses()
+
+    # ---- GET limits ----
+    def fetch_limits(self, client_sds_id=None):
+        """trade_limits rows with entity_name and merchant_name, ordered by
+        client, merchant (client-wide first) and currency (default first);
+        all clients, or one."""
+        where, params = "", ()
+        if client_sds_id is not None:
+            where, params = "WHERE l.client_sds_id = ? ", (client_sds_id,)
+        key = ('limits', client_sds_id)
+        tags = [('limits', '*')] if client_sds_id is None else [('limits', ('client', client_sds_id))]
+        return self._cached(
+            key, tags,
+            lambda row: [('limits', row['limit_id']), ('clients', row['client_sds_id'])] +
+                        ([('merchants', row['merchant_id'])] if row['merchant_id'] is not None else []),
+            lambda: list(self._iter_rows(
+                "SELECT l.*, c.entity_name, m.merchant_name FROM trade_limits l "
+                "LEFT JOIN clients c ON c.sds_id = l.client_sds_id "
+                "LEFT JOIN merchants m ON m.merchant_id = l.merchant_id "
+                f"{where}ORDER BY c.entity_name, l.client_sds_id, m.merchant_name IS NOT NULL, m.merchant_name, "
+                "l.merchant_id, l.currency",
+                params
+            ))
+        )
+
+    def set_limit(self, client_sds_id, merchant_id=None, currency=None, single_trade_max=None, daily_max=None):
+        """Insert or replace the limit of one scope: the client (merchant_id
+        None) or one of its merchants, in `currency` or by default in any
+        currency (None). Maxima None are unlimited. Returns the limit_id."""
+        currency = normalize_currency(currency)
+        with self._write() as conn:
+            limit_id = conn.execute(
+                "INSERT INTO trade_limits (client_sds_id, merchant_id, currency, single_trade_max, daily_max) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(client_sds_id, COALESCE(merchant_id, 0), COALESCE(currency, '')) DO UPDATE SET "
+                "single_trade_max = excluded.single_trade_max, daily_max = excluded.daily_max, "
+                "updated_at = CURRENT_TIMESTAMP RETURNING limit_id",
+                (client_sds_id, merchant_id, currency, single_trade_max, daily_max)
+            ).fetchone()[0]
+            self._invalidate(('limits', '*'), ('limits', ('client', client_sds_id)), ('limits', limit_id))
+            # upserts are reported as updates
+            self._emit('limit', [limit_id], UPDATE)
+            return limit_id
+
+    def delete_limit(self, limit_id):
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM trade_limits WHERE limit_id = ?', (limit_id,))
+            self._invalidate(('limits', limit_id))
+            if cur.rowcount:
+                self._emit('limit', [limit_id], DELETE)
+            return cur.rowcount
+
+    def limit_index(self):
+        """LimitIndex of every limit and today's usage. Built on first use,
+        rebuilt when a limit, client or merchant changes or the day rolls
+        over; recorded trades are added to it as they commit."""
+        index = self._limit_index
+        day = as_of_key(None)
+        if index is None or index.day != day:
+            generation = self._limit_generation
+            index = LimitIndex(
+                self._iter_rows("SELECT limit_id, client_sds_id, merchant_id, currency, single_trade_max, daily_max "
+                                "FROM trade_limits"),
+                self._iter_rows("SELECT client_sds_id, merchant_id, currency, amount FROM limit_usage WHERE day = ?",
+                                (day,)),
+                day
+            )
+            # don't keep an index that raced a write or saw uncommitted rows
+            if generation == self._limit_generation and not self.uow.active:
+                self._limit_index = index
+        return index
+
+    def check_limits(self, requests, cumulative=False):
+        """Check proposed trades - (client_sds_id, merchant_id, currency,
+        amount) tuples or dicts - against the limits and today's usage.
+        Returns a tuple of LimitBreach per request, empty if allowed; see
+        LimitIndex.check() for `cumulative`."""
+        return self.limit_index().check(requests, cumulative=cumulative)
+
+    def record_trades(self, trades):
+        """Add executed trades, (client_sds_id, merchant_id, currency, amount)
+        tuples or dicts, to today's usage. Nothing is checked here: call
+        check_limits() first. Returns the number of trades recorded."""
+        day = as_of_key(None)
+        totals = {}
+        count = 0
+        for trade in trades:
+            client_sds_id, merchant_id, currency, amount = self._row_values(
+                trade, ('client_sds_id', 'merchant_id', 'currency', 'amount'))
+            currency = normalize_currency(currency)
+            if currency is None:
+                raise ValueError("a trade needs a currency")
+            key = (client_sds_id, merchant_id or 0, currency)
+            totals[key] = totals.get(key, 0.0) + float(amount)
+            count += 1
+        if not totals:
+            return 0
+        with self._write() as conn:
+            conn.executemany(
+                "INSERT INTO limit_usage (day, client_sds_id, merchant_id, currency, amount) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(day, client_sds_id, merchant_id, currency) DO UPDATE SET amount = amount + excluded.amount",
+                [(day, *key, amount) for key, amount in totals.items()]
+            )
+            self.uow.on_commit(lambda: self._apply_usage(day, totals))
+        return count
+
+    def _apply_usage(self, day, totals):
+        # an index being built right now may have missed these rows
+        self._limit_generation += 1
+        index = self._limit_index
+        if index is not None and index.day == day:
+            for (client_sds_id, merchant_id, currency), amount in totals.items():
+                index.add_usage(client_sds_id, merchant_id or None, currency, amount)
+
+    # ---- Intermediaries ----
+    def fetch_intermediaries(self):
+        """All intermediaries ordered by name, with merchant_count: the
+        merchants reachable through each."""
+        return list(self._iter_rows(
+            "SELECT i.*, (SELECT COUNT(*) FROM intermediary_closure cl "
+            "WHERE cl.ancestor_kind = 'intermediary' AND cl.ancestor_id = i.intermediary_id "
+            "AND cl.descendant_kind = 'merchant') AS merchant_count "
+            "FROM intermediaries i ORDER BY i.name, i.intermediary_id"
+        ))
+
+    def fetch_intermediary(self, intermediary_id):
+        return self._fetch_one('SELECT * FROM intermediaries WHERE intermediary_id = ?', (intermediary_id,))
+
+    def insert_intermediary(self, name, code=None):
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute('INSERT INTO intermediaries (name, code) VALUES (?, ?)', (name, code))
+            self._emit('intermediary', [cur.lastrowid], INSERT)
+            return cur.lastrowid
+
+    def update_intermediary(self, intermediary_id, data: dict):
+        if not data:
+            return 0
+        keys = []
+        vals = []
+        for k, v in data.items():
+            keys.append(f"{k} = ?")
+            vals.append(v)
+        vals.append(intermediary_id)
+        sql = f"UPDATE intermediaries SET {', '.join(keys)} WHERE intermediary_id = ?"
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, vals)
+            self._emit_update('intermediary', intermediary_id, data.get('intermediary_id'), cur.rowcount)
+            return cur.rowcount
+
+    def delete_intermediary(self, intermediary_id):
+        """Delete an intermediary with its links; the closure follows."""
+        with self._write() as conn:
+            cur = conn.cursor()
+            link_ids = ()
+            if self.events.active:
+                cur.execute('SELECT link_id FROM intermediary_links WHERE parent_id = ? OR child_id = ?',
+                            (intermediary_id, intermediary_id))
+                link_ids = [lid for (lid,) in cur.fetchall()]
+            cur.execute('DELETE FROM intermediaries WHERE intermediary_id = ?', (intermediary_id,))
+            if cur.rowcount:
+                self._emit('intermediary_link', link_ids, DELETE)
+                self._emit('intermediary', [intermediary_id], DELETE)
+            return cur.rowcount
+
+    def fetch_intermediary_links(self, intermediary_id):
+        """Links into and out of one intermediary, with the names of the
+        nodes at either end (parent_name, child_name)."""
+        return list(self._iter_rows(
+            "SELECT l.*, COALESCE(c.entity_name, p.name) AS parent_name, "
+            "COALESCE(m.merchant_name, ch.name) AS child_name FROM intermediary_links l "
+            "LEFT JOIN clients c ON c.sds_id = l.client_sds_id "
+            "LEFT JOIN intermediaries p ON p.intermediary_id = l.parent_id "
+            "LEFT JOIN intermediaries ch ON ch.intermediary_id = l.child_id "
+            "LEFT JOIN merchants m ON m.merchant_id = l.merchant_id "
+            "WHERE l.parent_id = ? UNION ALL "
+            "SELECT l.*, COALESCE(c.entity_name, p.name), COALESCE(m.merchant_name, ch.name) FROM intermediary_links l "
+            "LEFT JOIN clients c ON c.sds_id = l.client_sds_id "
+            "LEFT JOIN intermediaries p ON p.intermediary_id = l.parent_id "
+            "LEFT JOIN intermediaries ch ON ch.intermediary_id = l.child_id "
+            "LEFT JOIN merchants m ON m.merchant_id = l.merchant_id "
+            "WHERE l.child_id = ? ORDER BY link_id",
+            (intermediary_id, intermediary_id)
+        ))
+
+    def insert_intermediary_link(self, client_sds_id=None, parent_id=None, child_id=None, merchant_id=None):
+        """Link a parent (client_sds_id or parent_id) to a child (child_id or
+        merchant_id); at least one end is an intermediary. The closure is
+        extended by triggers. A link that would close a cycle raises
+        sqlite3.IntegrityError, as does a duplicate."""
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'INSERT INTO intermediary_links (client_sds_id, parent_id, child_id, merchant_id) VALUES (?, ?, ?, ?)',
+                (client_sds_id, parent_id, child_id, merchant_id)
+            )
+            self._emit('intermediary_link', [cur.lastrowid], INSERT)
+            return cur.lastrowid
+
+    def delete_intermediary_link(self, link_id):
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute('DELETE FROM intermediary_links WHERE link_id = ?', (link_id,))
+            if cur.rowcount:
+                self._emit('intermediary_link', [link_id], DELETE)
+            return cur.rowcount
+
+    def merchants_via_intermediary(self, intermediary_id):
+        """Merchants reachable through the intermediary by any chain of
+        links, ordered by name, with `paths`: the number of distinct chains.
+        One range of the closure's primary key."""
+        return list(self._iter_rows(
+            "SELECT m.*, cl.paths FROM intermediary_closure cl "
+            "JOIN merchants m ON m.merchant_id = cl.descendant_id "
+            "WHERE cl.ancestor_kind = 'intermediary' AND cl.ancestor_id = ? AND cl.descendant_kind = 'merchant' "
+            "ORDER BY m.merchant_name, m.merchant_id",
+            (intermediary_id,)
+        ))
+
+    def intermediary_routes(self, client_sds_id, merchant_id):
+        """Number of distinct chains from the client to the merchant; 0 if
+        they are not connected. One closure lookup."""
+        row = self._fetch_one(
+            "SELECT paths FROM intermediary_closure WHERE ancestor_kind = 'client' AND ancestor_id = ? "
+            "AND descendant_kind = 'merchant' AND descendant_id = ?",
+            (client_sds_id, merchant_id)
+        )
+        return row['paths'] if row else 0
+
+    def intermediary_path(self, client_sds_id, merchant_id):
+        """Intermediaries along a shortest chain from the client to the
+        merchant, in order; None if they are not connected.
+
+        The closure gives the intermediaries on any chain between the two;
+        they and the links among them are read in two indexed queries and
+        the shortest chain is found in memory."""
+        on_route = (
+            "SELECT a.descendant_id FROM intermediary_closure a JOIN intermediary_closure b "
+            "ON b.ancestor_kind = 'intermediary' AND b.ancestor_id = a.descendant_id "
+            "AND b.descendant_kind = 'merchant' AND b.descendant_id = :merchant "
+            "WHERE a.ancestor_kind = 'client' AND a.ancestor_id = :client AND a.descendant_kind = 'intermediary'"
+        )
+        params = {'client': client_sds_id, 'merchant': merchant_id}
+        with self.pool.read() as conn:
+            links = conn.execute(
+                "SELECT 'client', child_id FROM intermediary_links "
+                f"WHERE client_sds_id = :client AND child_id IN ({on_route}) UNION ALL "
+                "SELECT parent_id, COALESCE(child_id, 'merchant') FROM intermediary_links "
+                f"WHERE parent_id IN ({on_route}) AND (child_id IN ({on_route}) OR merchant_id = :merchant)",
+                params
+            ).fetchall()
+            nodes = {row['intermediary_id']: dict(row) for row in conn.execute(
+                f"SELECT * FROM intermediaries WHERE intermediary_id IN ({on_route})", params)}
+        children = {}
+        for parent, child in links:
+            children.setdefault(parent, []).append(child)
+        # breadth first from 'client' to 'merchant'
+        previous = {'client': None}
+        frontier = ['client']
+        while frontier:
+            following = []
+            for node in frontier:
+                for child in children.get(node, ()):
+                    if child == 'merchant':
+                        path = []
+                        while node != 'client':
+                            path.append(node)
+                            node = previous[node]
+                        return [nodes[i] for i in reversed(path) if i in nodes]
+                    if child not in previous:
+                        previous[child] = node
+                        following.append(child)
+            frontier = following
+        return None
+
+    # ---- Keyset pagination ----
+    def fetch_merchants_page(self, after=None, limit=PAGE_SIZE, client_sds_id=None):
+        """One page of merchants ordered by (merchant_name, merchant_id).
+
+        `after` is the (merchant_name, merchant_id) of the last row of the
+        previous page, or None for the first page. Seeks via the key rather
+        than OFFSET, so deep pages cost the same as the first.
+        """
+        where, params = [], []
+        if client_sds_id is not None:
+            where.append("m.client_sds_id = ?")
+            params.append(client_sds_id)
+        if after is not None:
+            where.append("(m.merchant_name, m.merchant_id) > (?, ?)")
+            params.extend(after)
+        sql = (
+            "SELECT m.*, c.entity_name AS client_name "
+            "FROM merchants m "
+            "LEFT JOIN clients c ON m.client_sds_id = c.sds_id "
+            + ("WHERE " + " AND ".join(where) + " " if where else "")
+            + "ORDER BY m.merchant_name, m.merchant_id LIMIT ?"
+        )
+        params.append(int(limit))
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return [dict(row) for row in cur.fetchall()]
+
+    def fetch_merchants_by_ids(self, merchant_ids):
+        """Merchants (with client_name, as in fetch_merchants_page) for the
+        given ids; missing ids are skipped. Used to refresh changed rows."""
+        return self._fetch_by_ids(
+            "SELECT m.*, c.entity_name AS client_name FROM merchants m "
+            "LEFT JOIN clients c ON m.client_sds_id = c.sds_id "
+            "WHERE m.merchant_id IN ({marks})", merchant_ids
+        )
+
+    def fetch_ratesheets_by_ids(self, ratesheet_ids):
+        """Ratesheets (with client_name and merchant_name, as in
+        fetch_ratesheets_page) for the given ids; missing ids are skipped."""
+        return self._fetch_by_ids(
+            "SELECT r.*, c.entity_name AS client_name, m.merchant_name FROM client_ratesheets r "
+            "LEFT JOIN clients c ON r.client_sds_id = c.sds_id "
+            "LEFT JOIN merchants m ON r.merchant_id = m.merchant_id "
+            "WHERE r.ratesheet_id IN ({marks})", ratesheet_ids
+        )
+
+    def _fetch_by_ids(self, sql, ids, chunk_size=500):
+        ids = list(ids)
+        out = []
+        with self.pool.read() as conn:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                cur = conn.execute(sql.format(marks=','.join('?' * len(chunk))), chunk)
+                out.extend(dict(row) for row in cur.fetchall())
+        return out
+
+    def fetch_ratesheets_page(self, after=None, limit=PAGE_SIZE, client_sds_id=None):
+        """One page of ratesheets ordered by effective_date DESC, ratesheet_id DESC.
+
+        `after` is the (effective_date, ratesheet_id) of the last row of the
+        previous page. Ratesheets without an effective_date sort last, as
+        they do in fetch_all_ratesheets().
+        """
+        where, params = [], []
+        if client_sds_id is not None:
+            where.append("r.client_sds_id = ?")
+            params.append(client_sds_id)
+        if after is not None:
+            eff, rid = after
+            if eff is None:
+                where.append("(r.effective_date IS NULL AND r.ratesheet_id < ?)")
+                params.append(rid)
+            else:
+                where.append(
+                    "(r.effective_date < ? OR r.effective_date IS NULL "
+                    "OR (r.effective_date = ? AND r.ratesheet_id < ?))"
+                )
+                params.extend((eff, eff, rid))
+        sql = (
+            "SELECT r.*, c.entity_name AS client_name, m.merchant_name "
+            "FROM client_ratesheets r "
+            "LEFT JOIN clients c ON r.client_sds_id = c.sds_id "
+            "LEFT JOIN merchants m ON r.merchant_id = m.merchant_id "
+            + ("WHERE " + " AND ".join(where) + " " if where else "")
+            + "ORDER BY r.effective_date DESC, r.ratesheet_id DESC LIMIT ?"
+        )
+        params.append(int(limit))
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return [dict(row) for row in cur.fetchall()]
+
+    def estimate_count(self, table, client_sds_id=None):
+        """Cheap row count for sizing pagers.
+
+        Scoped to a client it is an exact COUNT over the client_sds_id index.
+        Otherwise it is MAX(rowid), an O(log n) lookup that over-counts
+        deleted rows. (sqlite_stat1 is not used: it is only as fresh as the
+        last ANALYZE, so after a bulk import it under-counts badly.)
+        """
+        if table not in PAGED_TABLES:
+            raise ValueError(f"unknown table: {table}")
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            if client_sds_id is not None:
+                cur.execute(f"SELECT COUNT(1) FROM {table} WHERE client_sds_id = ?", (client_sds_id,))
+                return cur.fetchone()[0]
+            cur.execute(f"SELECT MAX(rowid) FROM {table}")
+            return cur.fetchone()[0] or 0
+
+    # ---- Full-text search ----
+    @staticmethod
+    def _fts_query(text):
+        """Turn free text into an FTS5 query: every word must match, words of
+        two or more characters as a prefix (single letters would expand to
+        a large share of the vocabulary)."""
+        words = re.findall(r"\w+", text or '')
+        return ' '.join(f'"{w}"*' if len(w) > 1 else f'"{w}"' for w in words)
+
+    def search(self, query, limit=20):
+        """Ranked prefix search over client names/bank user ids, merchant
+        names/codes and ratesheet details.
+
+        Returns dicts with kind ('client' | 'merchant' | 'ratesheet'), id,
+        client_sds_id, title, detail and rank (bm25; lower is better).
+        """
+        match = self._fts_query(query)
+        if not match:
+            return []
+        limit = int(limit)
+        sql = (
+            "SELECT * FROM ("
+            "SELECT 'client' AS kind, c.sds_id AS id, c.sds_id AS client_sds_id, "
+            "c.entity_name AS title, c.bank_user_id AS detail, clients_fts.rank AS rank "
+            "FROM clients_fts JOIN clients c ON c.sds_id = clients_fts.rowid "
+            "WHERE clients_fts MATCH ? ORDER BY rank LIMIT ?) "
+            "UNION ALL SELECT * FROM ("
+            "SELECT 'merchant', m.merchant_id, m.client_sds_id, "
+            "m.merchant_name, m.merchant_code, merchants_fts.rank AS rank "
+            "FROM merchants_fts JOIN merchants m ON m.merchant_id = merchants_fts.rowid "
+            "WHERE merchants_fts MATCH ? ORDER BY rank LIMIT ?) "
+            "UNION ALL SELECT * FROM ("
+            "SELECT 'ratesheet', r.ratesheet_id, r.client_sds_id, "
+            "snippet(ratesheets_fts, 0, '[', ']', '...', 8), r.effective_date, ratesheets_fts.rank AS rank "
+            "FROM ratesheets_fts JOIN client_ratesheets r ON r.ratesheet_id = ratesheets_fts.rowid "
+            "WHERE ratesheets_fts MATCH ? ORDER BY rank LIMIT ?) "
+            "ORDER BY rank LIMIT ?"
+        )
+        with self.pool.read() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, (match, limit, match, limit, match, limit, limit))
+            return [dict(row) for row in cur.fetchall()]
+
+    # ---- Bulk inserts ----
+    @staticmethod
+    def _row_values(row, fields):
+        """Accept a dict keyed by column name or a tuple in column order."""
+        if isinstance(row, dict):
+            return tuple(row.get(f) for f in fields)
+        row = tuple(row)
+        return row + (None,) * (len(fields) - len(row))
+
+    def _bulk_insert(self, sql, rows, fields, chunk_size, rowid_field=None, table=None, tags=None, entity=None):
+        """Insert `rows` in chunks inside a single transaction.
+
+        Returns the generated rowids in input order (or the values of
+        `rowid_field`, the key column of `table`, when the key is supplied
+        by the caller). Rowids are
+        derived from last_insert_rowid(): while we hold the writer, an
+        AUTOINCREMENT table hands out consecutive ids within one chunk.
+        `tags(values, rowid)` names the cache tags each new row invalidates;
+        with `entity` an insert ChangeEvent is published per row. Rows an
+        INSERT OR IGNORE skipped invalidate nothing and publish no event.
+        """
+        chunk_size = max(1, int(chunk_size or BULK_CHUNK_SIZE))
+        rows = iter(rows)
+        ids = []
+        inserted = []
+        stale = set()
+        with self.transaction() as tx:
+            cur = tx.conn.cursor()
+            while True:
+                chunk = [self._row_values(r, fields) for r in islice(rows, chunk_size)]
+                if not chunk:
+                    break
+                if rowid_field is not None:
+                    # caller-supplied keys may already exist and be ignored:
+                    # only the first row of each key not yet stored is written
+                    idx = fields.index(rowid_field)
+                    keys = [vals[idx] for vals in chunk]
+                    ids.extend(keys)
+                    new = {}
+                    present = self._present_keys(cur, table, rowid_field, keys)
+                    for vals in chunk:
+                        if vals[idx] not in present:
+                            new.setdefault(vals[idx], vals)
+                    cur.executemany(sql, chunk)
+                    if cur.rowcount != len(new):
+                        # some other constraint ignored a row: see what landed
+                        present = self._present_keys(cur, table, rowid_field, list(new))
+                        new = {k: v for k, v in new.items() if k in present}
+                    chunk = list(new.values())
+                    chunk_ids = list(new)
+                    inserted.extend(chunk_ids)
+                else:
+                    cur.executemany(sql, chunk)
+                    if cur.rowcount != len(chunk):
+                        raise sqlite3.IntegrityError(
+                            f"bulk insert wrote {cur.rowcount} of {len(chunk)} rows")
+                    last = tx.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    chunk_ids = range(last - len(chunk) + 1, last + 1)
+                    ids.extend(chunk_ids)
+                    inserted.extend(chunk_ids)
+                if tags is not None:
+                    for vals, rowid in zip(chunk, chunk_ids):
+                        stale.update(tags(vals, rowid))
+            if stale:
+                self._invalidate(*stale)
+            if entity is not None and inserted:
+                self._emit(entity, inserted, INSERT)
+        return ids
+
+    @staticmethod
+    def _present_keys(cur, table, column, keys):
+        """The `keys` already stored in `table`.`column`; one query for a chunk."""
+        if not keys:
+            return set()
+        cur.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({','.join('?' * len(keys))})", keys)
+        return {key for (key,) in cur.fetchall()}
+
+    def insert_clients(self, rows, chunk_size=None):
+        """Bulk insert_client(). Rows are (sds_id, entity_name, bank_user_id,
+        timezone, end_of_day) tuples or dicts; returns the sds_ids in order.
+        Existing sds_ids are ignored, as in insert_client()."""
+        return self._bulk_insert(
+            'INSERT OR IGNORE INTO clients(sds_id, entity_name, bank_user_id, timezone, end_of_day) VALUES (?,?,?,?,?)',
+            rows, CLIENT_FIELDS, chunk_size, rowid_field='sds_id', table='clients',
+            tags=lambda vals, rowid: [('clients', '*'), ('clients', rowid)], entity='client'
+        )
+
+    def insert_merchants(self, rows, chunk_size=None):
+        """Bulk insert_merchant(). Rows are (client_sds_id, merchant_name,
+        merchant_code) tuples or dicts; returns merchant_ids in order."""
+        return self._bulk_insert(
+            'INSERT INTO merchants (client_sds_id, merchant_name, merchant_code) VALUES (?, ?, ?)',
+            rows, MERCHANT_FIELDS, chunk_size,
+            tags=lambda vals, rowid: _new_merchant_tags(vals[0], rowid), entity='merchant'
+        )
+
+    def insert_ratesheets(self, rows, chunk_size=None):
+        """Bulk insert_ratesheet(). Rows are (client_sds_id, merchant_id,
+        effective_date, expiry_date, rate_details) tuples or dicts; returns
+        ratesheet_ids in order."""
+        return self._bulk_insert(
+            'INSERT INTO client_ratesheets (client_sds_id, merchant_id, effective_date, expiry_date, rate_details) VALUES (?, ?, ?, ?, ?)',
+            rows, RATESHEET_FIELDS, chunk_size,
+            tags=lambda vals, rowid: _new_ratesheet_tags(vals[0], vals[1], rowid), entity='ratesheet'
+        )
+
+    # ---- Change journal ----
+    def changes_since(self, seq=0, limit=PAGE_SIZE):
+        """Up to `limit` journal entries after `seq`, oldest first.
+
+        Each is a dict with seq, table, id, op ('insert'/'update'/'delete'),
+        changed_at and row: the row's current state, None once deleted.
+        Pass the last seq back in to continue. Treat insert and update alike
+        as upserts: compaction keeps only each row's latest entry.
+        """
+        with self.pool.read_primary() as conn:
+            entries = conn.execute(
+                "SELECT seq, table_name, row_id, op, changed_at FROM change_log "
+                "WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+            wanted = {}
+            for e in entries:
+                if e['op'] != 'delete':
+                    wanted.setdefault(e['table_name'], set()).add(e['row_id'])
+            rows = {}
+            for table, ids in wanted.items():
+                key = ChangeJournal.TABLES[table]
+                ids = sorted(ids)
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    cur = conn.execute(
+                        f"SELECT {'rowid, ' if key == 'rowid' else ''}* FROM {table} "
+                        f"WHERE {key} IN ({','.join('?' * len(chunk))})", chunk)
+                    for row in cur.fetchall():
+                        rows[(table, row[key])] = dict(row)
+        return [{
+            'seq': e['seq'],
+            'table': e['table_name'],
+            'id': e['row_id'],
+            'op': e['op'],
+            'changed_at': e['changed_at'],
+            'row': rows.get((e['table_name'], e['row_id'])) if e['op'] != 'delete' else None,
+        } for e in entries]
+
+    def latest_change_seq(self):
+        """The highest sequence number ever handed out (0 if none)."""
+        with self.pool.read_primary() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+
+    def compact_changes(self, before=None, batch=50_000):
+        """Drop journal entries superseded by a later entry for the same row,
+        and delete tombstones with seq <= `before` (the lowest seq every
+        consumer has acknowledged). Runs in `batch`-sized seq ranges, one
+        transaction each, so writers get in between. Returns rows removed.
+        """
+        with self.pool.read_primary() as conn:
+            lo, hi = conn.execute("SELECT MIN(seq), MAX(seq) FROM change_log").fetchone()
+        removed = 0
+        if lo is None:
+            return removed
+        for start in range(lo - 1, hi, batch):
+            with self.transaction() as tx:
+                cur = tx.conn.execute(
+                    "DELETE FROM change_log WHERE seq > ? AND seq <= ? AND seq < ("
+                    "SELECT MAX(c.seq) FROM change_log c "
+                    "WHERE c.table_name = change_log.table_name AND c.row_id = change_log.row_id)",
+                    (start, start + batch)
+                )
+                removed += cur.rowcount
+                if before is not None:
+                    cur = tx.conn.execute(
+                        "DELETE FROM change_log WHERE op = 'delete' AND seq > ? AND seq <= ? AND seq <= ?",
+                        (start, start + batch, before)
+                    )
+                    removed += cur.rowcount
+        print(f"[changes] compacted {removed} journal entries")
+        return removed
 
     # ---- Close ----
     def close(self):
-        self.conn.close()
+        try:
+            # refresh planner statistics for tables whose shape has drifted
+            with self.pool.write() as conn:
+                conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        self.pool.close()
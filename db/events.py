@@ -0,0 +1,56 @@
+# db/events.py
+import threading
+from typing import NamedTuple
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+class ChangeEvent(NamedTuple):
+    """One committed row change. entity is 'client', 'merchant',
+    'ratesheet', 'rate_tier', 'ratesheet_rate', 'limit', 'intermediary' or
+    'intermediary_link'; id is that entity's key ((ratesheet_id,
+    currency_pair) for ratesheet rates). Upserts of ratesheet rates and
+    limits are reported as 'update'."""
+    entity: str
+    id: object
+    op: str
+
+
+class EventBus:
+    """Fan-out of committed ChangeEvents.
+
+    Subscribers are called with a list of events (one transaction's worth
+    or less) on the thread that committed; UI code must hop to its own
+    thread before touching widgets.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    @property
+    def active(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, fn, entities=None):
+        """Call fn(events) for committed changes, optionally only for the
+        given entity names. Returns a function that unsubscribes."""
+        entry = (fn, frozenset(entities) if entities else None)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def publish(self, events):
+        for fn, entities in self._subscribers:
+            batch = events if entities is None else [e for e in events if e.entity in entities]
+            if not batch:
+                continue
+            try:
+                fn(batch)
+            except Exception as ex:
+                print(f"[events] subscriber {fn!r} failed: {ex}")
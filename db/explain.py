@@ -0,0 +1,330 @@
+# db/explain.py
+"""Run EXPLAIN QUERY PLAN over every query DBManager issues.
+
+A representative call of each public DBManager method is replayed against
+an in-memory copy of the database, so real data shapes apply and the file
+itself is never written. Statistics are dropped from the copy (keep them
+with --analyze, which refreshes them), so the verdict does not depend on
+how many rows the file happens to hold. Every statement a method runs is captured with
+its parameters at the cursor. That includes trigger bodies but not SQLite's
+internal FTS bookkeeping. Each plan is then checked for full table scans
+and temp B-tree sorts.
+
+    python -m db.explain [--db PATH] [--all] [--analyze]
+
+Exits 1 when any finding is not in ACCEPTED, or when a public method is
+neither replayed nor listed in NOT_REPLAYED.
+"""
+import argparse
+import inspect
+import re
+import sqlite3
+import sys
+from .metrics import QueryStats
+from .reports import REPORTS
+
+SKIP_PREFIXES = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA', 'EXPLAIN', 'ANALYZE', '--')
+
+# Public methods with no SQL of their own to replay
+NOT_REPLAYED = ('ensure_schema', 'seed_sample_data', 'transaction_log', 'reports')
+
+def statement_key(sql):
+    """`sql` as ACCEPTED matches it: whitespace collapsed, IN lists of any
+    length shortened to (?, ...)."""
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', sql)
+
+
+_SEARCH = ("SELECT * FROM (SELECT 'client' AS kind, c.sds_id AS id, c.sds_id AS client_sds_id, "
+           "c.entity_name AS title, c.bank_user_id AS detail, clients_fts.rank AS rank FROM clients_fts ...")
+_LOAD = "loads the whole table into an in-memory index on purpose; rebuilt only after a change"
+_REPORT = "a report aggregates whole tables; it runs on demand and is cached until the next commit"
+
+
+def _report(name, *lines):
+    return {(statement_key(REPORTS[name][1]), line): _REPORT for line in lines}
+
+
+# Findings that are understood and accepted: (statement, plan line) ->
+# reason. The statement is its SQL as statement_key() gives it, or a prefix
+# of that ending in ' ...'; the plan line must match exactly. Accepted
+# findings are reported as notes, anything else is a flag.
+ACCEPTED = {
+    (_SEARCH, 'USE TEMP B-TREE FOR ORDER BY'):
+        "FTS hits are ordered by bm25 rank, which has no index; the sort is over matches only",
+    ("SELECT l.*, c.entity_name, m.merchant_name FROM trade_limits l ...", 'USE TEMP B-TREE FOR ORDER BY'):
+        "sorted by client and merchant name from the joined tables, which no trade_limits "
+        "index can cover; the sort is over the (few) limit rows only",
+    ("SELECT m.*, cl.paths FROM intermediary_closure cl ...", 'USE TEMP B-TREE FOR ORDER BY'):
+        "sorted by merchant name from the joined table; the sort is over one intermediary's merchants",
+    ("SELECT * FROM client_ratesheets", 'SCAN client_ratesheets'): _LOAD,
+    ("SELECT * FROM rate_tiers", 'SCAN rate_tiers'): _LOAD,
+    ("SELECT * FROM ratesheet_rates", 'SCAN ratesheet_rates'): _LOAD,
+    ("SELECT limit_id, client_sds_id, merchant_id, currency, single_trade_max, daily_max FROM trade_limits",
+     'SCAN trade_limits'): _LOAD,
+    ("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'", 'SCAN sqlite_sequence'):
+        "sqlite_sequence holds one row per AUTOINCREMENT table and cannot be indexed",
+    **_report('expiring_ratesheets', 'SCAN r', 'USE TEMP B-TREE FOR ORDER BY'),
+    **_report('merchants_without_ratesheets', 'USE TEMP B-TREE FOR ORDER BY'),
+    **_report('clients_by_timezone', 'SCAN c', 'USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR ORDER BY'),
+    **_report('onboarding_per_day', 'SCAN merchants', 'SCAN client_ratesheets',
+              'USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR ORDER BY'),
+}
+
+
+def accepted(sql, finding):
+    """The ACCEPTED reason covering `finding` (a plan line) in `sql`, or None."""
+    key = statement_key(sql)
+    for (statement, line), reason in ACCEPTED.items():
+        if line != finding:
+            continue
+        if statement == key or (statement.endswith(' ...') and key.startswith(statement[:-3])):
+            return reason
+    return None
+
+
+class _Capture(QueryStats):
+    """Stands in for the writer's QueryStats: keeps every statement with its
+    parameters, under the workload label being replayed."""
+    def __init__(self):
+        super().__init__()
+        self.label = None
+        self.statements = []
+
+    def record_sql(self, conn, sql, params, ms, returned, touched):
+        text = sql.strip()
+        if self.label is not None and text and not text.upper().startswith(SKIP_PREFIXES):
+            self.statements.append((self.label, text, params))
+
+
+def _workload(db):
+    """(label, callable) pairs covering DBManager's query surface. A label
+    names the method it calls, optionally followed by '(variant)'."""
+    def first(sql, default=1):
+        row = db.conn.execute(sql).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    sds = first("SELECT sds_id FROM clients LIMIT 1")
+    mid = first("SELECT merchant_id FROM merchants LIMIT 1")
+    mname = first("SELECT merchant_name FROM merchants LIMIT 1", 'x')
+    rid = first("SELECT ratesheet_id FROM client_ratesheets LIMIT 1")
+    eff = first("SELECT effective_date FROM client_ratesheets WHERE effective_date IS NOT NULL LIMIT 1", '2025-01-01')
+    new_sds = first("SELECT MAX(sds_id) + 1 FROM clients", 1)
+    # ids of rows the replay creates, for the calls that follow
+    made = {}
+
+    def make(key, value):
+        made[key] = value
+        return value
+
+    pairs = ('EUR/USD', 'USD/JPY')
+    trade = (sds, mid, 'EUR', 1000.0)
+    reads = [
+        ('fetch_all_clients', lambda: db.fetch_all_clients()),
+        ('iter_all_clients', lambda: list(db.iter_all_clients())),
+        ('fetch_client_by_sds', lambda: db.fetch_client_by_sds(sds)),
+        ('fetch_client_summaries', lambda: db.fetch_client_summaries()),
+        ('fetch_client_summaries(ids)', lambda: db.fetch_client_summaries([sds])),
+        ('fetch_merchants_by_client', lambda: db.fetch_merchants_by_client(sds)),
+        ('iter_merchants_by_client', lambda: list(db.iter_merchants_by_client(sds))),
+        ('fetch_all_merchants', lambda: db.fetch_all_merchants()),
+        ('iter_all_merchants', lambda: list(db.iter_all_merchants())),
+        ('fetch_merchant_by_id', lambda: db.fetch_merchant_by_id(mid)),
+        ('fetch_merchant_by_name', lambda: db.fetch_merchant_by_name(sds, mname)),
+        ('fetch_merchants_by_ids', lambda: db.fetch_merchants_by_ids([mid])),
+        ('fetch_ratesheets_by_client', lambda: db.fetch_ratesheets_by_client(sds)),
+        ('iter_ratesheets_by_client', lambda: list(db.iter_ratesheets_by_client(sds))),
+        ('fetch_all_ratesheets', lambda: db.fetch_all_ratesheets()),
+        ('iter_all_ratesheets', lambda: list(db.iter_all_ratesheets())),
+        ('fetch_ratesheets_by_merchant', lambda: db.fetch_ratesheets_by_merchant(mid)),
+        ('iter_ratesheets_by_merchant', lambda: list(db.iter_ratesheets_by_merchant(mid))),
+        ('fetch_ratesheet_by_id', lambda: db.fetch_ratesheet_by_id(rid)),
+        ('fetch_ratesheets_by_ids', lambda: db.fetch_ratesheets_by_ids([rid])),
+        ('active_ratesheet', lambda: db.active_ratesheet(sds, mid, eff)),
+        ('active_ratesheet(client)', lambda: db.active_ratesheet(sds, None, eff)),
+        ('ratesheet_index', lambda: db.ratesheet_index()),
+        ('active_ratesheets', lambda: db.active_ratesheets([(sds, mid, eff)])),
+        ('iter_ratesheets', lambda: list(db.iter_ratesheets())),
+        ('fetch_merchants_page', lambda: db.fetch_merchants_page()),
+        ('fetch_merchants_page(after)', lambda: db.fetch_merchants_page(after=(mname, mid))),
+        ('fetch_merchants_page(client)', lambda: db.fetch_merchants_page(after=(mname, mid), client_sds_id=sds)),
+        ('fetch_ratesheets_page', lambda: db.fetch_ratesheets_page()),
+        ('fetch_ratesheets_page(after)', lambda: db.fetch_ratesheets_page(after=(eff, rid))),
+        ('fetch_ratesheets_page(client)', lambda: db.fetch_ratesheets_page(after=(eff, rid), client_sds_id=sds)),
+        ('estimate_count', lambda: db.estimate_count('merchants')),
+        ('estimate_count(client)', lambda: db.estimate_count('merchants', sds)),
+        ('search', lambda: db.search(mname)),
+        ('fetch_rate_tiers', lambda: db.fetch_rate_tiers(rid)),
+        ('iter_rate_tiers', lambda: list(db.iter_rate_tiers())),
+        ('rate_engine', lambda: db.rate_engine()),
+        ('price_batch', lambda: db.price_batch([rid], [pairs[0]], [1000.0])),
+        ('fetch_ratesheet_rates', lambda: db.fetch_ratesheet_rates(rid)),
+        ('iter_ratesheet_rates', lambda: list(db.iter_ratesheet_rates())),
+        ('cross_engine', lambda: db.cross_engine()),
+        ('cross_rate_matrix', lambda: db.cross_rate_matrix(rid)),
+        ('cross_rate', lambda: db.cross_rate(rid, 'EUR/JPY')),
+        ('cross_rates', lambda: db.cross_rates(rid)),
+        ('fetch_limits', lambda: db.fetch_limits()),
+        ('fetch_limits(client)', lambda: db.fetch_limits(sds)),
+        ('limit_index', lambda: db.limit_index()),
+        ('check_limits', lambda: db.check_limits([trade])),
+        ('fetch_intermediaries', lambda: db.fetch_intermediaries()),
+        ('changes_since', lambda: db.changes_since(0, limit=100)),
+        ('latest_change_seq', lambda: db.latest_change_seq()),
+    ] + [(f'report({name})', lambda name=name: db.report(name)) for name in REPORTS]
+    writes = [
+        ('insert_client', lambda: db.insert_client(new_sds, 'explain probe')),
+        ('insert_clients', lambda: db.insert_clients([(new_sds, 'explain probe'), (new_sds + 1, 'explain probe')])),
+        ('update_client', lambda: db.update_client(sds, {'timezone': 'UTC+0'})),
+        ('insert_merchant', lambda: make('merchant', db.insert_merchant(sds, 'explain probe'))),
+        ('insert_merchants', lambda: db.insert_merchants([(sds, 'explain probe 2')])),
+        ('update_merchant', lambda: db.update_merchant(mid, {'merchant_code': 'X'})),
+        ('insert_ratesheet', lambda: make('ratesheet', db.insert_ratesheet(sds, mid, eff, None, 'explain probe'))),
+        ('insert_ratesheets', lambda: db.insert_ratesheets([(sds, None, eff, None, 'explain probe')])),
+        ('update_ratesheet', lambda: db.update_ratesheet(rid, {'rate_details': 'X'})),
+        ('insert_rate_tier', lambda: make('tier', db.insert_rate_tier(rid, pairs[0], 0, None, 5, 0))),
+        ('insert_rate_tiers', lambda: db.insert_rate_tiers([(rid, pairs[1], 0, None, 5, 0)])),
+        ('update_rate_tier', lambda: db.update_rate_tier(made['tier'], {'margin_bps': 7})),
+        ('delete_rate_tier', lambda: db.delete_rate_tier(made['tier'])),
+        ('set_ratesheet_rate', lambda: db.set_ratesheet_rate(rid, pairs[0], 1.1)),
+        ('set_ratesheet_rates', lambda: db.set_ratesheet_rates(rid, {pairs[0]: 1.2, pairs[1]: 150.0})),
+        ('set_limit', lambda: make('limit', db.set_limit(sds, mid, 'EUR', 50_000.0, 100_000.0))),
+        ('record_trades', lambda: db.record_trades([trade])),
+        ('delete_limit', lambda: db.delete_limit(made['limit'])),
+        ('insert_intermediary', lambda: make('parent', db.insert_intermediary('explain probe'))),
+        ('insert_intermediary(child)', lambda: make('child', db.insert_intermediary('explain probe 2'))),
+        ('update_intermediary', lambda: db.update_intermediary(made['parent'], {'code': 'X'})),
+        ('insert_intermediary_link', lambda: db.insert_intermediary_link(client_sds_id=sds, child_id=made['parent'])),
+        ('insert_intermediary_link(between)',
+         lambda: make('link', db.insert_intermediary_link(parent_id=made['parent'], child_id=made['child']))),
+        ('insert_intermediary_link(merchant)',
+         lambda: db.insert_intermediary_link(parent_id=made['child'], merchant_id=mid)),
+        ('fetch_intermediary', lambda: db.fetch_intermediary(made['parent'])),
+        ('fetch_intermediary_links', lambda: db.fetch_intermediary_links(made['parent'])),
+        ('merchants_via_intermediary', lambda: db.merchants_via_intermediary(made['parent'])),
+        ('intermediary_routes', lambda: db.intermediary_routes(sds, mid)),
+        ('intermediary_path', lambda: db.intermediary_path(sds, mid)),
+        ('delete_intermediary_link', lambda: db.delete_intermediary_link(made['link'])),
+        ('delete_intermediary', lambda: db.delete_intermediary(made['child'])),
+        ('recount_active_ratesheets', lambda: db.recount_active_ratesheets()),
+        ('compact_changes', lambda: db.compact_changes(before=first("SELECT MAX(seq) FROM change_log", 0))),
+        ('delete_ratesheet', lambda: db.delete_ratesheet(made['ratesheet'])),
+        ('delete_merchant', lambda: db.delete_merchant(made['merchant'])),
+        ('delete_client', lambda: db.delete_client(new_sds)),
+    ]
+    return reads + writes
+
+
+def not_replayed(db, labels):
+    """Public DBManager methods the workload does not call."""
+    called = {label.split('(')[0] for label in labels}
+    skipped = set(NOT_REPLAYED) | set(getattr(type(db), 'UNTIMED', ()))
+    return sorted(name for name, _ in inspect.getmembers(type(db), inspect.isfunction)
+                  if not name.startswith('_') and name not in called and name not in skipped)
+
+
+def plan_findings(plan_rows):
+    """Flags for one statement's plan: full scans and temp B-tree sorts."""
+    flags = []
+    for detail in plan_rows:
+        if detail.startswith('SCAN (subquery') or detail.startswith('SCAN CONSTANT ROW'):
+            continue
+        if detail.startswith('SCAN ') and ' INDEX ' not in detail and 'VIRTUAL TABLE' not in detail:
+            flags.append(detail)
+        if 'USE TEMP B-TREE' in detail:
+            flags.append(detail)
+    return flags
+
+
+def explain(db):
+    """Replay the workload on `db` and return [(label, sql, plan, findings)]
+    with findings [(plan line, accepted reason or None)]."""
+    capture = _Capture()
+    db.conn.metrics = capture
+    try:
+        for label, call in _workload(db):
+            capture.label = label
+            try:
+                call()
+            except (sqlite3.Error, ImportError) as ex:
+                print(f"[explain] {label} failed: {ex}", file=sys.stderr)
+            capture.label = None
+    finally:
+        db.conn.metrics = db.metrics
+
+    results = []
+    seen = set()
+    for label, sql, params in capture.statements:
+        key = statement_key(sql)
+        if key in seen:
+            continue
+        seen.add(key)
+        cur = sqlite3.Cursor(db.conn)       # a plain cursor, outside the capture
+        plan = [row[3] for row in cur.execute("EXPLAIN QUERY PLAN " + sql, params or ())]
+        results.append((label, sql, plan, [(f, accepted(sql, f)) for f in plan_findings(plan)]))
+    return results
+
+
+def _drop_statistics(conn):
+    """Empty sqlite_stat1 of `conn`. Statistics already loaded stay in use
+    until the schema is reloaded, which a backup into conn forces."""
+    scratch = sqlite3.connect(':memory:')
+    try:
+        conn.backup(scratch)
+        if scratch.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            scratch.execute("DELETE FROM sqlite_stat1")
+            scratch.commit()
+        scratch.backup(conn)
+    finally:
+        scratch.close()
+
+
+def main(argv=None):
+    from config import DB_PATH
+    from .db_manager import DBManager
+    parser = argparse.ArgumentParser(prog="python -m db.explain")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--all", action="store_true", help="print plans for clean statements too")
+    parser.add_argument("--analyze", action="store_true",
+                        help="plan with ANALYZE statistics of the file's data instead of none")
+    args = parser.parse_args(argv)
+
+    # stats on, so the writer is an InstrumentedConnection the capture can stand in for
+    db = DBManager(':memory:', cache_size=0, stats=True)
+    src = sqlite3.connect(args.db)
+    try:
+        src.backup(db.conn)
+    finally:
+        src.close()
+    db.ensure_schema()   # explain against the current schema even if the file lags
+    # without statistics SQLite plans every table as large, so the verdict
+    # does not depend on how much data the file happens to hold
+    if args.analyze:
+        db.conn.execute("ANALYZE")
+        db.conn.commit()
+    else:
+        _drop_statistics(db.conn)
+
+    flagged = 0
+    results = explain(db)
+    for label, sql, plan, findings in results:
+        if not findings and not args.all:
+            continue
+        bad = [f for f, reason in findings if reason is None]
+        flagged += bool(bad)
+        print(f"{'FLAG' if bad else 'note' if findings else 'ok  '} {label}")
+        print(f"     {sql}")
+        for line in plan:
+            print(f"       {line}")
+        for f, reason in findings:
+            print(f"     {'!' if reason is None else '-'} {f}" + (f"  ({reason})" if reason else ""))
+    missing = not_replayed(db, [label for label, _ in _workload(db)])
+    if missing:
+        print(f"[explain] not replayed: {', '.join(missing)}")
+    print(f"[explain] {len(results)} statements, {flagged} flagged")
+    db.close()
+    return 1 if flagged or missing else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,167 @@
+# db/limits.py
+"""GET limits: how much a client, or one of its merchants, may trade.
+
+    breaches = db.check_limits([(sds_id, merchant_id, 'EUR', 25_000.0), ...])
+    db.record_trades([(sds_id, merchant_id, 'EUR', 25_000.0), ...])
+    python -m db.limits [--db PATH] [--trades N]   # throughput benchmark
+
+A limit (models.TradeLimit) caps the single trade and the day's total, per
+currency. A trade is checked against its merchant's limit and its client's
+limit; both must pass. Within a scope a row for the trade's currency wins
+over the scope's default row (currency NULL). No limit means unlimited.
+
+LimitIndex holds every limit and the day's usage in dicts, so a check is a
+handful of hash lookups.
+"""
+import argparse
+import random
+import time
+from typing import NamedTuple
+from config import DB_PATH
+from .ratesheet_index import as_of_key
+
+
+class LimitBreach(NamedTuple):
+    limit_id: int
+    kind: str           # 'single' or 'daily'
+    scope: str          # 'merchant' or 'client'
+    limit: float
+    amount: float       # the trade, or the day's total including it
+
+
+def normalize_currency(currency):
+    """'eur ' -> 'EUR'; None and '' (any currency) -> None."""
+    currency = (currency or '').strip().upper()
+    return currency or None
+
+
+def _trade(request):
+    if isinstance(request, dict):
+        return (request['client_sds_id'], request.get('merchant_id'),
+                request['currency'], float(request['amount']))
+    client_sds_id, merchant_id, currency, amount = request
+    return client_sds_id, merchant_id, currency, float(amount)
+
+
+class LimitIndex:
+    """Every trade_limits row and `day`'s limit_usage, keyed for O(1) lookup.
+
+    limits: (client_sds_id, merchant_id or None, currency or None) ->
+            (limit_id, single_trade_max, daily_max)
+    usage:  (client_sds_id, merchant_id, currency) -> amount traded on `day`;
+            merchant_id None holds the client's total over all merchants
+    """
+    def __init__(self, limits, usage, day=None):
+        self.day = as_of_key(day)
+        self.limits = {}
+        for r in limits:
+            self.put(r)
+        self.usage = {}
+        for r in usage:
+            self.add_usage(r['client_sds_id'], r['merchant_id'] or None, r['currency'], r['amount'])
+
+    def put(self, row):
+        self.limits[(row['client_sds_id'], row.get('merchant_id'), row.get('currency'))] = (
+            row['limit_id'], row.get('single_trade_max'), row.get('daily_max'))
+
+    def add_usage(self, client_sds_id, merchant_id, currency, amount):
+        usage = self.usage
+        if merchant_id is not None:
+            key = (client_sds_id, merchant_id, currency)
+            usage[key] = usage.get(key, 0.0) + amount
+        key = (client_sds_id, None, currency)
+        usage[key] = usage.get(key, 0.0) + amount
+
+    def used(self, client_sds_id, merchant_id, currency):
+        """Amount traded on `day` by the merchant, or the whole client
+        (merchant_id None), in `currency`."""
+        return self.usage.get((client_sds_id, merchant_id, normalize_currency(currency)), 0.0)
+
+    def check(self, requests, cumulative=False):
+        """A tuple of LimitBreach per (client_sds_id, merchant_id, currency,
+        amount) request, in input order; empty when the trade is allowed.
+
+        Each request is checked against usage as recorded. With `cumulative`
+        the allowed requests of the batch count towards the daily totals of
+        the ones after them, as if they had been traded in that order.
+        """
+        limits = self.limits
+        usage = self.usage
+        pending = {} if cumulative else None
+        out = []
+        for request in requests:
+            client_sds_id, merchant_id, currency, amount = _trade(request)
+            currency = normalize_currency(currency)
+            breaches = ()
+            keys = []
+            for scope, m in (('merchant', merchant_id), ('client', None)):
+                if scope == 'merchant' and merchant_id is None:
+                    continue
+                key = (client_sds_id, m, currency)
+                keys.append(key)
+                limit = limits.get(key) or limits.get((client_sds_id, m, None))
+                if limit is None:
+                    continue
+                limit_id, single_max, daily_max = limit
+                if single_max is not None and amount > single_max:
+                    breaches += (LimitBreach(limit_id, 'single', scope, single_max, amount),)
+                if daily_max is not None:
+                    total = usage.get(key, 0.0) + amount
+                    if pending:
+                        total += pending.get(key, 0.0)
+                    if total > daily_max:
+                        breaches += (LimitBreach(limit_id, 'daily', scope, daily_max, total),)
+            if pending is not None and not breaches:
+                for key in keys:
+                    pending[key] = pending.get(key, 0.0) + amount
+            out.append(breaches)
+        return out
+
+
+# ---- benchmark ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.limits")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--trades", type=int, default=100_000, help="requests per batch")
+    args = parser.parse_args(argv)
+
+    from .db_manager import DBManager
+    db = DBManager(args.db, cache_size=0, stats=False)
+    try:
+        rng = random.Random(42)
+        with db.pool.read() as conn:
+            pairs = [tuple(r) for r in conn.execute(
+                "SELECT client_sds_id, merchant_id FROM merchants ORDER BY random() LIMIT 5000")]
+        if not pairs:
+            raise SystemExit("no merchants to trade for; seed or import data first")
+        start = time.perf_counter()
+        index = db.limit_index()
+        print(f"[limits] index: {len(index.limits)} limits, {len(index.usage)} usage totals "
+              f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+        if not index.limits:
+            # nothing to hit: check against made-up limits, kept out of the file
+            print("[limits] no limits in the database; benchmarking against generated ones")
+            made_up = []
+            for i, (c, m) in enumerate(pairs):
+                made_up.append({'limit_id': -2 * i - 1, 'client_sds_id': c, 'merchant_id': m, 'currency': None,
+                                'single_trade_max': 50_000.0, 'daily_max': 200_000.0})
+                made_up.append({'limit_id': -2 * i - 2, 'client_sds_id': c, 'merchant_id': None, 'currency': 'USD',
+                                'single_trade_max': None, 'daily_max': 1_000_000.0})
+            index = LimitIndex(made_up, [])
+        currencies = ('USD', 'EUR', 'GBP', 'JPY')
+        requests = [(*rng.choice(pairs), rng.choice(currencies), rng.uniform(100, 80_000))
+                    for _ in range(args.trades)]
+        for cumulative in (False, True):
+            start = time.perf_counter()
+            result = index.check(requests, cumulative=cumulative)
+            elapsed = time.perf_counter() - start
+            print(f"[limits] {'cumulative' if cumulative else 'independent':<12}{len(requests)} checks in "
+                  f"{elapsed * 1000:.0f} ms ({len(requests) / elapsed:,.0f}/s), "
+                  f"{sum(1 for b in result if b)} rejected")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,384 @@
+# db/metrics.py
+"""Query timing instrumentation.
+
+Connections opened with InstrumentedConnection hand out cursors that time
+every statement from execute() until its last row has been fetched, and
+count rows returned (SELECT) and rows touched (INSERT/UPDATE/DELETE).
+Statements slower than the threshold are kept in a slow-query log with
+their EXPLAIN QUERY PLAN. @instrument on DBManager adds per-method timing.
+"""
+import functools
+import inspect
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# histogram bucket upper bounds in milliseconds; the last bucket is open
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_SPACE = re.compile(r'\s+')
+
+
+class Histogram:
+    """Fixed log-spaced latency buckets plus count/total/min/max."""
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th sample (max for the open one)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'min_ms': round(self.min_ms, 3) if self.min_ms is not None else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {(f"<={b}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): n
+                        for i, (b, n) in enumerate(zip(BUCKETS_MS + (BUCKETS_MS[-1],), self.counts)) if n},
+        }
+
+
+class _Entry:
+    """Latency histogram plus row counters for one SQL text or method."""
+    def __init__(self):
+        self.latency = Histogram()
+        self.rows_returned = 0
+        self.rows_touched = 0
+
+    def as_dict(self):
+        d = self.latency.as_dict()
+        d['rows_returned'] = self.rows_returned
+        d['rows_touched'] = self.rows_touched
+        return d
+
+
+class QueryStats:
+    """Thread-safe collector behind DBManager.stats()."""
+    def __init__(self, slow_ms=50.0, slow_log_size=100):
+        self.slow_ms = float(slow_ms)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._slow = deque(maxlen=slow_log_size)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._sql = {}
+            self._methods = {}
+            self._slow.clear()
+            self.started = time.time()
+
+    # ---- method context ----
+    def current_method(self):
+        stack = getattr(self._local, 'methods', None)
+        return stack[0] if stack else None
+
+    def _push(self, name):
+        stack = getattr(self._local, 'methods', None)
+        if stack is None:
+            stack = self._local.methods = []
+        stack.append(name)
+
+    def _pop(self):
+        self._local.methods.pop()
+
+    # ---- recording ----
+    def record_sql(self, conn, sql, params, ms, returned, touched):
+        key = _SPACE.sub(' ', sql).strip()
+        method = self.current_method()
+        with self._lock:
+            entry = self._sql.get(key)
+            if entry is None:
+                entry = self._sql[key] = _Entry()
+            entry.latency.add(ms)
+            entry.rows_returned += returned
+            entry.rows_touched += touched
+        if ms >= self.slow_ms:
+            self._slow.append({
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'ms': round(ms, 3),
+                'method': method,
+                'sql': key,
+                'params': _short_repr(params),
+                'rows_returned': returned,
+                'rows_touched': touched,
+                'plan': _plan(conn, sql, params),
+            })
+
+    def record_method(self, name, ms, returned=0, touched=0):
+        with self._lock:
+            entry = self._methods.get(name)
+            if entry is None:
+                entry = self._methods[name] = _Entry()
+            entry.latency.add(ms)
+            entry.rows_returned += returned
+            entry.rows_touched += touched
+
+    # ---- export ----
+    def snapshot(self):
+        """Plain-dict copy of everything collected, JSON-serialisable."""
+        with self._lock:
+            def by_total(entries):
+                items = sorted(entries.items(), key=lambda kv: kv[1].latency.total_ms, reverse=True)
+                return {k: v.as_dict() for k, v in items}
+            return {
+                'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                'slow_ms': self.slow_ms,
+                'methods': by_total(self._methods),
+                'sql': by_total(self._sql),
+                'slow_queries': list(self._slow),
+            }
+
+
+def _short_repr(params, limit=200):
+    text = repr(params)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _plan(conn, sql, params):
+    # a plain cursor, so the EXPLAIN itself is not recorded
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')):
+        return None
+    try:
+        cur = sqlite3.Cursor(conn)
+        return [row[3] for row in cur.execute("EXPLAIN QUERY PLAN " + sql, params or ())]
+    except sqlite3.Error as ex:
+        return [f"(plan unavailable: {ex})"]
+
+
+# ---- statement counting ----
+_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'END')
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Adds every statement it runs to its connection's `statements`, one
+    per parameter set for executemany(); transaction control is not
+    counted. Unlike a trace callback this never sees trigger steps or FTS
+    shadow-table writes."""
+    def execute(self, sql, params=()):
+        if _counted(sql):
+            self.connection.statements += 1
+        return super().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        if _counted(sql):
+            seq_of_params = self._counting(seq_of_params)
+        return super().executemany(sql, seq_of_params)
+
+    def _counting(self, seq_of_params):
+        conn = self.connection
+        for params in seq_of_params:
+            conn.statements += 1
+            yield params
+
+
+def _counted(sql):
+    word = sql.lstrip()[:10].split(None, 1)
+    return bool(word) and word[0].upper() not in _CONTROL
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3 connection counting the statements run on it (see
+    CountingCursor); UnitOfWork reads the count for TransactionStats."""
+    statements = 0
+    cursor_class = CountingCursor
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.cursor_class)
+
+    # Connection.execute*() build their cursor internally; route them
+    # through cursor() so they are counted too
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+# ---- instrumented connection / cursor ----
+class InstrumentedCursor(CountingCursor):
+    """Times a statement from execute() until its rows run out, the cursor
+    is re-executed or closed, or it is garbage collected."""
+    _pending = None
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, params)
+        self._start_pending(sql, params, start, self.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        if not isinstance(seq_of_params, (list, tuple)):
+            seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_params)
+        # the first row stands in for the batch when a plan is captured
+        self._start_pending(sql, seq_of_params[0] if seq_of_params else None, start, self.rowcount)
+        return self
+
+    def _start_pending(self, sql, params, start, rowcount):
+        elapsed = time.perf_counter() - start
+        if self.description is None:
+            # no result set: the work is done
+            self._record(sql, params, elapsed, 0, max(rowcount, 0))
+        else:
+            self._pending = [sql, params, elapsed, 0]
+
+    def _fetched(self, start, n, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += n
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, params, elapsed, returned = pending
+            self._record(sql, params, elapsed, returned, 0)
+
+    def _record(self, sql, params, elapsed, returned, touched):
+        stats = getattr(self.connection, 'metrics', None)
+        if stats is not None:
+            stats.record_sql(self.connection, sql, params, elapsed * 1000.0, returned, touched)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(CountingConnection):
+    """sqlite3 connection whose cursors report to `self.metrics`."""
+    metrics = None
+    cursor_class = InstrumentedCursor
+
+
+# ---- per-method timing ----
+def _count(result):
+    if isinstance(result, list):
+        return len(result), 0
+    if isinstance(result, dict):
+        return 1, 0
+    if isinstance(result, int) and not isinstance(result, bool):
+        return 0, result
+    return 0, 0
+
+
+def _timed(name, fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        stats = self.metrics
+        if stats is None:
+            return fn(self, *args, **kwargs)
+        stats._push(name)
+        start = time.perf_counter()
+        try:
+            result = fn(self, *args, **kwargs)
+        finally:
+            stats._pop()
+        ms = (time.perf_counter() - start) * 1000.0
+        if inspect.isgenerator(result):
+            return _timed_iter(stats, name, result, ms)
+        stats.record_method(name, ms, *_count(result))
+        return result
+    return wrapper
+
+
+def _timed_iter(stats, name, gen, ms):
+    """Charge a returned generator's consumption to `name` as well."""
+    rows = 0
+    try:
+        while True:
+            stats._push(name)
+            start = time.perf_counter()
+            try:
+                row = next(gen)
+            except StopIteration:
+                return
+            finally:
+                ms += (time.perf_counter() - start) * 1000.0
+                stats._pop()
+            rows += 1
+            yield row
+    finally:
+        gen.close()
+        stats.record_method(name, ms, rows)
+
+
+def instrument(cls):
+    """Class decorator: time every public method when instance.metrics is set."""
+    for name, fn in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(fn) or name in getattr(cls, 'UNTIMED', ()):
+            continue
+        setattr(cls, name, _timed(name, fn))
+    return cls
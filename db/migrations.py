@@ -0,0 +1,166 @@
+# db/migrations.py
+"""Versioned schema migrations keyed on PRAGMA user_version.
+
+Each Migration is applied once, in order, inside its own transaction that
+also bumps user_version. Opening an up-to-date database costs a single
+PRAGMA read: no DDL and no table scans.
+
+Command line:
+    python -m db.migrations status [--db PATH]
+    python -m db.migrations migrate [--db PATH]
+    python -m db.migrations seed [--db PATH]     # opt-in sample data
+
+--stats PATH records timings and writes DBManager.stats() as JSON after
+migrate / seed.
+"""
+import argparse
+import sqlite3
+from .models import Client, Merchant, ClientRatesheet, SearchIndex, RateTier, RatesheetRate, ChangeJournal, ClientSummary, TradeLimit, LimitUsage
+from .models import Intermediary, IntermediaryLink, IntermediaryClosure
+
+
+class Migration:
+    """One schema step. `steps` are SQL strings or callables taking the
+    connection, run in order."""
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+    def apply(self, conn):
+        for step in self.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+
+
+# Keep in ascending order; never edit a released step, add a new one.
+MIGRATIONS = [
+    # v1 matches the schema the old ensure_schema() created, so databases
+    # that predate user_version adopt it without changes.
+    Migration(1, "base schema", [
+        Client.create_table_sql(),
+        Merchant.create_table_sql(),
+        ClientRatesheet.create_table_sql(),
+        "CREATE INDEX IF NOT EXISTS idx_merchants_client ON merchants(client_sds_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ratesheets_client ON client_ratesheets(client_sds_id)",
+    ]),
+    # v2: the workload-driven index set declared on the models; the
+    # single-column client indexes are prefixes of the new composites.
+    Migration(2, "workload indexes", [
+        "DROP INDEX IF EXISTS idx_merchants_client",
+        "DROP INDEX IF EXISTS idx_ratesheets_client",
+        *Client.indexes_sql(),
+        *Merchant.indexes_sql(),
+        *ClientRatesheet.indexes_sql(),
+        "ANALYZE",
+    ]),
+    Migration(3, "full-text search", SearchIndex.create_sql()),
+    Migration(4, "rate tiers", [
+        RateTier.create_table_sql(),
+        *RateTier.indexes_sql(),
+    ]),
+    Migration(5, "ratesheet rates", [RatesheetRate.create_table_sql()]),
+    Migration(6, "change journal", [
+        *ChangeJournal.create_sql(),
+        *ChangeJournal.triggers_sql(('clients', 'merchants', 'client_ratesheets')),
+    ]),
+    Migration(7, "journal rate tables", ChangeJournal.triggers_sql(('rate_tiers', 'ratesheet_rates'))),
+    Migration(8, "client summary", [
+        ClientSummary.create_table_sql(),
+        *ClientSummary.indexes_sql(),
+        *ClientSummary.triggers_sql(),
+        ClientSummary.seed_sql(),
+    ]),
+    # v9: expiring-ratesheet report seeks on the expiry date
+    Migration(9, "report indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_ratesheets_expiry ON client_ratesheets(expiry_date)",
+    ]),
+    Migration(10, "GET limits", [
+        TradeLimit.create_table_sql(),
+        *TradeLimit.indexes_sql(),
+        LimitUsage.create_table_sql(),
+        *LimitUsage.indexes_sql(),
+        *ChangeJournal.triggers_sql(('trade_limits', 'limit_usage')),
+    ]),
+    Migration(11, "intermediaries", [
+        Intermediary.create_table_sql(),
+        *Intermediary.indexes_sql(),
+        IntermediaryLink.create_table_sql(),
+        *IntermediaryLink.indexes_sql(),
+        IntermediaryClosure.create_table_sql(),
+        *IntermediaryClosure.indexes_sql(),
+        *IntermediaryClosure.triggers_sql(),
+        *ChangeJournal.triggers_sql(('intermediaries', 'intermediary_links')),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending(conn):
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply every pending migration up to `target`; returns those applied."""
+    if current_version(conn) >= target:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for m in pending(conn):
+        if m.version > target:
+            break
+        conn.execute("BEGIN")
+        try:
+            m.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(m.version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[migrate] applied v{m.version}: {m.description}")
+        applied.append(m)
+    return applied
+
+
+def main(argv=None):
+    from config import DB_PATH, DB_STATS
+    parser = argparse.ArgumentParser(prog="python -m db.migrations")
+    parser.add_argument("command", choices=("status", "migrate", "seed"))
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--stats", metavar="PATH", help="write timing stats as JSON when done")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        conn = sqlite3.connect(args.db)
+        try:
+            version = current_version(conn)
+            print(f"{args.db}: schema v{version}, latest v{LATEST_VERSION}")
+            for m in pending(conn):
+                print(f"  pending v{m.version}: {m.description}")
+        finally:
+            conn.close()
+        return 0
+
+    from .db_manager import DBManager
+    db = DBManager(args.db, stats=bool(args.stats) or DB_STATS)    # opening the manager migrates
+    try:
+        if args.command == "seed":
+            db.seed_sample_data()
+        if args.stats:
+            db.export_stats(args.stats)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -13,6 +13,13 @@ class Client:
             ")"
         )
 
+    @staticmethod
+    def indexes_sql():
+        return [
+            # fetch_all_clients ORDER BY entity_name
+            "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(entity_name)",
+        ]
+
 class Merchant:
     @staticmethod
     def create_table_sql():
@@ -27,6 +34,17 @@ class Merchant:
             ")"
         )
 
+    @staticmethod
+    def indexes_sql():
+        return [
+            # per-client list ordered by name; also the FK child index
+            "CREATE INDEX IF NOT EXISTS idx_merchants_client_name ON merchants(client_sds_id, merchant_name)",
+            # global list / keyset pages ordered by (merchant_name, merchant_id)
+            "CREATE INDEX IF NOT EXISTS idx_merchants_name ON merchants(merchant_name)",
+            # case-insensitive lookup by name within a client
+            "CREATE INDEX IF NOT EXISTS idx_merchants_client_name_nocase ON merchants(client_sds_id, merchant_name COLLATE NOCASE)",
+        ]
+
 class ClientRatesheet:
     @staticmethod
     def create_table_sql():
@@ -43,3 +61,486 @@ class ClientRatesheet:
             "FOREIGN KEY(merchant_id) REFERENCES merchants(merchant_id) ON DELETE SET NULL"
             ")"
         )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # per-client / per-merchant lists ordered by effective_date DESC
+            "CREATE INDEX IF NOT EXISTS idx_ratesheets_client_eff ON client_ratesheets(client_sds_id, effective_date)",
+            "CREATE INDEX IF NOT EXISTS idx_ratesheets_merchant_eff ON client_ratesheets(merchant_id, effective_date)",
+            # global list / keyset pages ordered by (effective_date, ratesheet_id) DESC
+            "CREATE INDEX IF NOT EXISTS idx_ratesheets_eff ON client_ratesheets(effective_date)",
+        ]
+
+class SearchIndex:
+    """FTS5 indexes over the searchable text columns.
+
+    External-content tables: the FTS rowid is the entity's primary key and
+    the text lives only in the base table. Triggers keep them in step.
+    """
+    # fts table -> (base table, key column, indexed columns)
+    TABLES = {
+        'clients_fts': ('clients', 'sds_id', ('entity_name', 'bank_user_id')),
+        'merchants_fts': ('merchants', 'merchant_id', ('merchant_name', 'merchant_code')),
+        'ratesheets_fts': ('client_ratesheets', 'ratesheet_id', ('rate_details',)),
+    }
+
+    @staticmethod
+    def create_sql():
+        stmts = []
+        for fts, (table, key, cols) in SearchIndex.TABLES.items():
+            col_list = ', '.join(cols)
+            new_vals = ', '.join(f"new.{c}" for c in cols)
+            old_vals = ', '.join(f"old.{c}" for c in cols)
+            insert = f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.{key}, {new_vals});"
+            delete = f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.{key}, {old_vals});"
+            stmts += [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{col_list}, content='{table}', content_rowid='{key}', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {key}, {col_list} ON {table} "
+                f"BEGIN {delete} {insert} END",
+                # index rows that existed before the table was created
+                f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+            ]
+        return stmts
+
+class RateTier:
+    """One pricing band of a ratesheet: for `currency_pair` and amounts in
+    [min_amount, max_amount) the client pays mid * (1 + margin_bps/10000)
+    plus `spread` rate points. max_amount NULL means unbounded."""
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS rate_tiers ("
+            "tier_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "ratesheet_id INTEGER NOT NULL, "
+            "currency_pair TEXT NOT NULL, "
+            "min_amount REAL NOT NULL DEFAULT 0, "
+            "max_amount REAL, "
+            "margin_bps REAL NOT NULL DEFAULT 0, "
+            "spread REAL NOT NULL DEFAULT 0, "
+            "created_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "FOREIGN KEY(ratesheet_id) REFERENCES client_ratesheets(ratesheet_id) ON DELETE CASCADE"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_rate_tiers_lookup ON rate_tiers(ratesheet_id, currency_pair, min_amount)",
+        ]
+
+    @staticmethod
+    def normalize_pair(pair):
+        return normalize_pair(pair)
+
+class RatesheetRate:
+    """A directly quoted rate on a ratesheet: 1 unit of the pair's base
+    currency buys `rate` units of its quote currency. Pairs that are not
+    stored are derived by pricing.cross."""
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS ratesheet_rates ("
+            "ratesheet_id INTEGER NOT NULL, "
+            "currency_pair TEXT NOT NULL, "
+            "rate REAL NOT NULL CHECK (rate > 0), "
+            "updated_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "PRIMARY KEY (ratesheet_id, currency_pair), "
+            "FOREIGN KEY(ratesheet_id) REFERENCES client_ratesheets(ratesheet_id) ON DELETE CASCADE"
+            ")"
+        )
+
+class ChangeJournal:
+    """Append-only change log filled by triggers on the core tables.
+
+    One row per inserted, updated or deleted entity row (cascades
+    included), keyed by a sequence that only grows: AUTOINCREMENT never
+    reuses a value, even after compaction. Only the key is logged;
+    consumers read the row's current state alongside it.
+    """
+    # table -> key column; rowid for tables without an integer key
+    TABLES = {
+        'clients': 'sds_id',
+        'merchants': 'merchant_id',
+        'client_ratesheets': 'ratesheet_id',
+        'rate_tiers': 'tier_id',
+        'ratesheet_rates': 'rowid',
+        'trade_limits': 'limit_id',
+        'limit_usage': 'rowid',
+        'intermediaries': 'intermediary_id',
+        'intermediary_links': 'link_id',
+    }
+
+    @staticmethod
+    def create_sql():
+        return [
+            "CREATE TABLE IF NOT EXISTS change_log ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "table_name TEXT NOT NULL, "
+            "row_id INTEGER NOT NULL, "
+            "op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')), "
+            "changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+            ")",
+            # compaction: latest entry per row
+            "CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log(table_name, row_id, seq)",
+        ]
+
+    @staticmethod
+    def triggers_sql(tables):
+        stmts = []
+        log = "INSERT INTO change_log(table_name, row_id, op)"
+        for table in tables:
+            key = ChangeJournal.TABLES[table]
+            stmts += [
+                f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_ai AFTER INSERT ON {table} "
+                f"BEGIN {log} VALUES ('{table}', new.{key}, 'insert'); END",
+                f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_ad AFTER DELETE ON {table} "
+                f"BEGIN {log} VALUES ('{table}', old.{key}, 'delete'); END",
+                # a changed key is a delete of the old row and an insert of the new
+                f"CREATE TRIGGER IF NOT EXISTS {table}_cdc_au AFTER UPDATE ON {table} BEGIN "
+                f"{log} SELECT '{table}', new.{key}, 'update' WHERE new.{key} = old.{key}; "
+                f"{log} SELECT '{table}', old.{key}, 'delete' WHERE new.{key} <> old.{key}; "
+                f"{log} SELECT '{table}', new.{key}, 'insert' WHERE new.{key} <> old.{key}; "
+                f"END",
+                # rows that predate the journal, so changes_since(0) is a full load
+                f"{log} SELECT '{table}', {key}, 'insert' FROM {table} ORDER BY {key}",
+            ]
+        return stmts
+
+    @staticmethod
+    def trigger_names():
+        return [f"{table}_cdc_{kind}" for table in ChangeJournal.TABLES for kind in ('ai', 'ad', 'au')]
+
+class ClientSummary:
+    """Per-client merchant and ratesheet counts kept current by triggers.
+
+    active_ratesheet_count counts the sheets in force on active_as_of, the
+    local date the row was last counted; readers count rows left over from
+    an earlier day inline until DBManager.recount_active_ratesheets() runs.
+    """
+    TODAY = "date('now', 'localtime')"
+    NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+    @staticmethod
+    def active_sql(r, day):
+        """Ratesheet row `r` is in force on `day`, as in DBManager._ACTIVE_SQL."""
+        return (f"(({r}.effective_date IS NULL OR {r}.effective_date <= {day}) "
+                f"AND ({r}.expiry_date IS NULL OR {r}.expiry_date = '' OR {r}.expiry_date >= {day}))")
+
+    @staticmethod
+    def active_count_sql(client, day):
+        return (f"(SELECT COUNT(*) FROM client_ratesheets r WHERE r.client_sds_id = {client} "
+                f"AND {ClientSummary.active_sql('r', day)})")
+
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS client_summary ("
+            "sds_id INTEGER PRIMARY KEY, "
+            "merchant_count INTEGER NOT NULL DEFAULT 0, "
+            "ratesheet_count INTEGER NOT NULL DEFAULT 0, "
+            "active_ratesheet_count INTEGER NOT NULL DEFAULT 0, "
+            f"active_as_of TEXT NOT NULL DEFAULT ({ClientSummary.TODAY}), "
+            "last_change_at TEXT"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # daily recount of rows counted on an earlier day
+            "CREATE INDEX IF NOT EXISTS idx_client_summary_as_of ON client_summary(active_as_of)",
+        ]
+
+    @staticmethod
+    def triggers_sql():
+        now = ClientSummary.NOW
+        active = ClientSummary.active_sql
+        merchants = "UPDATE client_summary SET merchant_count = merchant_count {sign} 1, " \
+                    f"last_change_at = {now} WHERE sds_id = {{row}}.client_sds_id;"
+        ratesheets = "UPDATE client_summary SET ratesheet_count = ratesheet_count {sign} 1, " \
+                     "active_ratesheet_count = active_ratesheet_count {sign} {active}, " \
+                     f"last_change_at = {now} WHERE sds_id = {{row}}.client_sds_id;"
+
+        def ratesheet(sign, row):
+            return ratesheets.format(sign=sign, row=row, active=active(row, 'active_as_of'))
+
+        return [
+            "CREATE TRIGGER IF NOT EXISTS clients_summary_ai AFTER INSERT ON clients BEGIN "
+            f"INSERT OR IGNORE INTO client_summary(sds_id, last_change_at) VALUES (new.sds_id, {now}); END",
+            "CREATE TRIGGER IF NOT EXISTS clients_summary_ad AFTER DELETE ON clients BEGIN "
+            "DELETE FROM client_summary WHERE sds_id = old.sds_id; END",
+            "CREATE TRIGGER IF NOT EXISTS clients_summary_au AFTER UPDATE OF sds_id ON clients "
+            "WHEN new.sds_id <> old.sds_id BEGIN "
+            f"UPDATE client_summary SET sds_id = new.sds_id, last_change_at = {now} WHERE sds_id = old.sds_id; END",
+            "CREATE TRIGGER IF NOT EXISTS merchants_summary_ai AFTER INSERT ON merchants BEGIN "
+            f"{merchants.format(sign='+', row='new')} END",
+            "CREATE TRIGGER IF NOT EXISTS merchants_summary_ad AFTER DELETE ON merchants BEGIN "
+            f"{merchants.format(sign='-', row='old')} END",
+            # out of the old client's counts and into the new one's (the same
+            # client nets to zero but still stamps last_change_at)
+            "CREATE TRIGGER IF NOT EXISTS merchants_summary_au AFTER UPDATE ON merchants BEGIN "
+            f"{merchants.format(sign='-', row='old')} {merchants.format(sign='+', row='new')} END",
+            "CREATE TRIGGER IF NOT EXISTS ratesheets_summary_ai AFTER INSERT ON client_ratesheets BEGIN "
+            f"{ratesheet('+', 'new')} END",
+            "CREATE TRIGGER IF NOT EXISTS ratesheets_summary_ad AFTER DELETE ON client_ratesheets BEGIN "
+            f"{ratesheet('-', 'old')} END",
+            "CREATE TRIGGER IF NOT EXISTS ratesheets_summary_au AFTER UPDATE ON client_ratesheets BEGIN "
+            f"{ratesheet('-', 'old')} {ratesheet('+', 'new')} END",
+        ]
+
+    @staticmethod
+    def seed_sql():
+        today = ClientSummary.TODAY
+        return (
+            "INSERT OR IGNORE INTO client_summary(sds_id, merchant_count, ratesheet_count, "
+            "active_ratesheet_count, active_as_of, last_change_at) "
+            "SELECT c.sds_id, "
+            "(SELECT COUNT(*) FROM merchants m WHERE m.client_sds_id = c.sds_id), "
+            "(SELECT COUNT(*) FROM client_ratesheets r WHERE r.client_sds_id = c.sds_id), "
+            f"{ClientSummary.active_count_sql('c.sds_id', today)}, {today}, "
+            # newest merchant or ratesheet; NULL when there are none
+            "NULLIF(max("
+            "COALESCE((SELECT MAX(created_at) FROM merchants m WHERE m.client_sds_id = c.sds_id), ''), "
+            "COALESCE((SELECT MAX(created_at) FROM client_ratesheets r WHERE r.client_sds_id = c.sds_id), '')"
+            "), '') "
+            "FROM clients c"
+        )
+
+class TradeLimit:
+    """A GET limit: the largest single trade and the daily total allowed
+    for a client (merchant_id NULL) or one of its merchants, in
+    `currency`. currency NULL is the default for every currency without a
+    row of its own; each currency is still counted separately. NULL maxima
+    are unlimited."""
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS trade_limits ("
+            "limit_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "client_sds_id INTEGER NOT NULL, "
+            "merchant_id INTEGER, "
+            "currency TEXT, "
+            "single_trade_max REAL CHECK (single_trade_max >= 0), "
+            "daily_max REAL CHECK (daily_max >= 0), "
+            "updated_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "FOREIGN KEY(client_sds_id) REFERENCES clients(sds_id) ON DELETE CASCADE, "
+            "FOREIGN KEY(merchant_id) REFERENCES merchants(merchant_id) ON DELETE CASCADE"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # one limit per scope; NULLs would otherwise never collide
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_trade_limits_scope "
+            "ON trade_limits(client_sds_id, COALESCE(merchant_id, 0), COALESCE(currency, ''))",
+            # FK child index for merchant deletes
+            "CREATE INDEX IF NOT EXISTS idx_trade_limits_merchant ON trade_limits(merchant_id)",
+        ]
+
+class LimitUsage:
+    """Traded amount per day, client, merchant (0 for none) and currency,
+    counted against TradeLimit daily maxima."""
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS limit_usage ("
+            "day TEXT NOT NULL, "
+            "client_sds_id INTEGER NOT NULL, "
+            "merchant_id INTEGER NOT NULL DEFAULT 0, "
+            "currency TEXT NOT NULL, "
+            "amount REAL NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (day, client_sds_id, merchant_id, currency), "
+            "FOREIGN KEY(client_sds_id) REFERENCES clients(sds_id) ON DELETE CASCADE"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # FK child index for client deletes
+            "CREATE INDEX IF NOT EXISTS idx_limit_usage_client ON limit_usage(client_sds_id)",
+        ]
+
+class Intermediary:
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS intermediaries ("
+            "intermediary_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "name TEXT NOT NULL, "
+            "code TEXT, "
+            "created_at TEXT DEFAULT CURRENT_TIMESTAMP"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # fetch_intermediaries ORDER BY name
+            "CREATE INDEX IF NOT EXISTS idx_intermediaries_name ON intermediaries(name)",
+        ]
+
+class IntermediaryLink:
+    """One hop of a chain from a client through intermediaries to a
+    merchant: client -> intermediary, intermediary -> intermediary or
+    intermediary -> merchant. The parent is client_sds_id or parent_id,
+    the child child_id or merchant_id."""
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS intermediary_links ("
+            "link_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "client_sds_id INTEGER, "
+            "parent_id INTEGER, "
+            "child_id INTEGER, "
+            "merchant_id INTEGER, "
+            "created_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+            "CHECK ((client_sds_id IS NULL) <> (parent_id IS NULL)), "
+            "CHECK ((child_id IS NULL) <> (merchant_id IS NULL)), "
+            # a client reaches its own merchants without intermediaries
+            "CHECK (parent_id IS NOT NULL OR child_id IS NOT NULL), "
+            "FOREIGN KEY(client_sds_id) REFERENCES clients(sds_id) ON DELETE CASCADE, "
+            "FOREIGN KEY(parent_id) REFERENCES intermediaries(intermediary_id) ON DELETE CASCADE, "
+            "FOREIGN KEY(child_id) REFERENCES intermediaries(intermediary_id) ON DELETE CASCADE, "
+            "FOREIGN KEY(merchant_id) REFERENCES merchants(merchant_id) ON DELETE CASCADE"
+            ")"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # one link per pair of nodes; NULLs would otherwise never collide
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_intermediary_links_pair ON intermediary_links("
+            "COALESCE(client_sds_id, 0), COALESCE(parent_id, 0), COALESCE(child_id, 0), COALESCE(merchant_id, 0))",
+            # links of one intermediary; also the FK child indexes
+            "CREATE INDEX IF NOT EXISTS idx_intermediary_links_parent ON intermediary_links(parent_id)",
+            "CREATE INDEX IF NOT EXISTS idx_intermediary_links_child ON intermediary_links(child_id)",
+            "CREATE INDEX IF NOT EXISTS idx_intermediary_links_client ON intermediary_links(client_sds_id)",
+            "CREATE INDEX IF NOT EXISTS idx_intermediary_links_merchant ON intermediary_links(merchant_id)",
+        ]
+
+class IntermediaryClosure:
+    """Transitive closure of intermediary_links kept current by triggers.
+
+    One row per (ancestor, descendant) pair of nodes joined by at least one
+    chain of links, nodes being (kind, id) with kind 'client',
+    'intermediary' or 'merchant'; `paths` counts the distinct chains. A new
+    link adds ancestors(parent) x descendants(child) chains, a removed one
+    subtracts them, and pairs left with none are deleted, so no change
+    needs a rebuild. Links that would close a cycle are rejected.
+    """
+    CLIENT, INTERMEDIARY, MERCHANT = 'client', 'intermediary', 'merchant'
+    CYCLE = 'intermediary link would create a cycle'
+
+    @staticmethod
+    def create_table_sql():
+        return (
+            "CREATE TABLE IF NOT EXISTS intermediary_closure ("
+            "ancestor_kind TEXT NOT NULL, "
+            "ancestor_id INTEGER NOT NULL, "
+            "descendant_kind TEXT NOT NULL, "
+            "descendant_id INTEGER NOT NULL, "
+            "paths INTEGER NOT NULL, "
+            "PRIMARY KEY (ancestor_kind, ancestor_id, descendant_kind, descendant_id)"
+            ") WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def indexes_sql():
+        return [
+            # ancestors of a node
+            "CREATE INDEX IF NOT EXISTS idx_intermediary_closure_descendant "
+            "ON intermediary_closure(descendant_kind, descendant_id, ancestor_kind, ancestor_id)",
+        ]
+
+    @staticmethod
+    def _ends(row):
+        parent = (f"(CASE WHEN {row}.client_sds_id IS NOT NULL THEN 'client' ELSE 'intermediary' END)",
+                  f"COALESCE({row}.client_sds_id, {row}.parent_id)")
+        child = (f"(CASE WHEN {row}.merchant_id IS NOT NULL THEN 'merchant' ELSE 'intermediary' END)",
+                 f"COALESCE({row}.merchant_id, {row}.child_id)")
+        return parent, child
+
+    @staticmethod
+    def _nodes(row):
+        parent, child = IntermediaryClosure._ends(row)
+        # the parent and everything above it, the child and everything below
+        up = (f"SELECT ancestor_kind AS kind, ancestor_id AS id, paths FROM intermediary_closure "
+              f"WHERE descendant_kind = {parent[0]} AND descendant_id = {parent[1]} "
+              f"UNION ALL SELECT {parent[0]}, {parent[1]}, 1")
+        down = (f"SELECT descendant_kind AS kind, descendant_id AS id, paths FROM intermediary_closure "
+                f"WHERE ancestor_kind = {child[0]} AND ancestor_id = {child[1]} "
+                f"UNION ALL SELECT {child[0]}, {child[1]}, 1")
+        return up, down
+
+    @staticmethod
+    def _add_sql(row):
+        up, down = IntermediaryClosure._nodes(row)
+        return (
+            "INSERT INTO intermediary_closure(ancestor_kind, ancestor_id, descendant_kind, descendant_id, paths) "
+            f"SELECT a.kind, a.id, d.kind, d.id, a.paths * d.paths FROM ({up}) a, ({down}) d WHERE 1 "
+            "ON CONFLICT(ancestor_kind, ancestor_id, descendant_kind, descendant_id) "
+            "DO UPDATE SET paths = paths + excluded.paths;"
+        )
+
+    @staticmethod
+    def _remove_sql(row):
+        # in a DAG the pairs read (x, parent) and (child, y) are never among
+        # those updated, so the subqueries see the same rows throughout
+        up, down = IntermediaryClosure._nodes(row)
+        (parent_kind, parent_id), (child_kind, child_id) = IntermediaryClosure._ends(row)
+        pairs = (f"(ancestor_kind, ancestor_id) IN (SELECT kind, id FROM ({up})) "
+                 f"AND (descendant_kind, descendant_id) IN (SELECT kind, id FROM ({down}))")
+        # chains ancestor -> parent times chains child -> descendant; no row
+        # means the ancestor is the parent (or the descendant the child)
+        return (
+            "UPDATE intermediary_closure SET paths = paths - "
+            "COALESCE((SELECT u.paths FROM intermediary_closure u "
+            "WHERE u.ancestor_kind = intermediary_closure.ancestor_kind "
+            "AND u.ancestor_id = intermediary_closure.ancestor_id "
+            f"AND u.descendant_kind = {parent_kind} AND u.descendant_id = {parent_id}), 1) * "
+            "COALESCE((SELECT d.paths FROM intermediary_closure d "
+            f"WHERE d.ancestor_kind = {child_kind} AND d.ancestor_id = {child_id} "
+            "AND d.descendant_kind = intermediary_closure.descendant_kind "
+            "AND d.descendant_id = intermediary_closure.descendant_id), 1) "
+            f"WHERE {pairs}; "
+            f"DELETE FROM intermediary_closure WHERE paths <= 0 AND {pairs};"
+        )
+
+    @staticmethod
+    def _cycle_sql(row):
+        # only intermediary -> intermediary links can close a cycle
+        return (
+            f"SELECT RAISE(ABORT, '{IntermediaryClosure.CYCLE}') WHERE {row}.child_id = {row}.parent_id "
+            "OR EXISTS (SELECT 1 FROM intermediary_closure WHERE ancestor_kind = 'intermediary' "
+            f"AND ancestor_id = {row}.child_id AND descendant_kind = 'intermediary' "
+            f"AND descendant_id = {row}.parent_id);"
+        )
+
+    @staticmethod
+    def triggers_sql():
+        c = IntermediaryClosure
+        return [
+            "CREATE TRIGGER IF NOT EXISTS intermediary_links_closure_ai AFTER INSERT ON intermediary_links BEGIN "
+            f"{c._cycle_sql('new')} {c._add_sql('new')} END",
+            "CREATE TRIGGER IF NOT EXISTS intermediary_links_closure_ad AFTER DELETE ON intermediary_links BEGIN "
+            f"{c._remove_sql('old')} END",
+            # a moved link is a removal and an insertion
+            "CREATE TRIGGER IF NOT EXISTS intermediary_links_closure_au AFTER UPDATE ON intermediary_links "
+            "WHEN new.client_sds_id IS NOT old.client_sds_id OR new.parent_id IS NOT old.parent_id "
+            "OR new.child_id IS NOT old.child_id OR new.merchant_id IS NOT old.merchant_id BEGIN "
+            f"{c._remove_sql('old')} {c._cycle_sql('new')} {c._add_sql('new')} END",
+        ]
+
+def normalize_pair(pair):
+    """'eurusd', 'EUR/USD', 'eur-usd' -> 'EUR/USD'."""
+    p = ''.join(ch for ch in str(pair).upper() if ch.isalpha())
+    if len(p) != 6:
+        raise ValueError(f"currency pair must be two ISO codes, got {pair!r}")
+    return f"{p[:3]}/{p[3:]}"
@@ -0,0 +1,261 @@
+# db/pool.py
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from .metrics import CountingConnection, InstrumentedConnection
+
+
+class ConnectionPool:
+    """One writer connection plus N read-only reader connections.
+
+    With readers > 0 the database is switched to WAL journaling so readers
+    see the last committed snapshot while a write is in progress. With
+    readers == 0 every read is served by the writer connection (the old
+    single-connection behaviour), serialised by the same lock.
+
+    With `metrics` (a metrics.QueryStats) every connection is an
+    InstrumentedConnection reporting statement timings to it.
+
+    With `replica`, load_replica() copies the database into memory and
+    read() is served from the copy from then on (see db.replica);
+    read_primary() still reads the file.
+    """
+    def __init__(self, path, readers=0, busy_timeout=5.0, metrics=None, replica=False):
+        self.path = str(path)
+        self.metrics = metrics
+        self.size = int(readers)
+        self.busy_timeout = float(busy_timeout)
+        if self.size and self.path == ':memory:':
+            raise ValueError("pooled mode needs an on-disk database, not ':memory:'")
+
+        self._lock = threading.RLock()
+        self.hooks = 0          # bumped whenever the tracers change
+        self._local = threading.local()
+        self._tracers = []
+        self.replicated = bool(replica)
+        self.replica = None
+        # the writer counts its statements for TransactionStats
+        self.writer = self._connect(self.path, factory=CountingConnection)
+        if self.size:
+            self.writer.execute("PRAGMA journal_mode = WAL")
+            self.writer.execute("PRAGMA synchronous = NORMAL")
+
+        self._readers = queue.Queue()
+        self._held = {}         # thread id -> [reader it has borrowed, borrow depth, progress handler lent]
+        self._all_readers = []
+        for _ in range(self.size):
+            conn = self._connect(f"file:{self.path}?mode=ro", uri=True)
+            self._all_readers.append(conn)
+            self._readers.put(conn)
+
+    def _connect(self, target, uri=False, factory=sqlite3.Connection):
+        if self.metrics is not None:
+            factory = InstrumentedConnection
+        conn = sqlite3.connect(target, timeout=self.busy_timeout, uri=uri, check_same_thread=False,
+                               factory=factory)
+        conn.row_factory = sqlite3.Row
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        self.apply_hooks(conn)
+        return conn
+
+    def apply_hooks(self, conn):
+        """Give conn the current tracers. Only for a connection no other
+        thread is using: sqlite3 takes the connection's mutex, which a
+        running statement holds while it calls back into Python."""
+        conn.set_trace_callback(self._tracer_for(conn) if self._tracers else None)
+
+    # ---- statement tracing ----
+    def add_tracer(self, fn):
+        """Call fn(conn, sql) for every statement any pooled connection runs.
+
+        sqlite3 allows one trace callback per connection, so the pool owns
+        it and fans out; nothing is installed while no tracer is registered.
+        """
+        with self._lock:
+            self._tracers.append(fn)
+            if len(self._tracers) == 1:
+                self._install_tracers()
+
+    def remove_tracer(self, fn):
+        with self._lock:
+            self._tracers.remove(fn)
+            if not self._tracers:
+                self._install_tracers()
+
+    def _tracer_for(self, conn):
+        def trace(sql):
+            for fn in list(self._tracers):
+                fn(conn, sql)
+        return trace
+
+    def _install_tracers(self):
+        # replica copies pick the change up the next time they are borrowed
+        self.hooks += 1
+        for conn in [self.writer] + self._all_readers:
+            conn.set_trace_callback(self._tracer_for(conn) if self._tracers else None)
+
+    # ---- progress handler ----
+    @contextmanager
+    def progress_handler(self, fn, n):
+        """Within the block, every connection the calling thread borrows
+        runs fn every n VM instructions; fn returning true aborts the
+        statement. Installed when the connection is borrowed and removed
+        when it is returned, so other threads' reads never pay for it."""
+        self._local.progress = (fn, n)
+        try:
+            yield
+        finally:
+            self._local.progress = None
+
+    def _lend(self, conn):
+        """Install the calling thread's progress handler, if any, on a
+        connection it has just borrowed. Returns whether one was."""
+        progress = getattr(self._local, 'progress', None)
+        if progress is None:
+            return False
+        conn.set_progress_handler(*progress)
+        return True
+
+    @property
+    def pooled(self):
+        return self.size > 0
+
+    @contextmanager
+    def write(self):
+        """Exclusive access to the writer connection for the calling thread."""
+        with self._lock:
+            depth = self._local.depth = getattr(self._local, 'depth', 0) + 1
+            lent = depth == 1 and self._lend(self.writer)
+            try:
+                yield self.writer
+            finally:
+                self._local.depth -= 1
+                if lent:
+                    self.writer.set_progress_handler(None, 0)
+
+    @contextmanager
+    def read(self):
+        """Borrow a connection for reading: an in-memory copy when the
+        replica is loaded, otherwise as read_primary().
+
+        A thread that currently holds the writer reads through it, so it sees
+        its own uncommitted changes.
+        """
+        replica = self.replica
+        if replica is not None and not getattr(self._local, 'depth', 0):
+            with replica.read() as conn:
+                yield conn
+            return
+        with self.read_primary() as conn:
+            yield conn
+
+    @contextmanager
+    def read_primary(self):
+        """Borrow a connection to the database file: a reader in pooled
+        mode, otherwise the writer.
+
+        A thread that already holds a reader (e.g. inside an iter_* loop)
+        reads through it again rather than waiting for another, which with
+        every reader out would never come.
+        """
+        if not self.size or getattr(self._local, 'depth', 0):
+            with self.write() as conn:
+                yield conn
+            return
+        thread = threading.get_ident()
+        held = self._held.get(thread)
+        if held is None:
+            # keyed by thread, not thread-local: a generator may be closed elsewhere
+            conn = self._readers.get()
+            held = self._held[thread] = [conn, 0, self._lend(conn)]
+        # counted, so whichever borrow ends last (an iter_* generator may be
+        # closed before the read nested in it) returns the reader
+        held[1] += 1
+        try:
+            yield held[0]
+        finally:
+            held[1] -= 1
+            if not held[1]:
+                del self._held[thread]
+                if held[2]:
+                    held[0].set_progress_handler(None, 0)
+                self._readers.put(held[0])
+
+    # ---- in-memory replica ----
+    def load_replica(self):
+        """(Re)load the in-memory replica from the file: one copy per reader,
+        at least one. Returns the Replica."""
+        from .replica import Replica
+        with self._lock:
+            # reads go to the file while it loads; a copy still borrowed from
+            # the old replica stays usable and closes with its last reference
+            self.replica = None
+            self.replica = Replica(self, copies=max(1, self.size))
+        return self.replica
+
+    def committed(self):
+        """Called with the writer lock held after each commit; hands the
+        commit's changes to the replica. A replica that can't follow is
+        dropped and reads go back to the file."""
+        replica = self.replica
+        if replica is None:
+            return
+        try:
+            replica.capture(self.writer)
+        except Exception as ex:
+            print(f"[pool] replica dropped, reading from disk: {ex}")
+            self.replica = None
+
+    # ---- online backup ----
+    def backup(self, target, pages=-1, pause=0.0, progress=None):
+        """Copy the database into `target` (a sqlite3 connection) with the
+        online backup API, `pages` pages per step (-1: all at once).
+
+        The writer connection is the source and each step holds the writer
+        lock, so a step never sees a half-done transaction. Between steps
+        the lock is released for `pause` seconds to let writers in. SQLite
+        carries their changes into the copy instead of restarting it.
+        progress(remaining, total) is called after every step.
+        """
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError("backup() cannot run while this thread holds the writer")
+
+        def step(status, remaining, total):
+            self._lock.release()
+            try:
+                if progress is not None:
+                    progress(remaining, total)
+                if pause and remaining:
+                    time.sleep(pause)
+            finally:
+                self._lock.acquire()
+
+        with self._lock:
+            self.writer.backup(target, pages=pages, progress=step)
+
+    def restore(self, source, progress=None):
+        """Overwrite the database with the contents of `source` (a sqlite3
+        connection), holding the writer lock throughout. Readers keep their
+        current snapshot until their next read."""
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError("restore() cannot run while this thread holds the writer")
+        with self._lock:
+            source.backup(self.writer, progress=(lambda status, remaining, total: progress(remaining, total))
+                          if progress is not None else None)
+            if self.replica is not None:
+                self.load_replica()
+
+    def close(self):
+        with self._lock:
+            if self.replica is not None:
+                self.replica.close()
+                self.replica = None
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers = []
+            self.writer.close()
@@ -0,0 +1,63 @@
+# db/ratesheet_index.py
+import datetime
+from bisect import bisect_right
+
+
+def as_of_key(as_of):
+    """Normalise a date / datetime / ISO string to 'YYYY-MM-DD'."""
+    if as_of is None:
+        return datetime.date.today().isoformat()
+    if isinstance(as_of, datetime.datetime):
+        return as_of.date().isoformat()
+    if isinstance(as_of, datetime.date):
+        return as_of.isoformat()
+    return str(as_of)[:10]
+
+
+class ActiveRatesheetIndex:
+    """In-memory interval index answering "which ratesheet applies on date D".
+
+    Sheets are grouped by (client_sds_id, merchant_id) - merchant_id None is
+    the client default - and sorted by effective date. A lookup bisects to
+    the last sheet effective on or before D and walks back past any that
+    have already expired, so it is O(log n) plus the number of overlapping
+    sheets. Missing effective dates mean "always effective", missing expiry
+    dates "never expires"; among candidates the latest effective date wins,
+    then the highest ratesheet_id, matching DBManager.active_ratesheet().
+    """
+    def __init__(self, rows):
+        groups = {}
+        for r in rows:
+            eff = r.get('effective_date')
+            exp = r.get('expiry_date') or None
+            key = (r['client_sds_id'], r.get('merchant_id'))
+            # sort key mirrors SQL "effective_date DESC, ratesheet_id DESC":
+            # NULL sorts below '' which sorts below any date
+            groups.setdefault(key, []).append(((eff or '', eff is not None, r['ratesheet_id']), exp, r))
+        self._groups = {}
+        for key, sheets in groups.items():
+            sheets.sort(key=lambda s: s[0])
+            self._groups[key] = ([s[0][0] for s in sheets], sheets)
+
+    def _lookup(self, key, day):
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        effs, sheets = group
+        i = bisect_right(effs, day)
+        while i > 0:
+            i -= 1
+            _, exp, row = sheets[i]
+            if exp is None or exp >= day:
+                return row
+        return None
+
+    def resolve(self, client_sds_id, merchant_id, as_of=None):
+        """Merchant-specific sheet if one is active, else the client default."""
+        day = as_of_key(as_of)
+        row = None
+        if merchant_id is not None:
+            row = self._lookup((client_sds_id, merchant_id), day)
+        if row is None:
+            row = self._lookup((client_sds_id, None), day)
+        return row
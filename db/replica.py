@@ -0,0 +1,280 @@
+# db/replica.py
+"""In-memory replica of the database for read-heavy sessions.
+
+    db = DBManager(replica=True)        # or DB_REPLICA = True in config.py
+    python -m db.replica [--db PATH] [--reads N]   # startup / latency benchmark
+
+At startup the database is copied into `:memory:` with the online backup
+API, and every pool.read() is served from that copy. Writes still go to
+the file. After each commit the pool reads the new change journal entries
+(see models.ChangeJournal) and the rows they point at, and each in-memory
+copy applies them the next time it is borrowed. A read that follows a
+commit therefore always sees it.
+
+Only the journaled tables, and the client_summary rows their commits
+stamped, are carried over; FTS indexes follow through their own
+triggers. Writes made by other processes are not seen until the
+replica is reloaded. The journal itself is read from disk (read_primary).
+"""
+import argparse
+import bisect
+import queue
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from config import DB_PATH
+from .models import ChangeJournal
+
+
+class Replica:
+    """`copies` in-memory copies of a pool's database, plus the log of
+    committed changes not yet applied to all of them."""
+    def __init__(self, pool, copies=1):
+        self.pool = pool
+        start = time.perf_counter()
+        with pool._lock:
+            first = pool._connect(':memory:')
+            pool.writer.backup(first)
+            self.seq = self._latest_seq(pool.writer)
+        self._prepare(first)
+        self.bytes = first.execute("PRAGMA page_count").fetchone()[0] * \
+            first.execute("PRAGMA page_size").fetchone()[0]
+        self.connections = [first]
+        for _ in range(copies - 1):
+            # memory to memory; serialize() would keep the file's WAL header
+            conn = pool._connect(':memory:')
+            first.backup(conn)
+            conn.execute("PRAGMA foreign_keys = OFF")
+            self.connections.append(conn)
+        self.seconds = time.perf_counter() - start
+
+        self._log = []                  # (seq, table, key column, id, row or None)
+        self._log_seqs = []
+        self._log_lock = threading.Lock()
+        self._applied = {id(conn): self.seq for conn in self.connections}
+        self._hooks = {id(conn): pool.hooks for conn in self.connections}
+        self._sql = {}
+        self._free = queue.Queue()
+        self._held = {}                 # thread id -> [copy it has borrowed, borrow depth, progress handler lent]
+        for conn in self.connections:
+            self._free.put(conn)
+
+    @staticmethod
+    def _latest_seq(conn):
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        except Exception:
+            return 0        # no AUTOINCREMENT table yet
+        return row[0] if row else 0
+
+    @staticmethod
+    def _prepare(conn):
+        # changes arrive with their cascades already applied, and the journal
+        # is only ever read from disk
+        conn.execute("PRAGMA foreign_keys = OFF")
+        for name in ChangeJournal.trigger_names():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'").fetchone():
+            conn.execute("DELETE FROM change_log")
+        conn.commit()
+
+    # ---- capture (writer side) ----
+    def capture(self, writer):
+        """Log what commits since the last capture changed. Called by the
+        pool with the writer lock held, right after a commit."""
+        try:
+            entries = writer.execute(
+                "SELECT seq, table_name, row_id, changed_at FROM change_log WHERE seq > ? ORDER BY seq", (self.seq,)
+            ).fetchall()
+        except Exception:
+            if writer.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'").fetchone():
+                raise
+            return 0        # pre-journal schema; reloaded once migrated
+        if not entries:
+            return 0
+        wanted = {}
+        for seq, table, row_id, _ in entries:
+            wanted.setdefault(table, set()).add(row_id)
+        rows = {}
+        for table, ids in wanted.items():
+            key = ChangeJournal.TABLES[table]
+            ids = sorted(ids)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                cur = writer.execute(
+                    f"SELECT {'rowid, ' if key == 'rowid' else ''}* FROM {table} "
+                    f"WHERE {key} IN ({','.join('?' * len(chunk))})", chunk)
+                for row in cur.fetchall():
+                    rows[(table, row[key])] = tuple(zip(row.keys(), row))
+        summaries = self._summaries(writer, min(e[3] for e in entries))
+        with self._log_lock:
+            for seq, table, row_id, _ in entries:
+                self._log.append((seq, table, ChangeJournal.TABLES[table], row_id, rows.get((table, row_id))))
+                self._log_seqs.append(seq)
+            # after the rows whose triggers re-derive them on the copy
+            seq = entries[-1][0]
+            for row in summaries:
+                self._log.append((seq, 'client_summary', 'sds_id', row['sds_id'], tuple(zip(row.keys(), row))))
+                self._log_seqs.append(seq)
+            self.seq = seq
+        return len(entries)
+
+    @staticmethod
+    def _summaries(writer, since):
+        """client_summary rows the captured commits stamped. The copy's own
+        triggers keep the counts, but would stamp last_change_at with the
+        time of the catch-up; the file's rows are copied over them. The
+        journal entry and the stamp come from the same statement, so
+        nothing stamped by these commits is older than the first entry."""
+        try:
+            return writer.execute("SELECT * FROM client_summary WHERE last_change_at >= ?", (since,)).fetchall()
+        except Exception:
+            if writer.execute("SELECT 1 FROM sqlite_master WHERE name = 'client_summary'").fetchone():
+                raise
+            return []       # pre-summary schema
+
+    # ---- apply (reader side) ----
+    def _upsert_sql(self, table, key, columns):
+        sql = self._sql.get((table, columns))
+        if sql is None:
+            names = ', '.join(columns)
+            marks = ', '.join('?' * len(columns))
+            if key == 'rowid':
+                # no FTS triggers on these tables, so REPLACE is safe
+                sql = f"INSERT OR REPLACE INTO {table}({names}) VALUES ({marks})"
+            else:
+                # an UPDATE, not REPLACE, so the FTS update triggers fire
+                sets = ', '.join(f"{c} = excluded.{c}" for c in columns if c != key)
+                sql = f"INSERT INTO {table}({names}) VALUES ({marks}) ON CONFLICT({key}) DO UPDATE SET {sets}"
+            self._sql[(table, columns)] = sql
+        return sql
+
+    def _catch_up(self, conn):
+        applied = self._applied[id(conn)]
+        with self._log_lock:
+            if applied >= self.seq:
+                return
+            entries = self._log[bisect.bisect_right(self._log_seqs, applied):]
+            latest = self.seq
+        conn.execute("BEGIN")
+        try:
+            for seq, table, key, row_id, row in entries:
+                if row is None:
+                    conn.execute(f"DELETE FROM {table} WHERE {key} = ?", (row_id,))
+                else:
+                    columns = tuple(c for c, _ in row)
+                    conn.execute(self._upsert_sql(table, key, columns), [v for _, v in row])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        with self._log_lock:
+            self._applied[id(conn)] = latest
+            # drop what every copy has applied
+            done = bisect.bisect_right(self._log_seqs, min(self._applied.values()))
+            if done:
+                del self._log[:done]
+                del self._log_seqs[:done]
+
+    @contextmanager
+    def read(self):
+        """Borrow a copy, brought up to the last commit. A thread already
+        holding a copy reads through it again, as of the same point."""
+        thread = threading.get_ident()
+        held = self._held.get(thread)
+        if held is None:
+            conn = self._free.get()
+            try:
+                hooks = self.pool.hooks
+                if self._hooks[id(conn)] != hooks:
+                    self.pool.apply_hooks(conn)
+                    self._hooks[id(conn)] = hooks
+                self._catch_up(conn)
+            except BaseException:
+                self._free.put(conn)
+                raise
+            held = self._held[thread] = [conn, 0, self.pool._lend(conn)]
+        # returned when the last borrow ends, whichever order they end in
+        held[1] += 1
+        try:
+            yield held[0]
+        finally:
+            held[1] -= 1
+            if not held[1]:
+                del self._held[thread]
+                if held[2]:
+                    held[0].set_progress_handler(None, 0)
+                self._free.put(held[0])
+
+    def pending(self):
+        """Changes logged but not yet applied to every copy."""
+        with self._log_lock:
+            return len(self._log)
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+
+
+# ---- benchmark ----
+def _timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def _workload(db, rng):
+    with db.pool.read_primary() as conn:
+        merchant_ids = [r[0] for r in conn.execute("SELECT merchant_id FROM merchants ORDER BY random() LIMIT 500")]
+        client_ids = [r[0] for r in conn.execute("SELECT sds_id FROM clients ORDER BY random() LIMIT 500")]
+        names = [r[0] for r in conn.execute("SELECT entity_name FROM clients ORDER BY random() LIMIT 500")]
+    if not merchant_ids or not client_ids:
+        raise SystemExit("no merchants to read; seed or import data first")
+    return [
+        ('merchant by id', lambda: db.fetch_merchant_by_id(rng.choice(merchant_ids))),
+        ('merchants page', lambda: db.fetch_merchants_page()),
+        ('client merchants', lambda: db.fetch_merchants_page(client_sds_id=rng.choice(client_ids))),
+        ('ratesheets page', lambda: db.fetch_ratesheets_page()),
+        ('search', lambda: db.search(rng.choice(names).split()[0])),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.replica")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--reads", type=int, default=200, help="calls per read operation")
+    args = parser.parse_args(argv)
+
+    from .db_manager import DBManager
+    results = {}
+    for replica in (False, True):
+        start = time.perf_counter()
+        db = DBManager(args.db, cache_size=0, stats=False, replica=replica)
+        startup = time.perf_counter() - start
+        try:
+            workload = _workload(db, random.Random(42))
+            for _, fn in workload:
+                fn()        # warm the OS page cache for the disk run
+            results[replica] = (startup, {name: _timed(fn, args.reads) for name, fn in workload})
+        finally:
+            db.close()
+
+    disk, mem = results[False], results[True]
+    print(f"[replica] startup: disk {disk[0] * 1000:.1f} ms, replica {mem[0] * 1000:.1f} ms")
+    print(f"[replica] {'read':<17}{'disk p50':>10}{'p95':>9}{'replica p50':>13}{'p95':>9}{'speedup':>9}")
+    for name, (d50, d95) in disk[1].items():
+        m50, m95 = mem[1][name]
+        print(f"[replica] {name:<17}{d50 * 1e6:8.0f}us{d95 * 1e6:7.0f}us{m50 * 1e6:11.0f}us{m95 * 1e6:7.0f}us"
+              f"{d50 / max(m50, 1e-9):8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
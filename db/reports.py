@@ -0,0 +1,186 @@
+# db/reports.py
+"""Aggregate reports over the core tables.
+
+    page = db.report('expiring_ratesheets', days=30, offset=0, limit=500)
+    python -m db.reports list
+    python -m db.reports expiring_ratesheets [--days 30] [--offset 0] [--limit 50] [--db PATH]
+
+A report's full result is cached under the change-journal sequence it was
+computed at (and the day, for date-relative reports): rerunning or paging
+through it is a dictionary lookup until the next commit moves the sequence
+on. Writes from other processes move it too.
+"""
+import argparse
+import time
+from config import DB_PATH, PAGE_SIZE, REPORT_CACHE_SIZE
+from .cache import EntityCache
+from .models import ClientSummary
+from .ratesheet_index import as_of_key
+
+# name -> (title, SQL, parameter defaults); :today is always bound
+REPORTS = {
+    'expiring_ratesheets': (
+        "Ratesheets expiring within N days",
+        # materialized so the range seeks idx_ratesheets_expiry instead of
+        # walking a client index for the window's partition order
+        "WITH r AS MATERIALIZED (SELECT * FROM client_ratesheets "
+        "WHERE expiry_date >= :today AND expiry_date <= date(:today, '+' || :days || ' days')) "
+        "SELECT r.ratesheet_id, c.entity_name AS client_name, m.merchant_name, "
+        "r.effective_date, r.expiry_date, "
+        "CAST(julianday(r.expiry_date) - julianday(:today) AS INTEGER) AS days_left, "
+        # n-th expiry of its client, of how many in the window
+        "ROW_NUMBER() OVER (PARTITION BY r.client_sds_id ORDER BY r.expiry_date, r.ratesheet_id) AS client_rank, "
+        "COUNT(*) OVER (PARTITION BY r.client_sds_id) AS client_expiring "
+        "FROM r "
+        "LEFT JOIN clients c ON c.sds_id = r.client_sds_id "
+        "LEFT JOIN merchants m ON m.merchant_id = r.merchant_id "
+        "ORDER BY r.expiry_date, r.ratesheet_id",
+        {'days': 30},
+    ),
+    'merchants_without_ratesheets': (
+        "Merchants without a ratesheet of their own",
+        "SELECT m.merchant_id, m.merchant_name, m.merchant_code, c.entity_name AS client_name, "
+        # whether the client's default sheet (merchant_id NULL) covers them
+        "EXISTS (SELECT 1 FROM client_ratesheets d "
+        "WHERE d.client_sds_id = m.client_sds_id AND d.merchant_id IS NULL) AS client_default, "
+        "COUNT(*) OVER (PARTITION BY m.client_sds_id) AS client_uncovered, "
+        "s.merchant_count AS client_merchants "
+        "FROM merchants m "
+        "LEFT JOIN clients c ON c.sds_id = m.client_sds_id "
+        "LEFT JOIN client_summary s ON s.sds_id = m.client_sds_id "
+        "WHERE NOT EXISTS (SELECT 1 FROM client_ratesheets r WHERE r.merchant_id = m.merchant_id) "
+        "ORDER BY client_name, m.merchant_name, m.merchant_id",
+        {},
+    ),
+    'clients_by_timezone': (
+        "Clients by timezone",
+        "SELECT COALESCE(NULLIF(c.timezone, ''), '(none)') AS timezone, "
+        "COUNT(*) AS clients, "
+        "COALESCE(SUM(s.merchant_count), 0) AS merchants, "
+        "COALESCE(SUM(CASE WHEN s.active_as_of = :today THEN s.active_ratesheet_count "
+        f"ELSE {ClientSummary.active_count_sql('c.sds_id', ':today')} END), 0) AS active_ratesheets, "
+        "ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 1) AS pct_clients, "
+        "RANK() OVER (ORDER BY COUNT(*) DESC) AS rank "
+        "FROM clients c LEFT JOIN client_summary s ON s.sds_id = c.sds_id "
+        "GROUP BY 1 ORDER BY clients DESC, timezone",
+        {},
+    ),
+    'onboarding_per_day': (
+        "Merchants and ratesheets created per day",
+        "SELECT * FROM ("
+        "SELECT day, merchants, ratesheets, "
+        "SUM(merchants) OVER (ORDER BY day) AS merchants_total, "
+        "SUM(ratesheets) OVER (ORDER BY day) AS ratesheets_total, "
+        # calendar week: days without activity count as zero
+        "ROUND(SUM(merchants + ratesheets) OVER ("
+        "ORDER BY julianday(day) RANGE BETWEEN 6 PRECEDING AND CURRENT ROW) / 7.0, 1) AS avg_7d "
+        "FROM (SELECT day, SUM(kind = 'm') AS merchants, SUM(kind = 'r') AS ratesheets FROM ("
+        "SELECT date(created_at) AS day, 'm' AS kind FROM merchants "
+        "UNION ALL SELECT date(created_at), 'r' FROM client_ratesheets"
+        ") WHERE day IS NOT NULL GROUP BY day)"
+        ") WHERE day >= date(:today, '-' || :days || ' days') "
+        "ORDER BY day DESC",
+        {'days': 90},
+    ),
+}
+
+
+class ReportEngine:
+    """Runs REPORTS for one DBManager, caching full results by change seq."""
+    def __init__(self, db, cache_size=REPORT_CACHE_SIZE):
+        self.db = db
+        self.cache = EntityCache(cache_size)
+
+    @staticmethod
+    def _args(name, params):
+        if name not in REPORTS:
+            raise ValueError(f"unknown report {name!r}; choose from {', '.join(REPORTS)}")
+        defaults = REPORTS[name][2]
+        unknown = set(params) - set(defaults)
+        if unknown:
+            raise ValueError(f"report {name!r} takes no parameter {', '.join(sorted(unknown))}")
+        args = {k: type(v)(params.get(k, v)) for k, v in defaults.items()}
+        args['today'] = as_of_key(None)
+        return args
+
+    def _seq(self):
+        # the replica's own position: it may lag the file by one capture
+        replica = self.db.pool.replica
+        return replica.seq if replica is not None else self.db.latest_change_seq()
+
+    def run(self, name, **params):
+        """Full result of report `name` as a dict with name, title, columns,
+        rows (tuples), seq, elapsed_ms and cached."""
+        args = self._args(name, params)
+        key = (name, tuple(sorted(args.items())), self._seq())
+        # inside a transaction the result may include uncommitted rows
+        use_cache = not self.db.uow.active
+        if use_cache:
+            hit, result = self.cache.get(key)
+            if hit:
+                return dict(result, cached=True)
+        generation = self.cache.generation
+        start = time.perf_counter()
+        with self.db.pool.read() as conn:
+            cur = conn.execute(REPORTS[name][1], args)
+            columns = [d[0] for d in cur.description]
+            rows = [tuple(row) for row in cur.fetchall()]
+        result = {
+            'name': name,
+            'title': REPORTS[name][0],
+            'params': {k: v for k, v in args.items() if k != 'today'},
+            'columns': columns,
+            'rows': rows,
+            'seq': key[2],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+        if use_cache:
+            self.cache.put(key, result, (), generation)
+        return dict(result, cached=False)
+
+    def page(self, name, offset=0, limit=PAGE_SIZE, **params):
+        """Rows offset..offset+limit of run(name) as dicts, with the result's
+        metadata and `total` rows."""
+        result = self.run(name, **params)
+        offset = max(0, int(offset))
+        rows = result['rows'][offset:offset + int(limit)]
+        return dict(result, rows=[dict(zip(result['columns'], row)) for row in rows],
+                    total=len(result['rows']), offset=offset)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.reports")
+    parser.add_argument("report", choices=(*REPORTS, 'list'))
+    parser.add_argument("--days", type=int, help="window for date-relative reports")
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.report == 'list':
+        for name, (title, _, defaults) in REPORTS.items():
+            print(f"{name:<30}{title}" + (f"  ({', '.join(f'--{k} {v}' for k, v in defaults.items())})"
+                                         if defaults else ""))
+        return 0
+
+    from .db_manager import DBManager
+    db = DBManager(args.db, cache_size=0, stats=False)
+    try:
+        params = {'days': args.days} if args.days is not None and 'days' in REPORTS[args.report][2] else {}
+        page = db.report(args.report, offset=args.offset, limit=args.limit, **params)
+        widths = [max([len(c)] + [len(str(r[c])) for r in page['rows']]) for c in page['columns']]
+        print("  ".join(c.ljust(w) for c, w in zip(page['columns'], widths)))
+        for r in page['rows']:
+            print("  ".join(str('' if r[c] is None else r[c]).ljust(w) for c, w in zip(page['columns'], widths)))
+        print(f"[reports] {page['title']}: rows {page['offset'] + 1}-{page['offset'] + len(page['rows'])} "
+              f"of {page['total']} in {page['elapsed_ms']} ms (seq {page['seq']})")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
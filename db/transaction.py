@@ -0,0 +1,125 @@
+# db/transaction.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class TransactionStats:
+    """What one outermost unit of work did: statements run, savepoints
+    opened, wall time and whether it committed."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.savepoints = 0
+        self.elapsed = None
+        self.committed = False
+        self._started = time.perf_counter()
+        # the writer counts the statements run on it (metrics.CountingConnection)
+        self._first = conn.statements
+        self._statements = None
+
+    @property
+    def statements(self):
+        if self._statements is not None:
+            return self._statements
+        return self.conn.statements - self._first
+
+    def _finish(self):
+        if self.elapsed is not None:
+            return
+        self._statements = self.statements
+        self.elapsed = time.perf_counter() - self._started
+
+    def as_dict(self):
+        return {
+            'statements': self.statements,
+            'savepoints': self.savepoints,
+            'elapsed_ms': None if self.elapsed is None else round(self.elapsed * 1000, 3),
+            'committed': self.committed,
+        }
+
+    def __repr__(self):
+        return f"<TransactionStats {self.as_dict()}>"
+
+
+class UnitOfWork:
+    """Per-thread transaction scopes over the pool's writer connection.
+
+    The outermost scope issues BEGIN/COMMIT; nested scopes become SAVEPOINTs
+    so an inner failure only rolls back its own work.
+    """
+    def __init__(self, pool, history=100):
+        self.pool = pool
+        self.history = deque(maxlen=history)
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        return bool(getattr(self._local, 'stack', None))
+
+    def on_commit(self, fn):
+        """Run fn once the calling thread's transaction commits.
+
+        Callbacks registered inside a savepoint that is rolled back are
+        dropped with it; outside a transaction fn runs immediately.
+        """
+        if self.active:
+            self._local.pending[-1].append(fn)
+        else:
+            fn()
+
+    @contextmanager
+    def begin(self):
+        with self.pool.write() as conn:
+            stack = self._local.__dict__.setdefault('stack', [])
+            if stack:
+                yield from self._savepoint(conn, stack)
+                return
+
+            if conn.in_transaction:
+                # flush an implicit transaction left open by legacy code
+                conn.commit()
+                self.pool.committed()
+            stats = TransactionStats(conn)
+            self._local.stats = stats
+            self._local.pending = [[]]
+            conn.execute('BEGIN')
+            stack.append(None)
+            try:
+                yield stats
+                conn.commit()
+                stats.committed = True
+                # before the replica capture, whose reads are not the caller's work
+                stats._finish()
+                self.pool.committed()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                stack.pop()
+                stats._finish()
+                self._local.stats = None
+                pending, self._local.pending = self._local.pending[0], None
+                self.history.append(stats)
+        # outside the writer lock, so callbacks may read and write freely
+        for fn in pending:
+            fn()
+
+    def _savepoint(self, conn, stack):
+        stats = self._local.stats
+        name = f"uow_{len(stack)}"
+        conn.execute(f"SAVEPOINT {name}")
+        stats.savepoints += 1
+        stack.append(name)
+        pending = self._local.pending
+        pending.append([])
+        try:
+            yield stats
+            conn.execute(f"RELEASE {name}")
+            pending[-2].extend(pending[-1])
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        finally:
+            stack.pop()
+            pending.pop()
@@ -1,8 +1,13 @@
 # main.py
+import argparse
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from config import WINDOW_TITLE, WINDOW_SIZE
+from tkinter import ttk, messagebox, filedialog
+from config import WINDOW_TITLE, WINDOW_SIZE, BACKUP_INTERVAL, DB_STATS, EXPORT_CLOSE_TIMEOUT
 from db.db_manager import DBManager
+from db.backup import BackupManager
+from db.export import export_table, EXPORTS, FORMATS
 from ui.sidebar import Sidebar
 from ui.tabs import Tabs
 from ui.client_detail_tabs import ClientDetailTabs
@@ -10,9 +15,13 @@ from ui.views.client_view import ClientView
 from ui.views.merchant_view import MerchantView
 from ui.views.ratesheet_view import RatesheetView
 from ui.views.importer_view import ImporterView
+from ui.views.intermediary_view import IntermediaryView
+from ui.views.limit_view import LimitView
+from ui.views.report_view import ReportView
+from ui.loader import BackgroundLoader
 
 class NetFXApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, stats=DB_STATS):
         super().__init__()
         self.title(WINDOW_TITLE)
         self.geometry(WINDOW_SIZE)
@@ -20,7 +29,13 @@ class NetFXApp(tk.Tk):
         self.grid_rowconfigure(0, weight=1)
 
         # DB
-        self.db = DBManager()
+        self.db = DBManager(stats=stats)
+        # view queries run here, off the Tk thread (ui.loader.get_loader)
+        self.loader = BackgroundLoader(self, workers=max(1, self.db.pool.size))
+        # online snapshots (python -m db.backup for manual ones / restore)
+        self.backups = BackupManager(self.db)
+        if BACKUP_INTERVAL:
+            self.backups.start(BACKUP_INTERVAL)
 
         # menu bar (new)
         self._build_menubar()
@@ -35,6 +50,8 @@ class NetFXApp(tk.Tk):
 
         # keep references to popup windows to avoid garbage collection
         self._popups = []
+        # running exports: thread -> cancel event, so closing can stop them
+        self._exports = {}
         # keep references to global merchant/ratesheet popups so we can refresh them on create
         self._global_popup_refs = {'merchants': None, 'ratesheets': None}
 
@@ -51,6 +68,9 @@ class NetFXApp(tk.Tk):
         create_menu.add_separator()
         create_menu.add_command(label="Insert via Excel/CSV", command=self.open_insert_file_popup)
         menubar.add_cascade(label="Create", menu=create_menu)
+        data_menu = tk.Menu(menubar, tearoff=0)
+        data_menu.add_command(label="Export...", command=self.open_export_popup)
+        menubar.add_cascade(label="Data", menu=data_menu)
         self.config(menu=menubar)
 
     def _center_popup(self, popup, w=400, h=220):
@@ -149,9 +169,6 @@ class NetFXApp(tk.Tk):
                 mid = self.db.insert_merchant(client_sds, name, code)
                 messagebox.showinfo("Success", f"Merchant created with id {mid}")
                 popup.destroy()
-                # refresh global merchant popup if open
-                if self._global_popup_refs.get('merchants'):
-                    self._global_popup_refs['merchants'].event_generate('<<refresh>>')
             except Exception as ex:
                 messagebox.showerror("DB Error", str(ex))
 
@@ -211,9 +228,6 @@ class NetFXApp(tk.Tk):
                 rid = self.db.insert_ratesheet(client_sds, merchant_id, eff, exp, details)
                 messagebox.showinfo("Success", f"Ratesheet created id {rid}")
                 popup.destroy()
-                # refresh global ratesheet popup if open
-                if self._global_popup_refs.get('ratesheets'):
-                    self._global_popup_refs['ratesheets'].event_generate('<<refresh>>')
             except Exception as ex:
                 messagebox.showerror("DB Error", str(ex))
 
@@ -246,6 +260,73 @@ class NetFXApp(tk.Tk):
         popup.protocol("WM_DELETE_WINDOW", on_close)
         return popup
 
+    # ----------------------
+    # Export (runs on its own thread; db.export streams in constant memory)
+    # ----------------------
+    def open_export_popup(self):
+        popup = tk.Toplevel(self)
+        popup.title("Export")
+        self._center_popup(popup, 420, 200)
+        popup.transient(self)
+
+        frm = ttk.Frame(popup, padding=8)
+        frm.pack(fill='both', expand=True)
+
+        ttk.Label(frm, text="Table").grid(row=0, column=0, sticky='w')
+        table = ttk.Combobox(frm, values=list(EXPORTS), state='readonly')
+        table.grid(row=0, column=1, sticky='we'); table.current(0)
+
+        ttk.Label(frm, text="Format").grid(row=1, column=0, sticky='w')
+        fmt = ttk.Combobox(frm, values=list(FORMATS), state='readonly')
+        fmt.grid(row=1, column=1, sticky='we'); fmt.current(0)
+
+        compress = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm, text="gzip", variable=compress).grid(row=2, column=1, sticky='w')
+        status = ttk.Label(frm, text='')
+        status.grid(row=4, column=0, columnspan=2, sticky='w')
+
+        def on_export():
+            name, kind, gz = table.get(), fmt.get(), compress.get()
+            suffix = f".{kind}" + ('.gz' if gz and kind != 'parquet' else '')
+            path = filedialog.asksaveasfilename(parent=popup, initialfile=f"{name}{suffix}", defaultextension=suffix)
+            if not path:
+                return
+            btn.config(state='disabled')
+            started = time.perf_counter()
+            cancel = threading.Event()
+
+            def progress(rows):
+                if cancel.is_set():
+                    raise RuntimeError("export cancelled")
+                rate = rows / max(time.perf_counter() - started, 1e-9)
+                self.loader.post(popup, lambda: status.config(text=f"{rows} rows ({rate:.0f} rows/s)"))
+
+            def run():
+                try:
+                    # a cancel interrupts the page query in flight; export_table
+                    # then removes its .part file
+                    with self.db.pool.progress_handler(cancel.is_set, 1000):
+                        info = export_table(self.db, name, path, kind, gz, progress=progress)
+                except Exception as ex:
+                    if not cancel.is_set():
+                        # bind the message now: `ex` is unbound once the except block ends
+                        self.loader.post(self, lambda msg=str(ex): messagebox.showerror("Export failed", msg))
+                else:
+                    self.loader.post(self, lambda: messagebox.showinfo(
+                        "Export", f"{info['rows']} rows written to {info['path']} ({info['rows_per_s']} rows/s)"))
+                finally:
+                    self._exports.pop(threading.current_thread(), None)
+                if not cancel.is_set():
+                    self.loader.post(popup, lambda: btn.config(state='normal'))
+            # not a loader job: a long export would hold up view loads
+            thread = threading.Thread(target=run, name='export', daemon=True)
+            self._exports[thread] = cancel
+            thread.start()
+
+        btn = ttk.Button(frm, text="Export...", command=on_export)
+        btn.grid(row=3, column=0, columnspan=2, pady=8)
+        frm.grid_columnconfigure(1, weight=1)
+
     # ----------------------
     # Existing app behaviour
     # ----------------------
@@ -296,19 +377,65 @@ class NetFXApp(tk.Tk):
             self.open_popup("Merchants", lambda parent: MerchantView(parent, self.db, None), size=(900,600), role_key='merchants')
         elif text == 'Client Ratesheets':
             self.open_popup("Client Ratesheets", lambda parent: RatesheetView(parent, self.db, None), size=(1000,600), role_key='ratesheets')
+        elif text == 'Intermediaries':
+            self.tabs.open_tab('intermediaries', 'Intermediaries', lambda master: IntermediaryView(master, self.db))
+        elif text == 'GET Limits':
+            self.tabs.open_tab('get_limits', 'GET Limits', lambda master: LimitView(master, self.db))
+        elif text == 'Reports':
+            self.tabs.open_tab('reports', 'Reports', lambda master: ReportView(master, self.db))
         else:
             self.tabs.open_tab(text.lower(), text, lambda master: ttk.Frame(master))
 
     def clients_list_frame(self, master):
         frame = ttk.Frame(master, padding=10)
-        cols = ('sds_id', 'entity_name', 'bank_user_id')
+
+        # search bar: matches client, merchant and ratesheet text (db.search)
+        search_bar = ttk.Frame(frame)
+        search_bar.pack(fill='x', pady=(0, 6))
+        ttk.Label(search_bar, text='Search').pack(side='left')
+        search_var = tk.StringVar()
+        search_ent = ttk.Entry(search_bar, textvariable=search_var)
+        search_ent.pack(side='left', fill='x', expand=True, padx=6)
+
+        cols = ('sds_id', 'entity_name', 'bank_user_id', 'merchant_count', 'ratesheet_count',
+                'active_ratesheet_count', 'last_change_at')
+        headings = {'merchant_count': 'merchants', 'ratesheet_count': 'ratesheets',
+                    'active_ratesheet_count': 'active', 'last_change_at': 'last change'}
         tree = ttk.Treeview(frame, columns=cols, show='headings')
         for c in cols:
-            tree.heading(c, text=c)
-            tree.column(c, width=150)
+            tree.heading(c, text=headings.get(c, c))
+            tree.column(c, width=80 if c.endswith('count') else 150, anchor='e' if c.endswith('count') else 'w')
         tree.pack(fill='both', expand=True)
-        for row in self.db.fetch_all_clients():
-            tree.insert('', 'end', values=(row['sds_id'], row['entity_name'], row['bank_user_id']))
+
+        status = ttk.Label(frame, text='')
+        status.pack(anchor='w')
+
+        def fill(rows):
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert('', 'end', values=tuple('' if row[c] is None else row[c] for c in cols))
+            status.config(text=f"{len(tree.get_children())} clients")
+
+        def search_clients(text):
+            if not text:
+                return self.db.fetch_client_summaries()
+            # clients owning any matching merchant/ratesheet, best match first
+            sds_ids = []
+            for hit in self.db.search(text, limit=200):
+                if hit['client_sds_id'] not in sds_ids:
+                    sds_ids.append(hit['client_sds_id'])
+            return self.db.fetch_client_summaries(sds_ids)
+
+        def on_search(event=None):
+            text = search_var.get().strip()
+            status.config(text='Searching...' if text else 'Loading clients...')
+            # a newer search supersedes one still running
+            self.loader.submit(frame, lambda: search_clients(text), fill,
+                               lambda ex: status.config(text=f"Search failed: {ex}"), key='search')
+
+        search_ent.bind('<Return>', on_search)
+        ttk.Button(search_bar, text='Go', command=on_search).pack(side='left')
+        on_search()
 
         def on_double(e):
             iid = tree.identify_row(e.y)
@@ -327,10 +454,29 @@ class NetFXApp(tk.Tk):
                 p.destroy()
             except Exception:
                 pass
+        self.loader.shutdown()
+        self.backups.stop()
+        self._stop_exports()
         self.db.close()
         self.destroy()
 
+    def _stop_exports(self):
+        """Cancel running exports and wait for them to clean up before the
+        database closes under them."""
+        exports = list(self._exports.items())
+        for _, cancel in exports:
+            cancel.set()
+        deadline = time.perf_counter() + EXPORT_CLOSE_TIMEOUT
+        for thread, _ in exports:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+            if thread.is_alive():
+                print(f"[export] {thread.name} still running at close")
+
 if __name__ == '__main__':
-    app = NetFXApp()
+    parser = argparse.ArgumentParser(prog="python main.py")
+    parser.add_argument("--stats", action="store_true", default=DB_STATS,
+                        help="record query timings for DBManager.stats() (or set NETFX_DB_STATS=1)")
+    args = parser.parse_args()
+    app = NetFXApp(stats=args.stats)
     app.protocol('WM_DELETE_WINDOW', app.on_closing)
     app.mainloop()
@@ -0,0 +1,2 @@
+# pricing/__init__.py
+# rate computation over ratesheet data
@@ -0,0 +1,82 @@
+# pricing/bench.py
+"""Price a synthetic batch through RateTierEngine and a per-row loop.
+
+    python -m pricing.bench [--requests 100000] [--ratesheets 1000]
+
+Runs against an in-memory database; nothing on disk is touched.
+"""
+import argparse
+import random
+import time
+
+PAIRS = ('EUR/USD', 'GBP/USD', 'USD/JPY', 'AUD/USD', 'USD/CHF', 'EUR/GBP')
+
+
+def _populate(db, n_ratesheets, tiers_per_pair, rng):
+    db.insert_clients([(1, 'Bench client')])
+    rids = db.insert_ratesheets([(1, None, '2025-01-01', None, 'bench')] * n_ratesheets)
+    rows = []
+    for rid in rids:
+        for pair in rng.sample(PAIRS, 3):
+            bounds = sorted(rng.sample(range(0, 1_000_000, 1000), tiers_per_pair))
+            for i, lo in enumerate(bounds):
+                hi = bounds[i + 1] if i + 1 < len(bounds) else None
+                rows.append((rid, pair, lo, hi, rng.uniform(0, 50), rng.uniform(0, 0.001)))
+    db.insert_rate_tiers(rows)
+    return rids
+
+
+def _loop_price(tiers, requests):
+    """Reference: group tiers in dicts, then scan the group per request."""
+    groups = {}
+    for t in tiers:
+        groups.setdefault((t['ratesheet_id'], t['currency_pair']), []).append(t)
+    out = []
+    for rid, pair, amount in requests:
+        best = None
+        for t in groups.get((rid, pair), ()):
+            if t['min_amount'] <= amount and (t['max_amount'] is None or amount < t['max_amount']):
+                if best is None or t['min_amount'] > best['min_amount']:
+                    best = t
+        out.append(best['tier_id'] if best else -1)
+    return out
+
+
+def main(argv=None):
+    import numpy as np
+    from db.db_manager import DBManager
+    parser = argparse.ArgumentParser(prog="python -m pricing.bench")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--ratesheets", type=int, default=1000)
+    parser.add_argument("--tiers", type=int, default=4, help="tiers per (ratesheet, pair)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    db = DBManager(':memory:', cache_size=0)
+    rids = _populate(db, args.ratesheets, args.tiers, rng)
+    requests = [(rng.choice(rids), rng.choice(PAIRS), rng.uniform(0, 1_200_000)) for _ in range(args.requests)]
+    ratesheet_ids, pairs, amounts = (np.asarray(col) for col in zip(*requests))
+
+    t0 = time.perf_counter()
+    engine = db.rate_engine()
+    built = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result = engine.price(ratesheet_ids, pairs, amounts, mid=1.0)
+    vectorised = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reference = _loop_price(db.iter_rate_tiers(), requests)
+    looped = time.perf_counter() - t0
+
+    mismatches = sum(1 for a, b in zip(reference, result['tier_id']) if a != b)
+    print(f"[bench] {engine.size} tiers, engine built in {built * 1000:.1f} ms")
+    print(f"[bench] vectorised: {args.requests} requests in {vectorised * 1000:.1f} ms "
+          f"({vectorised / args.requests * 1e6:.2f} us/request)")
+    print(f"[bench] python loop: {looped * 1000:.1f} ms ({looped / args.requests * 1e6:.2f} us/request)")
+    print(f"[bench] {int((result['tier_id'] >= 0).sum())} priced, {mismatches} mismatch(es)")
+    db.close()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,188 @@
+# pricing/cross.py
+"""FX cross rates derived from each ratesheet's directly quoted pairs.
+
+A ratesheet quoting EUR/USD and USD/JPY can also price EUR/JPY, JPY/EUR,
+and so on. Every ratesheet gets a RateMatrix: log rates between all of its
+currencies, closed over chains of quotes by repeated matrix squaring.
+"""
+import math
+import threading
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from db.models import normalize_pair
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for the cross-rate engine: pip install numpy")
+
+
+def _split(pair):
+    pair = normalize_pair(pair)
+    return pair[:3], pair[4:]
+
+
+class RateMatrix:
+    """All derivable rates between one ratesheet's currencies.
+
+    log_rates[i, j] is log(units of j per unit of i), NaN where no chain of
+    quotes connects them; hops[i, j] is the length of that chain (1 for a
+    direct quote). Crosses use the fewest hops, ties going to the
+    alphabetically first pivot currency.
+
+    coeffs[i, j, k] records how often quote k enters cell (i, j), +1 or
+    -1 depending on direction. When a quote's value changes, only the
+    cells that use it shift, by coeffs * delta. No path search is repeated.
+    """
+    def __init__(self, quotes):
+        _require_numpy()
+        self.quotes = {}
+        for pair, rate in dict(quotes).items():
+            self.quotes[normalize_pair(pair)] = float(rate)
+        self._build()
+
+    def _build(self):
+        currencies = set()
+        for pair in self.quotes:
+            currencies.update(_split(pair))
+        self.currencies = sorted(currencies)
+        self.index = {c: i for i, c in enumerate(self.currencies)}
+        n = len(self.currencies)
+
+        # one edge per unordered currency pair; if both directions are quoted
+        # the alphabetically first pair string wins
+        self.edges = {}
+        for pair in sorted(self.quotes):
+            base, quote = _split(pair)
+            if (quote, base) not in self.edges:
+                self.edges[(base, quote)] = len(self.edges)
+
+        log_rates = np.full((n, n), np.nan)
+        hops = np.full((n, n), np.inf)
+        coeffs = np.zeros((n, n, len(self.edges)), dtype=np.int16)
+        np.fill_diagonal(log_rates, 0.0)
+        np.fill_diagonal(hops, 0.0)
+        for (base, quote), k in self.edges.items():
+            i, j = self.index[base], self.index[quote]
+            value = math.log(self.quotes[f"{base}/{quote}"])
+            log_rates[i, j], log_rates[j, i] = value, -value
+            hops[i, j] = hops[j, i] = 1
+            coeffs[i, j, k], coeffs[j, i, k] = 1, -1
+
+        # path doubling: each round considers every pivot k for every (i, j)
+        # at once, so log2(n) rounds reach every connected pair
+        while n:
+            via = hops[:, :, None] + hops[None, :, :]          # [i, k, j]
+            pivot = via.argmin(axis=1)
+            best = np.take_along_axis(via, pivot[:, None, :], axis=1)[:, 0, :]
+            i, j = np.nonzero(best < hops)
+            if not len(i):
+                break
+            k = pivot[i, j]
+            log_rates[i, j] = log_rates[i, k] + log_rates[k, j]
+            coeffs[i, j] = coeffs[i, k] + coeffs[k, j]
+            hops[i, j] = best[i, j]
+
+        self.log_rates = log_rates
+        self.hops = hops
+        self.coeffs = coeffs
+
+    def set_quote(self, pair, rate):
+        """Set (or with rate None, remove) a direct quote.
+
+        A new value for an existing quote is applied in place; adding or
+        removing a quote changes which crosses exist, so the matrix is rebuilt.
+        """
+        pair = normalize_pair(pair)
+        base, quote = _split(pair)
+        if rate is None:
+            if self.quotes.pop(pair, None) is not None:
+                self._build()
+            return
+        rate = float(rate)
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate!r}")
+        old = self.quotes.get(pair)
+        self.quotes[pair] = rate
+        k = self.edges.get((base, quote))
+        if old is None or k is None:
+            # new edge, or the shadowed reverse of an existing one
+            if old is None:
+                self._build()
+            return
+        delta = math.log(rate) - math.log(old)
+        mask = self.coeffs[:, :, k] != 0
+        self.log_rates[mask] += self.coeffs[:, :, k][mask] * delta
+
+    def rate(self, pair):
+        """Units of quote currency per unit of base, or None if not derivable."""
+        base, quote = _split(pair)
+        i, j = self.index.get(base), self.index.get(quote)
+        if i is None or j is None or math.isnan(self.log_rates[i, j]):
+            return None
+        return math.exp(self.log_rates[i, j])
+
+    def rates(self):
+        """The full rate matrix (NaN where not derivable), rows = base."""
+        return np.exp(self.log_rates)
+
+    def crosses(self):
+        """{pair: rate} for every derivable pair that is not quoted directly."""
+        out = {}
+        i, j = np.nonzero(self.hops >= 2)
+        values = np.exp(self.log_rates[i, j])
+        for a, b, v in zip(i, j, values):
+            pair = f"{self.currencies[a]}/{self.currencies[b]}"
+            if pair not in self.quotes:
+                out[pair] = float(v)
+        return out
+
+
+class CrossRateEngine:
+    """Per-ratesheet RateMatrix objects, built on first use.
+
+    `load(ratesheet_id)` returns that ratesheet's {pair: rate} quotes.
+    apply() pushes a single committed quote change into an already-built
+    matrix. invalidate() forgets one ratesheet, to be reloaded on next use.
+    """
+    def __init__(self, load):
+        _require_numpy()
+        self._load = load
+        self._matrices = {}
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def matrix(self, ratesheet_id, cache=True):
+        m = self._matrices.get(ratesheet_id) if cache else None
+        if m is None:
+            version = self._version
+            m = RateMatrix(self._load(ratesheet_id))
+            with self._lock:
+                # don't keep a matrix that raced a change to the quotes
+                if cache and version == self._version:
+                    self._matrices[ratesheet_id] = m
+        return m
+
+    def rate(self, ratesheet_id, pair):
+        return self.matrix(ratesheet_id).rate(pair)
+
+    def apply(self, ratesheet_id, pair, rate):
+        with self._lock:
+            self._version += 1
+            m = self._matrices.get(ratesheet_id)
+            if m is not None:
+                m.set_quote(pair, rate)
+
+    def invalidate(self, ratesheet_id):
+        with self._lock:
+            self._version += 1
+            self._matrices.pop(ratesheet_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._matrices.clear()
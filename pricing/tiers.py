@@ -0,0 +1,144 @@
+# pricing/tiers.py
+"""Vectorised rate-tier lookup.
+
+All tiers are loaded once into flat NumPy arrays sorted by
+(ratesheet, currency pair, min_amount). Each request is mapped to one
+integer sort key, so a whole batch resolves with a single searchsorted
+call instead of a Python loop per row.
+"""
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from db.models import RateTier
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for the rate tier engine: pip install numpy")
+
+
+class RateTierEngine:
+    """Prices batches of (ratesheet_id, currency_pair, amount) requests.
+
+    A tier applies when min_amount <= amount < max_amount (max NULL =
+    unbounded). When bands overlap, the one with the highest min_amount
+    wins.
+    """
+    def __init__(self, tiers):
+        _require_numpy()
+        tiers = list(tiers)
+        self.size = len(tiers)
+        names = {}
+        for t in tiers:
+            raw = t['currency_pair']
+            if raw not in names:
+                names[raw] = RateTier.normalize_pair(raw)
+        pairs = sorted(set(names.values()))
+        self.pairs = {p: i for i, p in enumerate(pairs)}
+        self._pair_names = np.array(pairs, dtype=str)
+        n_pairs = max(1, len(pairs))
+
+        rid = np.fromiter((t['ratesheet_id'] for t in tiers), dtype=np.int64, count=self.size)
+        pair = np.fromiter((self.pairs[names[t['currency_pair']]] for t in tiers),
+                           dtype=np.int64, count=self.size)
+        mins = np.fromiter((t['min_amount'] or 0.0 for t in tiers), dtype=np.float64, count=self.size)
+        maxs = np.fromiter((np.inf if t['max_amount'] is None else t['max_amount'] for t in tiers),
+                           dtype=np.float64, count=self.size)
+
+        # (ratesheet, pair) -> dense group number
+        self._n_pairs = n_pairs
+        group_key = rid * n_pairs + pair
+        self._group_keys, group = np.unique(group_key, return_inverse=True)
+
+        # min_amount -> rank among all distinct band starts
+        self._bounds = np.unique(mins)
+        rank = np.searchsorted(self._bounds, mins)
+        self._stride = len(self._bounds) + 1
+        sort_key = group * self._stride + rank + 1
+
+        order = np.argsort(sort_key, kind='stable')
+        self._sort_key = sort_key[order]
+        self._max = maxs[order]
+        self.tier_id = np.fromiter((t['tier_id'] for t in tiers), dtype=np.int64, count=self.size)[order]
+        self.margin_bps = np.fromiter((t['margin_bps'] or 0.0 for t in tiers), dtype=np.float64, count=self.size)[order]
+        self.spread = np.fromiter((t['spread'] or 0.0 for t in tiers), dtype=np.float64, count=self.size)[order]
+
+    @classmethod
+    def from_db(cls, db):
+        return cls(db.iter_rate_tiers())
+
+    def pair_codes(self, pairs):
+        """Map currency pairs to the engine's integer codes (-1 = no tiers).
+
+        Canonical 'EUR/USD' spellings are matched by a vectorised
+        searchsorted against the sorted pair list; only the rest go through
+        normalize_pair(). Integer arrays are taken as codes already, so a
+        caller pricing many batches can encode once.
+        """
+        pairs = np.asarray(pairs)
+        if pairs.dtype.kind in 'iu':
+            return pairs.astype(np.int64, copy=False)
+        pairs = pairs.astype(str)
+        if not len(self._pair_names):
+            return np.full(len(pairs), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._pair_names, pairs), len(self._pair_names) - 1)
+        codes = np.where(self._pair_names[pos] == pairs, pos, -1)
+        miss = np.flatnonzero(codes < 0)
+        if len(miss):
+            uniq, inverse = np.unique(pairs[miss], return_inverse=True)
+            fixed = np.array([self.pairs.get(self._normalize(p), -1) for p in uniq], dtype=np.int64)
+            codes[miss] = fixed[inverse]
+        return codes
+
+    @staticmethod
+    def _normalize(pair):
+        try:
+            return RateTier.normalize_pair(pair)
+        except ValueError:
+            return None
+
+    def lookup(self, ratesheet_ids, pairs, amounts):
+        """Index into the tier arrays for each request, -1 where no tier applies."""
+        rid = np.asarray(ratesheet_ids, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        code = self.pair_codes(pairs)
+        n = len(rid)
+        if self.size == 0 or n == 0:
+            return np.full(n, -1, dtype=np.int64)
+
+        group_key = rid * self._n_pairs + code
+        g = np.searchsorted(self._group_keys, group_key)
+        g_clipped = np.minimum(g, len(self._group_keys) - 1)
+        known = (code >= 0) & (self._group_keys[g_clipped] == group_key)
+
+        # largest band start <= amount, as a rank (-1 when below every start)
+        rank = np.searchsorted(self._bounds, amounts, side='right') - 1
+        query_key = g_clipped * self._stride + rank + 1
+        idx = np.searchsorted(self._sort_key, query_key, side='right') - 1
+        idx_clipped = np.maximum(idx, 0)
+        same_group = (idx >= 0) & (self._sort_key[idx_clipped] // self._stride == g_clipped)
+        in_band = amounts < self._max[idx_clipped]
+        return np.where(known & same_group & in_band & (rank >= 0), idx, -1)
+
+    def price(self, ratesheet_ids, pairs, amounts, mid=None):
+        """Resolve tiers for a batch; returns a dict of arrays.
+
+        tier_id is -1 and margin_bps/spread NaN where no tier applies. With
+        `mid` (array or scalar) an all-in `rate` is added:
+        mid * (1 + margin_bps / 10000) + spread.
+        """
+        idx = self.lookup(ratesheet_ids, pairs, amounts)
+        hit = idx >= 0
+        out = {
+            'tier_id': np.full(len(idx), -1, dtype=np.int64),
+            'margin_bps': np.full(len(idx), np.nan),
+            'spread': np.full(len(idx), np.nan),
+        }
+        out['tier_id'][hit] = self.tier_id[idx[hit]]
+        out['margin_bps'][hit] = self.margin_bps[idx[hit]]
+        out['spread'][hit] = self.spread[idx[hit]]
+        if mid is not None:
+            out['rate'] = np.asarray(mid, dtype=np.float64) * (1 + out['margin_bps'] / 10000.0) + out['spread']
+        return out
@@ -0,0 +1,26 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.db_manager import DBManager  # noqa: E402
+
+
+@pytest.fixture
+def open_db(tmp_path):
+    """open_db(**kwargs) -> a DBManager on a fresh file under tmp_path;
+    every manager opened is closed after the test."""
+    opened = []
+
+    def open_db(name='netfx.db', **kwargs):
+        kwargs.setdefault('cache_size', 0)
+        kwargs.setdefault('stats', False)
+        db = DBManager(tmp_path / name, **kwargs)
+        opened.append(db)
+        return db
+    yield open_db
+    for db in opened:
+        db.close()
@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from db.async_manager import AsyncDBManager
+
+_SLOW = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+def _slow_read(db, started):
+    with db.pool.read() as conn:
+        started.set()
+        return conn.execute(_SLOW).fetchone()
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'pool_size': 2}, {'pool_size': 2, 'replica': True}])
+def test_progress_handler_only_while_borrowed(open_db, kwargs):
+    db = open_db(**kwargs)
+    with db.pool.progress_handler(lambda: 1, 1):
+        with pytest.raises(sqlite3.OperationalError, match='interrupted'):
+            db.fetch_all_clients()
+    # removed on return: the same connections read normally again
+    for _ in range(3):
+        assert db.fetch_all_clients() == []
+    with db.pool.read() as conn, db.pool.read_primary() as primary:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+        assert primary.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_cancel_interrupts_running_read(open_db):
+    db = open_db(pool_size=2)
+
+    async def run():
+        adb = AsyncDBManager(db=db)
+        started = threading.Event()
+        task = asyncio.ensure_future(adb.run_read(_slow_read, started))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the reader it held is back and reads without being interrupted
+        start = time.perf_counter()
+        clients = await adb.fetch_all_clients()
+        await adb.close()
+        return clients, time.perf_counter() - start
+
+    clients, seconds = asyncio.run(run())
+    assert clients == [] and seconds < 5
+    assert db.pool._readers.qsize() == 2
@@ -0,0 +1,31 @@
+from db.metrics import CountingCursor
+
+
+def _clients(ids):
+    return [(i, f'Client {i}', f'user{i}', 'UTC+0', '00:00') for i in ids]
+
+
+def test_insert_clients_stays_batched(open_db, monkeypatch):
+    db = open_db()
+    calls = []
+    for name in ('execute', 'executemany'):
+        method = getattr(CountingCursor, name)
+        monkeypatch.setattr(CountingCursor, name,
+                            lambda self, sql, params=(), name=name, method=method:
+                            calls.append((name, sql.split()[0])) or method(self, sql, params))
+    db.insert_clients(_clients(range(1000)), chunk_size=500)
+    # per chunk: one key lookup and one executemany, not one INSERT per row
+    assert [c for c in calls if c[1] != 'BEGIN'] == [('execute', 'SELECT'), ('executemany', 'INSERT')] * 2
+    assert db.transaction_log[-1].statements == 1002
+
+
+def test_insert_clients_reports_only_written_rows(open_db):
+    db = open_db()
+    db.insert_client(2, 'Existing', 'u2', 'UTC+0', '00:00')
+    events = []
+    db.subscribe(events.extend)
+    ids = db.insert_clients(_clients([1, 2, 3, 1]), chunk_size=3)
+    assert ids == [1, 2, 3, 1]
+    assert sorted(e.id for e in events) == [1, 3]
+    assert db.fetch_client_by_sds(2)['entity_name'] == 'Existing'
+    assert db.fetch_client_by_sds(1)['entity_name'] == 'Client 1'
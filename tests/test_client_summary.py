@@ -0,0 +1,39 @@
+def _age(db, sds_id):
+    """Leave the client's summary as if last counted yesterday, one too high."""
+    with db.transaction() as tx:
+        tx.conn.execute(
+            "UPDATE client_summary SET active_as_of = date('now', 'localtime', '-1 day'), "
+            "active_ratesheet_count = active_ratesheet_count + 1 WHERE sds_id = ?", (sds_id,))
+
+
+def _stored(db, sds_id):
+    with db.pool.read_primary() as conn:
+        return tuple(conn.execute(
+            "SELECT active_as_of = date('now', 'localtime'), active_ratesheet_count "
+            "FROM client_summary WHERE sds_id = ?", (sds_id,)).fetchone())
+
+
+def test_fetch_client_summaries_is_read_only(open_db):
+    db = open_db()
+    db.insert_client(1, 'Acme', 'u1', 'UTC+0', '00:00')
+    mid = db.insert_merchant(1, 'Acme Shop', 'ACS')
+    db.insert_ratesheet(1, mid, None, None, 'Rates')
+    _age(db, 1)
+    writes = db.conn.total_changes
+
+    [row] = db.fetch_client_summaries()
+    assert row['active_ratesheet_count'] == 1     # counted inline
+    assert db.conn.total_changes == writes
+    assert _stored(db, 1) == (0, 2)
+
+    assert db.recount_active_ratesheets() == 1
+    assert _stored(db, 1) == (1, 1)
+    assert db.fetch_client_summaries()[0]['active_ratesheet_count'] == 1
+
+
+def test_recounted_at_startup(open_db):
+    db = open_db()
+    db.insert_client(1, 'Acme', 'u1', 'UTC+0', '00:00')
+    _age(db, 1)
+    db.close()
+    assert _stored(open_db(), 1) == (1, 0)
@@ -0,0 +1,15 @@
+from db import explain
+from db.migrations import main as migrations
+
+
+def test_seeded_database_is_clean(tmp_path, capsys):
+    path = tmp_path / 'seeded.db'
+    assert migrations(['seed', '--db', str(path)]) in (0, None)
+    assert explain.main(['--db', str(path)]) == 0, capsys.readouterr().out
+
+
+def test_accepted_matches_statement_and_plan_line():
+    sql = "SELECT * FROM rate_tiers"
+    assert explain.accepted(sql, 'SCAN rate_tiers')
+    assert explain.accepted(sql + " WHERE ratesheet_id = ?", 'SCAN rate_tiers') is None
+    assert explain.accepted(sql, 'USE TEMP B-TREE FOR ORDER BY') is None
@@ -0,0 +1,24 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db.export import export_table
+
+
+def test_cancelled_export_leaves_no_part_file(open_db, tmp_path):
+    db = open_db(pool_size=2)
+    db.insert_clients([(i, f'Client {i}', f'u{i}', 'UTC+0', '00:00') for i in range(1, 2001)])
+    path = tmp_path / 'clients.csv'
+    cancel = threading.Event()
+
+    def progress(rows):
+        # closing the app mid-export: the next page query is interrupted
+        cancel.set()
+
+    with pytest.raises(sqlite3.OperationalError, match='interrupted'):
+        with db.pool.progress_handler(cancel.is_set, 100):
+            export_table(db, 'clients', path, progress=progress, page_size=500)
+    assert not path.exists()
+    assert not (tmp_path / 'clients.csv.part').exists()
+    assert db.pool._readers.qsize() == 2
@@ -0,0 +1,18 @@
+import pytest
+
+from tools.importer.engine import insert_from_parsed
+
+
+@pytest.mark.parametrize('stored, given', [
+    ('  Acme Shop  ', 'acme shop'),     # padded name on file
+    ('Café Élan', 'CAFÉ ÉLAN'),         # non-ASCII case difference
+    ('Acme Shop', '  ACME SHOP '),      # padded name in the import
+])
+def test_ratesheet_finds_merchant_by_name(open_db, stored, given):
+    db = open_db(cache_size=64)
+    db.insert_client(1, 'Acme', 'u1', 'UTC+0', '00:00')
+    mid = db.insert_merchant(1, stored)
+    summary = insert_from_parsed(db, {'ratesheet': {
+        'client_sds_id': '1', 'merchant_name': given, 'effective_date': '2025-01-01'}})
+    assert db.fetch_ratesheet_by_id(summary['ratesheet'])['merchant_id'] == mid
+    assert len(db.fetch_merchants_by_client(1)) == 1
@@ -0,0 +1,22 @@
+# tests/test_pool.py
+import pytest
+
+
+@pytest.mark.parametrize('replica', [False, True])
+def test_nested_read_keeps_the_reader_after_outer_generator_closes(open_db, replica):
+    db = open_db(pool_size=2, replica=replica)
+    for i in range(3):
+        db.insert_client(i + 1, f"Client {i}")
+    free = db.pool.replica._free if replica else db.pool._readers
+    size = free.qsize()
+
+    rows = db.iter_all_clients(batch_size=1)
+    next(rows)                          # the generator now holds a reader
+    inner = db.pool.read()
+    conn = inner.__enter__()            # nested borrow on the same thread
+    rows.close()                        # the outer borrow ends first
+    assert free.qsize() == size - 1, "reader returned while still in use"
+    assert conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0] == 3
+    inner.__exit__(None, None, None)
+    assert free.qsize() == size
+    assert not (db.pool.replica._held if replica else db.pool._held)
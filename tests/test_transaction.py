@@ -0,0 +1,31 @@
+# tests/test_transaction.py
+import pytest
+
+
+def _three_statements(db):
+    with db.transaction() as tx:
+        db.insert_client(1, 'Client A')
+        db.insert_merchant(1, 'Merchant A')
+        db.update_client(1, {'timezone': 'UTC+1'})
+    return tx
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'pool_size': 2},
+    {'stats': True},
+    {'replica': True},
+    {'pool_size': 2, 'replica': True, 'stats': True},
+])
+def test_statement_count_is_the_same_in_every_mode(open_db, kwargs):
+    db = open_db(**kwargs)
+    tx = _three_statements(db)
+    assert tx.committed
+    assert tx.statements == 3
+    assert db.transaction_log[-1].statements == 3
+
+
+def test_replica_capture_is_not_counted(open_db):
+    plain = _three_statements(open_db('plain.db'))
+    replicated = _three_statements(open_db('replica.db', replica=True))
+    assert replicated.statements == plain.statements
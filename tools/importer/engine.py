@@ -167,13 +167,8 @@ def insert_from_parsed(db, parsed: dict):
                 raise ValueError("ratesheet>merchant_id must be integer")
         elif r.get('merchant_name'):
             mname = r.get('merchant_name')
-            # find merchant by name for the client
-            found = None
-            ml = db.fetch_merchants_by_client(client_sds)
-            for mm in ml:
-                if mm.get('merchant_name', '').strip().lower() == mname.strip().lower():
-                    found = mm
-                    break
+            # find merchant by name for the client (ignoring case and padding)
+            found = db.fetch_merchant_by_name(client_sds, mname)
             if found:
                 merchant_ref_id = found['merchant_id']
             else:
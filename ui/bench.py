@@ -0,0 +1,151 @@
+# ui/bench.py
+"""Reload a Treeview of N rows by rebuilding it and by KeyedTree.sync().
+
+    python -m ui.bench [--rows 10000] [--repeat 5]
+
+Scenarios: reload with nothing changed, with 1% of rows edited, and with
+1% deleted plus 1% inserted. Uses a hidden ttk.Treeview; without a display
+it falls back to a list-backed stand-in, which counts the same Tk calls but
+leaves out Tk's own cost.
+"""
+import argparse
+import random
+import time
+from ui.keyed_tree import KeyedTree
+
+COLUMNS = ('merchant_id', 'merchant_name', 'merchant_code', 'client_name')
+
+
+class _ListTree:
+    """Just enough of the Treeview API for KeyedTree, kept in a list."""
+    def __init__(self):
+        self.items = []
+        self.detached = set()
+
+    def get_children(self, item=''):
+        return tuple(self.items)
+
+    def insert(self, parent, index, iid=None, values=()):
+        self.items.insert(len(self.items) if index == 'end' else index, iid)
+
+    def item(self, iid, values=None):
+        pass
+
+    def detach(self, *iids):
+        for iid in iids:
+            self.items.remove(iid)
+            self.detached.add(iid)
+
+    def move(self, iid, parent, index):
+        if iid in self.detached:
+            self.detached.discard(iid)
+        else:
+            self.items.remove(iid)
+        self.items.insert(index, iid)
+
+    def delete(self, *iids):
+        for iid in iids:
+            if iid in self.detached:
+                self.detached.discard(iid)
+            else:
+                self.items.remove(iid)
+
+
+class _Counting:
+    """Counts calls made through it to the wrapped tree."""
+    def __init__(self, tree):
+        self._tree = tree
+        self.calls = 0
+
+    def __getattr__(self, name):
+        fn = getattr(self._tree, name)
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            return fn(*args, **kwargs)
+        return call
+
+
+def _make_tree():
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception as ex:
+        print(f"[bench] no Tk display ({ex}); using a list-backed tree, Tk cost excluded")
+        return None, _ListTree()
+    root.withdraw()
+    return root, ttk.Treeview(root, columns=COLUMNS, show='headings')
+
+
+def _rows(n, rng):
+    rows = [{'merchant_id': i, 'merchant_name': f'Merchant {rng.randrange(10 ** 6):06d}',
+             'merchant_code': f'C{i}', 'client_name': f'Client {i % 97}'} for i in range(1, n + 1)]
+    rows.sort(key=_sort_key)
+    return rows
+
+
+def _sort_key(m):
+    return (m['merchant_name'], m['merchant_id'])
+
+
+def _values(m):
+    return (m['merchant_id'], m['merchant_name'], m['merchant_code'], m['client_name'])
+
+
+def _scenarios(rows, rng):
+    n = len(rows)
+    edited = [dict(m) for m in rows]
+    for m in rng.sample(edited, max(1, n // 100)):
+        m['merchant_code'] += '*'
+    churned = [m for m in rows if rng.random() >= 0.01]
+    churned += [{'merchant_id': n + i, 'merchant_name': f'Merchant {rng.randrange(10 ** 6):06d}',
+                 'merchant_code': 'new', 'client_name': 'Client 0'} for i in range(1, n // 100 + 1)]
+    churned.sort(key=_sort_key)
+    return [('unchanged', rows), ('1% edited', edited), ('1% churned', churned)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ui.bench")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    rows = _rows(args.rows, rng)
+    root, base = _make_tree()
+    tree = _Counting(base)
+    view = KeyedTree(tree, row_id=lambda m: m['merchant_id'], sort_key=_sort_key, values=_values)
+    print(f"[bench] reload of {args.rows} rows, best of {args.repeat}")
+    try:
+        for name, result in _scenarios(rows, rng):
+            # before: delete every item and insert the result again
+            rebuild = []
+            for _ in range(args.repeat):
+                view.clear()
+                view.extend(rows)
+                tree.calls = 0
+                start = time.perf_counter()
+                view.clear()
+                view.extend(result)
+                rebuild.append(time.perf_counter() - start)
+            rebuild_calls = tree.calls
+            # after: diff against what is shown
+            synced = []
+            for _ in range(args.repeat):
+                view.clear()
+                view.extend(rows)
+                tree.calls = 0
+                start = time.perf_counter()
+                counts = view.sync(result)
+                synced.append(time.perf_counter() - start)
+            print(f"[bench] {name:<11} rebuild {min(rebuild) * 1000:8.1f} ms {rebuild_calls:6} calls | "
+                  f"sync {min(synced) * 1000:8.1f} ms {tree.calls:6} calls  {counts}")
+    finally:
+        if root is not None:
+            root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
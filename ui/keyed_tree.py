@@ -0,0 +1,189 @@
+# ui/keyed_tree.py
+from bisect import bisect_left
+
+
+class Desc:
+    """Sort-key wrapper that orders values descending."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class KeyedTree:
+    """A ttk.Treeview whose items are keyed by row id and kept in sort order.
+
+    Each item's iid is str(row_id(row)). A parallel list of sort keys in
+    display order lets upsert() and delete() touch only the affected item,
+    so a single-row change costs O(log n) comparisons plus one Tk call;
+    selection and scroll position are left alone. sync() does the same for
+    a whole reloaded result set: only rows that were added, removed,
+    changed or reordered are touched.
+
+    row_id(row) -> id, sort_key(row) -> comparable (ascending = display
+    order, wrap columns in Desc for descending), values(row) -> tuple.
+    """
+    def __init__(self, tree, row_id, sort_key, values):
+        self.tree = tree
+        self.row_id = row_id
+        self.sort_key = sort_key
+        self.values = values
+        self._keys = []         # sort keys, in display order
+        self._key_of = {}       # id -> sort key
+        self._shown = {}        # id -> values tuple last given to Tk
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, row_id):
+        return row_id in self._key_of
+
+    def ids(self):
+        return list(self._key_of)
+
+    @property
+    def last_key(self):
+        return self._keys[-1] if self._keys else None
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self._keys = []
+        self._key_of = {}
+        self._shown = {}
+
+    def extend(self, rows):
+        """Add a page of rows that sorts after everything shown (rows the
+        view already has are upserted instead)."""
+        for row in rows:
+            rid = self.row_id(row)
+            key = self.sort_key(row)
+            if rid in self._key_of or (self._keys and key < self._keys[-1]):
+                self.upsert(row)
+                continue
+            values = self.values(row)
+            self.tree.insert('', 'end', iid=str(rid), values=values)
+            self._keys.append(key)
+            self._key_of[rid] = key
+            self._shown[rid] = values
+
+    def upsert(self, row):
+        """Insert `row` at its sorted position, or update it in place (moving
+        it if its sort key changed)."""
+        rid = self.row_id(row)
+        key = self.sort_key(row)
+        iid = str(rid)
+        values = self.values(row)
+        old = self._key_of.get(rid)
+        if old is None:
+            index = bisect_left(self._keys, key)
+            self.tree.insert('', index, iid=iid, values=values)
+            self._keys.insert(index, key)
+            self._key_of[rid] = key
+            self._shown[rid] = values
+            return
+        if values != self._shown[rid]:
+            self.tree.item(iid, values=values)
+            self._shown[rid] = values
+        if key == old:
+            return
+        del self._keys[self._index(old)]
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._key_of[rid] = key
+        self.tree.move(iid, '', index)
+
+    def delete(self, row_id):
+        key = self._key_of.pop(row_id, None)
+        if key is None:
+            return False
+        del self._keys[self._index(key)]
+        del self._shown[row_id]
+        self.tree.delete(str(row_id))
+        return True
+
+    def sync(self, rows):
+        """Make the tree show exactly `rows` (already in display order),
+        touching only the items that differ. Returns a dict of counts
+        (inserted, updated, moved, deleted)."""
+        ids = [self.row_id(row) for row in rows]
+        wanted = set(ids)
+        gone = [rid for rid in self._key_of if rid not in wanted]
+        if gone:
+            self.tree.delete(*[str(rid) for rid in gone])
+            for rid in gone:
+                del self._shown[rid]
+        # surviving items keep their relative order; a longest run of them
+        # that is also in new order stays put, the others are moved
+        order = [rid for rid in self._key_of if rid in wanted] if gone else list(self._key_of)
+        order.sort(key=self._key_of.__getitem__)
+        position = {rid: i for i, rid in enumerate(order)}
+        keep = _increasing_run(ids, position)
+        # with the rest detached, the kept rows already stand in order, so
+        # every other row can be placed by its final index
+        stray = [str(rid) for rid in order if rid not in keep]
+        if stray:
+            self.tree.detach(*stray)
+        inserted = updated = moved = 0
+        keys = []
+        key_of = {}
+        for index, (rid, row) in enumerate(zip(ids, rows)):
+            key = self.sort_key(row)
+            keys.append(key)
+            key_of[rid] = key
+            values = self.values(row)
+            iid = str(rid)
+            if rid not in position:
+                self.tree.insert('', index, iid=iid, values=values)
+                self._shown[rid] = values
+                inserted += 1
+                continue
+            if values != self._shown[rid]:
+                self.tree.item(iid, values=values)
+                self._shown[rid] = values
+                updated += 1
+            if rid not in keep:
+                self.tree.move(iid, '', index)
+                moved += 1
+        self._keys = keys
+        self._key_of = key_of
+        return {'inserted': inserted, 'updated': updated, 'moved': moved, 'deleted': len(gone)}
+
+    def _index(self, key):
+        # sort keys end in the row id, so they are unique
+        return bisect_left(self._keys, key)
+
+
+def _increasing_run(ids, position):
+    """Ids (of those in `position`) forming a longest run whose old
+    positions increase in new order; everything else has to move."""
+    seq = [position[rid] for rid in ids if rid in position]
+    if all(a < b for a, b in zip(seq, seq[1:])):
+        # the usual reload: nothing reordered
+        return position.keys()
+    tails = []              # tails[k]: old position ending a run of length k+1
+    tail_ids = []
+    parent = {}
+    for rid in ids:
+        pos = position.get(rid)
+        if pos is None:
+            continue
+        k = bisect_left(tails, pos)
+        parent[rid] = tail_ids[k - 1] if k else None
+        if k == len(tails):
+            tails.append(pos)
+            tail_ids.append(rid)
+        else:
+            tails[k] = pos
+            tail_ids[k] = rid
+    keep = set()
+    rid = tail_ids[-1] if tail_ids else None
+    while rid is not None:
+        keep.add(rid)
+        rid = parent[rid]
+    return keep
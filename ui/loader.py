@@ -0,0 +1,161 @@
+# ui/loader.py
+import queue
+import threading
+
+
+class Job:
+    """A query submitted to the BackgroundLoader. cancel() stops it from
+    starting if it hasn't, and drops its result if it has."""
+    __slots__ = ('owner', 'key', 'fn', 'on_done', 'on_error', 'cancelled')
+
+    def __init__(self, owner, key, fn, on_done, on_error):
+        self.owner = owner
+        self.key = key
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BackgroundLoader:
+    """Runs view queries on worker threads so Tk never waits on SQLite.
+
+    Results come back through a queue that the Tk thread drains with
+    after(), so callbacks always run on the Tk thread. Each job belongs to
+    a widget: when that widget is destroyed its jobs are cancelled. When a
+    job is submitted with a key, any earlier job of the same owner and key
+    is superseded. post() lets other threads (database event subscribers)
+    hand a callable to the Tk thread the same way.
+    """
+    def __init__(self, root, workers=1, poll_ms=25, idle_ms=200):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.idle_ms = idle_ms
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._keyed = {}        # (owner path, key) -> Job
+        self._owned = {}        # owner path -> set of Jobs
+        self._outstanding = 0
+        self._closed = False
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._work, name=f'ui-loader-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        # poll quickly while jobs are outstanding, slowly for posts otherwise
+        self._fast = False
+        self._polling = root.after(idle_ms, self._drain)
+
+    # ---- Tk thread ----
+    def submit(self, owner, fn, on_done, on_error=None, key=None):
+        """Run fn() on a worker, then on_done(result) (or on_error(exc)) on
+        the Tk thread, unless owner has been destroyed by then."""
+        path = str(owner)
+        if key is not None:
+            prev = self._keyed.get((path, key))
+            if prev is not None:
+                prev.cancel()
+        job = Job(owner, key, fn, on_done, on_error)
+        if key is not None:
+            self._keyed[(path, key)] = job
+        if path not in self._owned:
+            self._owned[path] = set()
+            owner.bind('<Destroy>', lambda e, o=owner: e.widget is o and self.cancel_owner(o), add='+')
+        self._owned[path].add(job)
+        self._outstanding += 1
+        self._jobs.put(job)
+        if not self._fast and self._polling is not None:
+            self.root.after_cancel(self._polling)
+            self._fast = True
+            self._polling = self.root.after(self.poll_ms, self._drain)
+        return job
+
+    def post(self, owner, fn):
+        """Run fn() on the Tk thread at the next poll, unless owner has been
+        destroyed by then. Safe to call from any thread."""
+        self._results.put((Job(owner, None, None, fn, None), None, None))
+
+    def cancel_owner(self, owner):
+        """Cancel every job of `owner` (called automatically on <Destroy>)."""
+        path = str(owner)
+        for job in self._owned.pop(path, ()):
+            job.cancel()
+        for k in [k for k in self._keyed if k[0] == path]:
+            del self._keyed[k]
+
+    def _forget(self, job):
+        path = str(job.owner)
+        jobs = self._owned.get(path)
+        if jobs is not None:
+            jobs.discard(job)
+        if job.key is not None and self._keyed.get((path, job.key)) is job:
+            del self._keyed[(path, job.key)]
+
+    def _drain(self):
+        self._polling = None
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if ok is not None:
+                self._outstanding -= 1
+                self._forget(job)
+            if job.cancelled or not job.owner.winfo_exists():
+                continue
+            try:
+                if ok is None:
+                    job.on_done()
+                elif ok:
+                    job.on_done(value)
+                elif job.on_error is not None:
+                    job.on_error(value)
+                else:
+                    print(f"[loader] query for {job.owner} failed: {value}")
+            except Exception as ex:
+                print(f"[loader] callback for {job.owner} failed: {ex}")
+        if self._closed:
+            return
+        self._fast = bool(self._outstanding)
+        self._polling = self.root.after(self.poll_ms if self._fast else self.idle_ms, self._drain)
+
+    def shutdown(self):
+        self._closed = True
+        for path in list(self._owned):
+            for job in self._owned[path]:
+                job.cancel()
+        self._owned.clear()
+        self._keyed.clear()
+        if self._polling is not None:
+            self.root.after_cancel(self._polling)
+            self._polling = None
+        for _ in self._threads:
+            self._jobs.put(None)
+
+    # ---- worker threads ----
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if job.cancelled:
+                self._results.put((job, False, None))
+                continue
+            try:
+                self._results.put((job, True, job.fn()))
+            except Exception as ex:
+                self._results.put((job, False, ex))
+
+
+def get_loader(widget):
+    """The application's BackgroundLoader, created on the Tk root on first use."""
+    root = widget.nametowidget('.')
+    loader = getattr(root, 'loader', None)
+    if loader is None:
+        db = getattr(root, 'db', None)
+        workers = max(1, db.pool.size) if db is not None else 1
+        loader = root.loader = BackgroundLoader(root, workers=workers)
+    return loader
@@ -1,6 +1,7 @@
 # ui/client_view.py
 import tkinter as tk
 from tkinter import ttk, messagebox
+from ui.loader import get_loader
 
 class ClientView(ttk.Frame):
     FIELDS = [
@@ -16,6 +17,7 @@ class ClientView(ttk.Frame):
         self.db = db
         self.sds_id = sds_id
         self.entries = {}
+        self.loader = get_loader(self)
         self._build()
         if sds_id is not None:
             self.load(sds_id)
@@ -33,11 +35,17 @@ class ClientView(ttk.Frame):
                 ent.config(state='readonly')
         btns = ttk.Frame(frm)
         btns.grid(row=len(self.FIELDS), column=0, columnspan=2, pady=10)
-        save = ttk.Button(btns, text='Save', command=self.save)
-        save.pack(side='left', padx=5)
+        self.save_btn = ttk.Button(btns, text='Save', command=self.save)
+        self.save_btn.pack(side='left', padx=5)
 
     def load(self, sds_id):
-        data = self.db.fetch_client_by_sds(sds_id)
+        # Save stays disabled until the record has arrived
+        self.save_btn.config(state='disabled')
+        self.loader.submit(self, lambda: self.db.fetch_client_by_sds(sds_id),
+                           lambda data: self._fill(sds_id, data), key='load')
+
+    def _fill(self, sds_id, data):
+        self.save_btn.config(state='normal')
         if not data:
             messagebox.showerror('Not found', f'Client {sds_id} not found')
             return
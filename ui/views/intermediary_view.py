@@ -0,0 +1,219 @@
+# ui/intermediary_view.py
+import sqlite3
+import tkinter as tk
+from tkinter import ttk, messagebox
+from ui.loader import get_loader
+
+class IntermediaryView(ttk.Frame):
+    """Intermediaries with the links of the selected one and the merchants
+    reachable through it; allows add/edit/delete, linking and finding the
+    chain from a client to a merchant."""
+    def __init__(self, master, db):
+        super().__init__(master)
+        self.db = db
+        self.rows = {}
+        self.loader = get_loader(self)
+        self._build()
+        # links cascade away with their client, merchant or intermediary
+        unsubscribe = db.subscribe(lambda events: self.loader.post(self, self.load),
+                                   entities=('intermediary', 'intermediary_link', 'merchant', 'client'))
+        self.bind('<Destroy>', lambda e: e.widget is self and unsubscribe(), add='+')
+        self.load()
+
+    def _tree(self, master, cols, height):
+        body = ttk.Frame(master)
+        body.pack(fill='both', expand=True, pady=4)
+        tree = ttk.Treeview(body, columns=cols, show='headings', height=height)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=120)
+        vsb = ttk.Scrollbar(body, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        return tree
+
+    def _build(self):
+        frm = ttk.Frame(self, padding=8)
+        frm.pack(fill='both', expand=True)
+        ttk.Label(frm, text='Intermediaries', font=(None, 12)).pack(anchor='w')
+        self.tree = self._tree(frm, ('intermediary_id', 'name', 'code', 'merchants'), 10)
+        self.tree.bind('<<TreeviewSelect>>', lambda e: self.load_selected())
+
+        btns = ttk.Frame(frm)
+        btns.pack(fill='x')
+        ttk.Button(btns, text='Add', command=lambda: self.edit_popup(None)).pack(side='left', padx=4)
+        ttk.Button(btns, text='Edit', command=self.edit_selected).pack(side='left', padx=4)
+        ttk.Button(btns, text='Delete', command=self.delete_selected).pack(side='left', padx=4)
+        ttk.Button(btns, text='Link', command=self.link_popup).pack(side='left', padx=4)
+        ttk.Button(btns, text='Unlink', command=self.unlink_selected).pack(side='left', padx=4)
+        ttk.Button(btns, text='Find Path', command=self.path_popup).pack(side='left', padx=4)
+
+        lower = ttk.Frame(frm)
+        lower.pack(fill='both', expand=True)
+        links = ttk.Frame(lower)
+        links.pack(side='left', fill='both', expand=True)
+        ttk.Label(links, text='Links').pack(anchor='w')
+        self.links = self._tree(links, ('link_id', 'from', 'to'), 8)
+        reach = ttk.Frame(lower)
+        reach.pack(side='left', fill='both', expand=True, padx=(8, 0))
+        ttk.Label(reach, text='Reachable merchants').pack(anchor='w')
+        self.merchants = self._tree(reach, ('merchant_id', 'merchant_name', 'client_sds_id', 'paths'), 8)
+        self.status = ttk.Label(frm, text='')
+        self.status.pack(anchor='w')
+
+    def load(self):
+        self.status.config(text='Loading intermediaries...')
+        self.loader.submit(self, self.db.fetch_intermediaries, self._show,
+                           lambda ex: self.status.config(text=f"Load failed: {ex}"), key='load')
+
+    def _show(self, rows):
+        selected = self.selected_id()
+        self.rows = {r['intermediary_id']: r for r in rows}
+        self.tree.delete(*self.tree.get_children())
+        for r in rows:
+            self.tree.insert('', 'end', iid=str(r['intermediary_id']),
+                             values=(r['intermediary_id'], r['name'], r['code'] or '', r['merchant_count']))
+        self.status.config(text=f"{len(rows)} intermediaries")
+        if selected in self.rows:
+            self.tree.selection_set(str(selected))
+        self.load_selected()
+
+    def selected_id(self):
+        sel = self.tree.selection()
+        return int(sel[0]) if sel else None
+
+    def load_selected(self):
+        intermediary_id = self.selected_id()
+        if intermediary_id is None or intermediary_id not in self.rows:
+            self._show_selected(([], []))
+            return
+        self.loader.submit(self, lambda: (self.db.fetch_intermediary_links(intermediary_id),
+                                          self.db.merchants_via_intermediary(intermediary_id)),
+                           self._show_selected, lambda ex: self.status.config(text=f"Load failed: {ex}"),
+                           key='selected')
+
+    @staticmethod
+    def _node(kind, node_id, name):
+        return f"{kind} {node_id} - {name or ''}"
+
+    def _show_selected(self, result):
+        links, merchants = result
+        self.links.delete(*self.links.get_children())
+        for l in links:
+            parent = (self._node('client', l['client_sds_id'], l['parent_name']) if l['client_sds_id'] is not None
+                      else self._node('intermediary', l['parent_id'], l['parent_name']))
+            child = (self._node('merchant', l['merchant_id'], l['child_name']) if l['merchant_id'] is not None
+                     else self._node('intermediary', l['child_id'], l['child_name']))
+            self.links.insert('', 'end', iid=str(l['link_id']), values=(l['link_id'], parent, child))
+        self.merchants.delete(*self.merchants.get_children())
+        for m in merchants:
+            self.merchants.insert('', 'end', values=(m['merchant_id'], m['merchant_name'], m['client_sds_id'], m['paths']))
+
+    def edit_popup(self, row):
+        popup = tk.Toplevel(self)
+        popup.title('Edit Intermediary' if row else 'Add Intermediary')
+        ttk.Label(popup, text='Name').grid(row=0, column=0)
+        name = ttk.Entry(popup); name.grid(row=0, column=1)
+        ttk.Label(popup, text='Code').grid(row=1, column=0)
+        code = ttk.Entry(popup); code.grid(row=1, column=1)
+        if row:
+            name.insert(0, row['name'])
+            code.insert(0, row['code'] or '')
+
+        def on_ok():
+            if not name.get().strip():
+                messagebox.showerror('Error', 'Name is required'); return
+            if row:
+                self.db.update_intermediary(row['intermediary_id'], {'name': name.get().strip(),
+                                                                     'code': code.get().strip() or None})
+            else:
+                self.db.insert_intermediary(name.get().strip(), code.get().strip() or None)
+            popup.destroy()
+
+        ttk.Button(popup, text='OK', command=on_ok).grid(row=2, column=0, columnspan=2)
+
+    def edit_selected(self):
+        intermediary_id = self.selected_id()
+        if intermediary_id is None:
+            messagebox.showinfo('Select', 'Select an intermediary'); return
+        self.edit_popup(self.rows[intermediary_id])
+
+    def delete_selected(self):
+        intermediary_id = self.selected_id()
+        if intermediary_id is None:
+            messagebox.showinfo('Select', 'Select an intermediary'); return
+        if messagebox.askyesno('Confirm', 'Delete intermediary and its links?'):
+            self.db.delete_intermediary(intermediary_id)
+
+    def link_popup(self):
+        """Link a client or intermediary to an intermediary or merchant; the
+        selected intermediary is offered as the child."""
+        popup = tk.Toplevel(self)
+        popup.title('Link')
+        ttk.Label(popup, text='From').grid(row=0, column=0)
+        parent_kind = ttk.Combobox(popup, values=('Client', 'Intermediary'), state='readonly', width=12)
+        parent_kind.grid(row=0, column=1); parent_kind.current(0)
+        parent = ttk.Entry(popup); parent.grid(row=0, column=2)
+        ttk.Label(popup, text='To').grid(row=1, column=0)
+        child_kind = ttk.Combobox(popup, values=('Intermediary', 'Merchant'), state='readonly', width=12)
+        child_kind.grid(row=1, column=1); child_kind.current(0)
+        child = ttk.Entry(popup); child.grid(row=1, column=2)
+        if self.selected_id() is not None:
+            child.insert(0, str(self.selected_id()))
+
+        def on_ok():
+            try:
+                parent_id, child_id = int(parent.get()), int(child.get())
+            except ValueError:
+                messagebox.showerror('Error', 'IDs must be whole numbers'); return
+            ends = {'client_sds_id' if parent_kind.get() == 'Client' else 'parent_id': parent_id,
+                    'merchant_id' if child_kind.get() == 'Merchant' else 'child_id': child_id}
+            try:
+                self.db.insert_intermediary_link(**ends)
+            except sqlite3.IntegrityError as ex:
+                messagebox.showerror('Error', f"Cannot link: {ex}"); return
+            popup.destroy()
+
+        ttk.Button(popup, text='OK', command=on_ok).grid(row=2, column=0, columnspan=3)
+
+    def unlink_selected(self):
+        sel = self.links.selection()
+        if not sel:
+            messagebox.showinfo('Select', 'Select a link'); return
+        if messagebox.askyesno('Confirm', 'Remove link?'):
+            self.db.delete_intermediary_link(int(sel[0]))
+
+    def path_popup(self):
+        popup = tk.Toplevel(self)
+        popup.title('Find Path')
+        ttk.Label(popup, text='Client SDS ID').grid(row=0, column=0)
+        client = ttk.Entry(popup); client.grid(row=0, column=1)
+        ttk.Label(popup, text='Merchant ID').grid(row=1, column=0)
+        merchant = ttk.Entry(popup); merchant.grid(row=1, column=1)
+        result = ttk.Label(popup, text='', wraplength=360)
+        result.grid(row=3, column=0, columnspan=2)
+
+        def on_find():
+            try:
+                client_sds_id, merchant_id = int(client.get()), int(merchant.get())
+            except ValueError:
+                result.config(text='IDs must be whole numbers'); return
+            result.config(text='Searching...')
+
+            def query():
+                path = self.db.intermediary_path(client_sds_id, merchant_id)
+                return path, (self.db.intermediary_routes(client_sds_id, merchant_id) if path is not None else 0)
+
+            def show(found):
+                path, routes = found
+                if path is None:
+                    result.config(text='Not connected')
+                    return
+                chain = ' -> '.join(f"{i['name']} ({i['intermediary_id']})" for i in path)
+                result.config(text=f"client {client_sds_id} -> {chain} -> merchant {merchant_id}\n"
+                                   f"{routes} chain{'s' if routes != 1 else ''} in total")
+            # owned by the popup: closing it drops the result, a new Find supersedes it
+            self.loader.submit(popup, query, show, lambda ex: result.config(text=f"Search failed: {ex}"), key='find')
+
+        ttk.Button(popup, text='Find', command=on_find).grid(row=2, column=0, columnspan=2)
@@ -0,0 +1,158 @@
+# ui/limit_view.py
+import tkinter as tk
+from tkinter import ttk, messagebox
+from ui.loader import get_loader
+
+class LimitView(ttk.Frame):
+    """GET limits of every client and merchant, with today's usage; allows
+    add/edit/delete and checking a trade against them."""
+    def __init__(self, master, db):
+        super().__init__(master)
+        self.db = db
+        self.loader = get_loader(self)
+        self._build()
+        # limits cascade away with their client or merchant
+        unsubscribe = db.subscribe(lambda events: self.loader.post(self, self.load),
+                                   entities=('limit', 'merchant', 'client'))
+        self.bind('<Destroy>', lambda e: e.widget is self and unsubscribe(), add='+')
+        self.load()
+
+    def _build(self):
+        frm = ttk.Frame(self, padding=8)
+        frm.pack(fill='both', expand=True)
+        ttk.Label(frm, text='GET Limits', font=(None, 12)).pack(anchor='w')
+
+        cols = ('limit_id', 'client', 'merchant', 'currency', 'single_trade_max', 'daily_max', 'used_today')
+        body = ttk.Frame(frm)
+        body.pack(fill='both', expand=True, pady=6)
+        self.tree = ttk.Treeview(body, columns=cols, show='headings', height=15)
+        for c in cols:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, width=120)
+        vsb = ttk.Scrollbar(body, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        self.status = ttk.Label(frm, text='')
+        self.status.pack(anchor='w')
+
+        btns = ttk.Frame(frm)
+        btns.pack(fill='x')
+        ttk.Button(btns, text='Add', command=lambda: self.edit_popup(None)).pack(side='left', padx=4)
+        ttk.Button(btns, text='Edit', command=self.edit_selected).pack(side='left', padx=4)
+        ttk.Button(btns, text='Delete', command=self.delete_selected).pack(side='left', padx=4)
+        ttk.Button(btns, text='Check Trade', command=self.check_popup).pack(side='left', padx=4)
+
+    def load(self):
+        self.status.config(text='Loading limits...')
+
+        def query():
+            index = self.db.limit_index()
+            rows = self.db.fetch_limits()
+            for r in rows:
+                # a default (any currency) limit counts each currency separately
+                r['used_today'] = (index.used(r['client_sds_id'], r['merchant_id'], r['currency'])
+                                   if r['currency'] else None)
+            return rows
+        self.loader.submit(self, query, self._show,
+                           lambda ex: self.status.config(text=f"Load failed: {ex}"), key='load')
+
+    def _show(self, rows):
+        self.rows = {r['limit_id']: r for r in rows}
+        self.tree.delete(*self.tree.get_children())
+        for r in rows:
+            self.tree.insert('', 'end', iid=str(r['limit_id']), values=(
+                r['limit_id'],
+                f"{r['client_sds_id']} - {r['entity_name'] or ''}",
+                f"{r['merchant_id']} - {r['merchant_name'] or ''}" if r['merchant_id'] is not None else '(all)',
+                r['currency'] or '(any)',
+                '' if r['single_trade_max'] is None else r['single_trade_max'],
+                '' if r['daily_max'] is None else r['daily_max'],
+                '' if r['used_today'] is None else r['used_today'],
+            ))
+        self.status.config(text=f"{len(rows)} limits")
+
+    @staticmethod
+    def _amount(entry):
+        text = entry.get().strip().replace(',', '')
+        return float(text) if text else None
+
+    def edit_popup(self, row):
+        """Add a limit (row None) or change the maxima of `row`; the scope of
+        an existing limit is fixed."""
+        popup = tk.Toplevel(self)
+        popup.title('Edit Limit' if row else 'Add Limit')
+        fields = {}
+        for i, (key, label) in enumerate((('client', 'Client SDS ID'), ('merchant', 'Merchant ID (optional)'),
+                                          ('currency', 'Currency (blank: any)'), ('single', 'Single Trade Max'),
+                                          ('daily', 'Daily Max'))):
+            ttk.Label(popup, text=label).grid(row=i, column=0, sticky='w')
+            fields[key] = ttk.Entry(popup)
+            fields[key].grid(row=i, column=1)
+        if row:
+            for key, col in (('client', 'client_sds_id'), ('merchant', 'merchant_id'), ('currency', 'currency'),
+                             ('single', 'single_trade_max'), ('daily', 'daily_max')):
+                fields[key].insert(0, '' if row[col] is None else row[col])
+            for key in ('client', 'merchant', 'currency'):
+                fields[key].config(state='disabled')
+
+        def on_ok():
+            try:
+                client = int(fields['client'].get())
+                merchant = int(fields['merchant'].get()) if fields['merchant'].get().strip() else None
+                single, daily = self._amount(fields['single']), self._amount(fields['daily'])
+            except ValueError:
+                messagebox.showerror('Error', 'IDs must be whole numbers and maxima amounts'); return
+            try:
+                self.db.set_limit(client, merchant, fields['currency'].get(), single, daily)
+            except Exception as ex:
+                messagebox.showerror('Error', f"Failed to save limit: {ex}"); return
+            popup.destroy()
+
+        ttk.Button(popup, text='OK', command=on_ok).grid(row=5, column=0, columnspan=2)
+
+    def _selected(self):
+        sel = self.tree.selection()
+        if not sel:
+            messagebox.showinfo('Select', 'Select a limit'); return None
+        return self.rows.get(int(sel[0]))
+
+    def edit_selected(self):
+        row = self._selected()
+        if row:
+            self.edit_popup(row)
+
+    def delete_selected(self):
+        row = self._selected()
+        if row and messagebox.askyesno('Confirm', 'Delete limit?'):
+            self.db.delete_limit(row['limit_id'])
+
+    def check_popup(self):
+        popup = tk.Toplevel(self)
+        popup.title('Check Trade')
+        fields = {}
+        for i, (key, label) in enumerate((('client', 'Client SDS ID'), ('merchant', 'Merchant ID (optional)'),
+                                          ('currency', 'Currency'), ('amount', 'Amount'))):
+            ttk.Label(popup, text=label).grid(row=i, column=0, sticky='w')
+            fields[key] = ttk.Entry(popup)
+            fields[key].grid(row=i, column=1)
+        result = ttk.Label(popup, text='')
+        result.grid(row=5, column=0, columnspan=2)
+
+        def on_check():
+            try:
+                trade = (int(fields['client'].get()),
+                         int(fields['merchant'].get()) if fields['merchant'].get().strip() else None,
+                         fields['currency'].get(), self._amount(fields['amount']) or 0.0)
+            except ValueError:
+                result.config(text='IDs must be whole numbers and the amount a number'); return
+            result.config(text='Checking...')
+
+            def show(breaches):
+                result.config(text='Allowed' if not breaches else '\n'.join(
+                    f"{b.scope} {b.kind} limit {b.limit:,.2f} exceeded: {b.amount:,.2f}" for b in breaches))
+            # check_limits may rebuild the index; owned by the popup so closing it drops the result
+            self.loader.submit(popup, lambda: self.db.check_limits([trade])[0], show,
+                               lambda ex: result.config(text=f"Check failed: {ex}"), key='check')
+
+        ttk.Button(popup, text='Check', command=on_check).grid(row=4, column=0, columnspan=2)
@@ -1,6 +1,10 @@
 # ui/merchant_view.py
 import tkinter as tk
 from tkinter import ttk, messagebox
+from config import PAGE_SIZE
+from db.events import DELETE, UPDATE
+from ui.keyed_tree import KeyedTree
+from ui.loader import get_loader
 
 class MerchantView(ttk.Frame):
     """Shows merchants for a specific client and allows add/edit/delete.
@@ -11,7 +15,16 @@ class MerchantView(ttk.Frame):
         super().__init__(master)
         self.db = db
         self.client_sds_id = client_sds_id
+        self._after = None
+        self._exhausted = False
+        self._loading = False
+        self._total = 0
+        self.loader = get_loader(self)
         self._build()
+        # committed changes arrive on the writer's thread; hop to Tk to apply them
+        unsubscribe = db.subscribe(lambda events: self.loader.post(self, lambda: self._on_changes(events)),
+                                   entities=('merchant', 'client'))
+        self.bind('<Destroy>', lambda e: e.widget is self and unsubscribe(), add='+')
         # load will be called if client_scoped or global
         self.load()
 
@@ -24,11 +37,19 @@ class MerchantView(ttk.Frame):
 
         # superset columns so global view can show client_name
         cols = ('merchant_id', 'merchant_name', 'merchant_code', 'client_name')
-        self.tree = ttk.Treeview(frm, columns=cols, show='headings', height=12)
+        body = ttk.Frame(frm)
+        body.pack(fill='both', expand=True, pady=6)
+        self.tree = ttk.Treeview(body, columns=cols, show='headings', height=12)
         for c in cols:
             self.tree.heading(c, text=c)
             self.tree.column(c, width=150)
-        self.tree.pack(fill='both', expand=True, pady=6)
+        self.vsb = ttk.Scrollbar(body, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.vsb.pack(side='right', fill='y')
+        self.rows = KeyedTree(self.tree, row_id=lambda m: m['merchant_id'], sort_key=self._sort_key, values=self._values)
+        self.status = ttk.Label(frm, text='')
+        self.status.pack(anchor='w')
 
         btns = ttk.Frame(frm)
         btns.pack(fill='x')
@@ -38,17 +59,121 @@ class MerchantView(ttk.Frame):
 
     def load(self):
         print(f"[MerchantView] load() called for client_sds_id={self.client_sds_id}")
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-
-        if self.client_sds_id is None:
-            merchants = self.db.fetch_all_merchants()
-            for m in merchants:
-                self.tree.insert('', 'end', values=(m['merchant_id'], m['merchant_name'], m.get('merchant_code',''), m.get('client_name','')))
-        else:
-            merchants = self.db.fetch_merchants_by_client(self.client_sds_id)
-            for m in merchants:
-                self.tree.insert('', 'end', values=(m['merchant_id'], m['merchant_name'], m.get('merchant_code',''), ''))
+        # re-fetch at least what is shown, so the result can be diffed in
+        # place instead of rebuilding the tree
+        limit = max(PAGE_SIZE, len(self.rows))
+        self._after = None
+        self._exhausted = False
+        self._loading = True
+        self.status.config(text='Loading merchants...')
+        client_sds_id = self.client_sds_id
+
+        def query():
+            return (self.db.estimate_count('merchants', client_sds_id),
+                    self.db.fetch_merchants_page(limit=limit, client_sds_id=client_sds_id))
+        # key='page' supersedes any page still in flight from a previous load
+        self.loader.submit(self, query, lambda result: self._on_first_page(result, limit),
+                           self._on_load_error, key='page')
+
+    def _on_first_page(self, result, limit):
+        self._total, merchants = result
+        self._loading = False
+        changed = self.rows.sync(merchants)
+        print(f"[MerchantView] reload: {changed}")
+        if merchants:
+            self._after = (merchants[-1]['merchant_name'], merchants[-1]['merchant_id'])
+        self._exhausted = len(merchants) < limit
+        self._show_status()
+
+    def load_more(self):
+        """Fetch the next keyset page in the background; called when scrolled to the end."""
+        if self._exhausted or self._loading:
+            return
+        self._loading = True
+        after, client_sds_id = self._after, self.client_sds_id
+        self.loader.submit(
+            self, lambda: self.db.fetch_merchants_page(after=after, limit=PAGE_SIZE, client_sds_id=client_sds_id),
+            self._show_page, self._on_load_error, key='page'
+        )
+
+    @staticmethod
+    def _sort_key(m):
+        # same order as fetch_merchants_page
+        return (m['merchant_name'], m['merchant_id'])
+
+    def _values(self, m):
+        client_name = m.get('client_name', '') if self.client_sds_id is None else ''
+        return (m['merchant_id'], m['merchant_name'], m.get('merchant_code',''), client_name)
+
+    def _show_page(self, merchants):
+        self._loading = False
+        self.rows.extend(merchants)
+        if merchants:
+            self._after = (merchants[-1]['merchant_name'], merchants[-1]['merchant_id'])
+        self._exhausted = len(merchants) < PAGE_SIZE
+        self._show_status()
+
+    def _show_status(self):
+        shown = len(self.rows)
+        self.status.config(text=f"{shown} merchants" if self._exhausted else f"{shown} of ~{self._total} merchants")
+
+    # ---- change events ----
+    def _on_changes(self, events):
+        """Apply committed merchant/client changes to the affected rows only."""
+        changed = set()
+        deleted = False
+        renamed_clients = set()
+        for ev in events:
+            if ev.entity == 'merchant':
+                if ev.op == DELETE:
+                    deleted = self.rows.delete(ev.id) or deleted
+                else:
+                    changed.add(ev.id)
+            elif ev.op == UPDATE and self.client_sds_id is None:
+                # client_name column
+                renamed_clients.add(ev.id)
+        if len(changed) > PAGE_SIZE:
+            # a bulk import: re-paging is cheaper than row-by-row upserts
+            self.load()
+            return
+        if changed or renamed_clients:
+            ids = sorted(changed)
+            clients = sorted(renamed_clients)
+
+            def query():
+                refresh = set(ids)
+                for sds in clients:
+                    refresh.update(m['merchant_id'] for m in self.db.fetch_merchants_by_client(sds))
+                return self.db.fetch_merchants_by_ids(sorted(refresh))
+            self.loader.submit(self, query, lambda rows: self._apply_rows(ids, rows))
+        if deleted:
+            self._show_status()
+
+    def _apply_rows(self, ids, merchants):
+        found = set()
+        for m in merchants:
+            mid = m['merchant_id']
+            found.add(mid)
+            if self.client_sds_id is not None and m.get('client_sds_id') != self.client_sds_id:
+                self.rows.delete(mid)
+            elif not self._exhausted and self.rows.last_key is not None and self.rows.last_key < self._sort_key(m):
+                # beyond the pages loaded so far; load_more() will bring it in
+                self.rows.delete(mid)
+            else:
+                self.rows.upsert(m)
+        for mid in ids:
+            if mid not in found:
+                self.rows.delete(mid)
+        self._show_status()
+
+    def _on_load_error(self, ex):
+        self._loading = False
+        self.status.config(text=f"Load failed: {ex}")
+
+    def _on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if float(last) >= 1.0 and not self._exhausted:
+            self.after_idle(self.load_more)
 
     def add_popup(self):
         popup = tk.Toplevel(self)
@@ -64,13 +189,19 @@ class MerchantView(ttk.Frame):
         client_choice = None
         if self.client_sds_id is None:
             ttk.Label(popup, text='Client (select)').grid(row=2, column=0)
-            clients = self.db.fetch_all_clients()
-            client_ids = [str(c['sds_id']) for c in clients]
-            client_names = [f"{c['sds_id']} - {c['entity_name']}" for c in clients]
-            client_choice = ttk.Combobox(popup, values=client_names, state='readonly')
+            client_choice = ttk.Combobox(popup, values=(), state='disabled')
             client_choice.grid(row=2, column=1)
-            if client_names:
-                client_choice.current(0)
+            client_choice.set('Loading clients...')
+
+            def fill(clients):
+                client_names = [f"{c['sds_id']} - {c['entity_name']}" for c in clients]
+                client_choice.config(values=client_names, state='readonly')
+                client_choice.set('')
+                if client_names:
+                    client_choice.current(0)
+            # owned by the popup, so closing it drops the result
+            self.loader.submit(popup, self.db.fetch_all_clients, fill,
+                               lambda ex: client_choice.set(f"Load failed: {ex}"))
 
         def on_ok():
             nm = name.get().strip()
@@ -79,13 +210,11 @@ class MerchantView(ttk.Frame):
             code_val = code.get().strip() or None
             target_client = self.client_sds_id
             if self.client_sds_id is None:
-                sel = client_choice.get()
-                if not sel:
+                if client_choice.current() < 0:
                     messagebox.showerror('Error', 'Select client'); return
-                target_client = int(sel.split(' - ')[0])
+                target_client = int(client_choice.get().split(' - ')[0])
             self.db.insert_merchant(target_client, nm, code_val)
             popup.destroy()
-            self.load()
 
         ttk.Button(popup, text='OK', command=on_ok).grid(row=3, column=0, columnspan=2)
 
@@ -95,7 +224,12 @@ class MerchantView(ttk.Frame):
             messagebox.showinfo('Select', 'Select a merchant'); return
         vals = self.tree.item(sel[0], 'values')
         merchant_id = int(vals[0])
-        merchant = self.db.fetch_merchant_by_id(merchant_id)
+        # the popup opens once the current row has arrived
+        self.loader.submit(self, lambda: self.db.fetch_merchant_by_id(merchant_id),
+                           lambda merchant: self.edit_popup(merchant_id, merchant),
+                           lambda ex: messagebox.showerror('Error', f"Failed to load merchant: {ex}"), key='edit')
+
+    def edit_popup(self, merchant_id, merchant):
         if not merchant:
             messagebox.showerror('Error', 'Not found'); return
         popup = tk.Toplevel(self)
@@ -107,7 +241,7 @@ class MerchantView(ttk.Frame):
 
         def on_ok():
             self.db.update_merchant(merchant_id, {'merchant_name': name.get().strip(), 'merchant_code': code.get().strip()})
-            popup.destroy(); self.load()
+            popup.destroy()
         ttk.Button(popup, text='OK', command=on_ok).grid(row=2, column=0, columnspan=2)
 
     def delete_selected(self):
@@ -118,4 +252,3 @@ class MerchantView(ttk.Frame):
         merchant_id = int(vals[0])
         if messagebox.askyesno('Confirm', 'Delete merchant?'):
             self.db.delete_merchant(merchant_id)
-            self.load()
@@ -1,6 +1,10 @@
 # ui/ratesheet_view.py
 import tkinter as tk
 from tkinter import ttk, messagebox
+from config import PAGE_SIZE
+from db.events import DELETE, UPDATE
+from ui.keyed_tree import KeyedTree, Desc
+from ui.loader import get_loader
 
 class RatesheetView(ttk.Frame):
     """Shows ratesheets for a specific client and allows add/edit/delete."""
@@ -8,7 +12,16 @@ class RatesheetView(ttk.Frame):
         super().__init__(master)
         self.db = db
         self.client_sds_id = client_sds_id
+        self._after = None
+        self._exhausted = False
+        self._loading = False
+        self._total = 0
+        self.loader = get_loader(self)
         self._build()
+        # committed changes arrive on the writer's thread; hop to Tk to apply them
+        unsubscribe = db.subscribe(lambda events: self.loader.post(self, lambda: self._on_changes(events)),
+                                   entities=('ratesheet', 'merchant', 'client'))
+        self.bind('<Destroy>', lambda e: e.widget is self and unsubscribe(), add='+')
         self.load()
 
     def _build(self):
@@ -19,11 +32,19 @@ class RatesheetView(ttk.Frame):
         lbl.pack(anchor='w')
 
         cols = ('ratesheet_id','merchant_id','merchant_name','client_name','effective_date','expiry_date')
-        self.tree = ttk.Treeview(frm, columns=cols, show='headings', height=12)
+        body = ttk.Frame(frm)
+        body.pack(fill='both', expand=True, pady=6)
+        self.tree = ttk.Treeview(body, columns=cols, show='headings', height=12)
         for c in cols:
             self.tree.heading(c, text=c)
             self.tree.column(c, width=140)
-        self.tree.pack(fill='both', expand=True, pady=6)
+        self.vsb = ttk.Scrollbar(body, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.vsb.pack(side='right', fill='y')
+        self.rows = KeyedTree(self.tree, row_id=lambda rs: rs['ratesheet_id'], sort_key=self._sort_key, values=self._values)
+        self.status = ttk.Label(frm, text='')
+        self.status.pack(anchor='w')
 
         btns = ttk.Frame(frm)
         btns.pack(fill='x')
@@ -33,17 +54,126 @@ class RatesheetView(ttk.Frame):
 
     def load(self):
         print(f"[RatesheetView] load() called for client_sds_id={self.client_sds_id}")
-        for r in self.tree.get_children():
-            self.tree.delete(r)
+        # re-fetch at least what is shown, so the result can be diffed in
+        # place instead of rebuilding the tree
+        limit = max(PAGE_SIZE, len(self.rows))
+        self._after = None
+        self._exhausted = False
+        self._loading = True
+        self.status.config(text='Loading ratesheets...')
+        client_sds_id = self.client_sds_id
 
+        def query():
+            return (self.db.estimate_count('client_ratesheets', client_sds_id),
+                    self.db.fetch_ratesheets_page(limit=limit, client_sds_id=client_sds_id))
+        # key='page' supersedes any page still in flight from a previous load
+        self.loader.submit(self, query, lambda result: self._on_first_page(result, limit),
+                           self._on_load_error, key='page')
+
+    def _on_first_page(self, result, limit):
+        self._total, rates = result
+        self._loading = False
+        changed = self.rows.sync(rates)
+        print(f"[RatesheetView] reload: {changed}")
+        if rates:
+            self._after = (rates[-1]['effective_date'], rates[-1]['ratesheet_id'])
+        self._exhausted = len(rates) < limit
+        self._show_status()
+
+    def load_more(self):
+        """Fetch the next keyset page in the background; called when scrolled to the end."""
+        if self._exhausted or self._loading:
+            return
+        self._loading = True
+        after, client_sds_id = self._after, self.client_sds_id
+        self.loader.submit(
+            self, lambda: self.db.fetch_ratesheets_page(after=after, limit=PAGE_SIZE, client_sds_id=client_sds_id),
+            self._show_page, self._on_load_error, key='page'
+        )
+
+    @staticmethod
+    def _sort_key(rs):
+        # same order as fetch_ratesheets_page: newest effective_date first, undated last
+        eff = rs.get('effective_date')
+        return (eff is None, Desc(eff or ''), Desc(rs['ratesheet_id']))
+
+    def _values(self, rs):
         if self.client_sds_id is None:
-            rates = self.db.fetch_all_ratesheets()
-            for rs in rates:
-                self.tree.insert('', 'end', values=(rs['ratesheet_id'], rs.get('merchant_id'), rs.get('merchant_name'), rs.get('client_name'), rs.get('effective_date'), rs.get('expiry_date')))
-        else:
-            rates = self.db.fetch_ratesheets_by_client(self.client_sds_id)
-            for rs in rates:
-                self.tree.insert('', 'end', values=(rs['ratesheet_id'], rs.get('merchant_id'), '', '', rs.get('effective_date'), rs.get('expiry_date')))
+            return (rs['ratesheet_id'], rs.get('merchant_id'), rs.get('merchant_name'), rs.get('client_name'), rs.get('effective_date'), rs.get('expiry_date'))
+        return (rs['ratesheet_id'], rs.get('merchant_id'), '', '', rs.get('effective_date'), rs.get('expiry_date'))
+
+    def _show_page(self, rates):
+        self._loading = False
+        self.rows.extend(rates)
+        if rates:
+            self._after = (rates[-1]['effective_date'], rates[-1]['ratesheet_id'])
+        self._exhausted = len(rates) < PAGE_SIZE
+        self._show_status()
+
+    def _show_status(self):
+        shown = len(self.rows)
+        self.status.config(text=f"{shown} ratesheets" if self._exhausted else f"{shown} of ~{self._total} ratesheets")
+
+    # ---- change events ----
+    def _on_changes(self, events):
+        """Apply committed ratesheet changes (and merchant/client renames in
+        the global view) to the affected rows only."""
+        changed = set()
+        deleted = False
+        renamed = []
+        for ev in events:
+            if ev.entity == 'ratesheet':
+                if ev.op == DELETE:
+                    deleted = self.rows.delete(ev.id) or deleted
+                else:
+                    changed.add(ev.id)
+            elif ev.op == UPDATE and self.client_sds_id is None:
+                # merchant_name / client_name columns; merchant deletes
+                # arrive as ratesheet updates
+                renamed.append(ev)
+        if len(changed) > PAGE_SIZE:
+            # a bulk import: re-paging is cheaper than row-by-row upserts
+            self.load()
+            return
+        if changed or renamed:
+            ids = sorted(changed)
+
+            def query():
+                refresh = set(ids)
+                for ev in renamed:
+                    sheets = (self.db.fetch_ratesheets_by_merchant(ev.id) if ev.entity == 'merchant'
+                              else self.db.fetch_ratesheets_by_client(ev.id))
+                    refresh.update(rs['ratesheet_id'] for rs in sheets)
+                return self.db.fetch_ratesheets_by_ids(sorted(refresh))
+            self.loader.submit(self, query, lambda rows: self._apply_rows(ids, rows))
+        if deleted:
+            self._show_status()
+
+    def _apply_rows(self, ids, rates):
+        found = set()
+        for rs in rates:
+            rid = rs['ratesheet_id']
+            found.add(rid)
+            if self.client_sds_id is not None and rs.get('client_sds_id') != self.client_sds_id:
+                self.rows.delete(rid)
+            elif not self._exhausted and self.rows.last_key is not None and self.rows.last_key < self._sort_key(rs):
+                # beyond the pages loaded so far; load_more() will bring it in
+                self.rows.delete(rid)
+            else:
+                self.rows.upsert(rs)
+        for rid in ids:
+            if rid not in found:
+                self.rows.delete(rid)
+        self._show_status()
+
+    def _on_load_error(self, ex):
+        self._loading = False
+        self.status.config(text=f"Load failed: {ex}")
+
+    def _on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if float(last) >= 1.0 and not self._exhausted:
+            self.after_idle(self.load_more)
 
     def add_popup(self):
         popup = tk.Toplevel(self)
@@ -65,23 +195,29 @@ class RatesheetView(ttk.Frame):
         client_choice = None
         if self.client_sds_id is None:
             ttk.Label(popup, text='Client (select)').grid(row=4, column=0)
-            clients = self.db.fetch_all_clients()
-            client_names = [f"{c['sds_id']} - {c['entity_name']}" for c in clients]
-            client_choice = ttk.Combobox(popup, values=client_names, state='readonly')
+            client_choice = ttk.Combobox(popup, values=(), state='disabled')
             client_choice.grid(row=4, column=1)
-            if client_names:
-                client_choice.current(0)
+            client_choice.set('Loading clients...')
+
+            def fill(clients):
+                client_names = [f"{c['sds_id']} - {c['entity_name']}" for c in clients]
+                client_choice.config(values=client_names, state='readonly')
+                client_choice.set('')
+                if client_names:
+                    client_choice.current(0)
+            # owned by the popup, so closing it drops the result
+            self.loader.submit(popup, self.db.fetch_all_clients, fill,
+                               lambda ex: client_choice.set(f"Load failed: {ex}"))
 
         def on_ok():
             merchant_id = int(mid.get()) if mid.get().strip() else None
             target_client = self.client_sds_id
             if target_client is None:
-                sel = client_choice.get()
-                if not sel:
+                if client_choice.current() < 0:
                     messagebox.showerror('Error', 'Select client'); return
-                target_client = int(sel.split(' - ')[0])
+                target_client = int(client_choice.get().split(' - ')[0])
             self.db.insert_ratesheet(target_client, merchant_id, eff.get().strip(), exp.get().strip(), details.get().strip())
-            popup.destroy(); self.load()
+            popup.destroy()
 
         ttk.Button(popup, text='OK', command=on_ok).grid(row=5, column=0, columnspan=2)
 
@@ -91,7 +227,12 @@ class RatesheetView(ttk.Frame):
             messagebox.showinfo('Select', 'Select a ratesheet'); return
         vals = self.tree.item(sel[0], 'values')
         ratesheet_id = int(vals[0])
-        rs = self.db.fetch_ratesheet_by_id(ratesheet_id)
+        # the popup opens once the current row has arrived
+        self.loader.submit(self, lambda: self.db.fetch_ratesheet_by_id(ratesheet_id),
+                           lambda rs: self.edit_popup(ratesheet_id, rs),
+                           lambda ex: messagebox.showerror('Error', f"Failed to load ratesheet: {ex}"), key='edit')
+
+    def edit_popup(self, ratesheet_id, rs):
         if not rs:
             messagebox.showerror('Error', 'Not found'); return
         popup = tk.Toplevel(self)
@@ -113,7 +254,7 @@ class RatesheetView(ttk.Frame):
                 'rate_details': details.get().strip()
             }
             self.db.update_ratesheet(ratesheet_id, data)
-            popup.destroy(); self.load()
+            popup.destroy()
 
         ttk.Button(popup, text='OK', command=on_ok).grid(row=4, column=0, columnspan=2)
 
@@ -125,4 +266,3 @@ class RatesheetView(ttk.Frame):
         ratesheet_id = int(vals[0])
         if messagebox.askyesno('Confirm', 'Delete ratesheet?'):
             self.db.delete_ratesheet(ratesheet_id)
-            self.load()
@@ -0,0 +1,109 @@
+# ui/report_view.py
+import tkinter as tk
+from tkinter import ttk
+from config import PAGE_SIZE
+from db.reports import REPORTS
+from ui.loader import get_loader
+
+class ReportView(ttk.Frame):
+    """Runs one of db.reports.REPORTS and pages through its result.
+
+    Results are cached by the database's change sequence, so paging and
+    re-running are instant until data changes.
+    """
+    def __init__(self, master, db):
+        super().__init__(master)
+        self.db = db
+        self._offset = 0
+        self._total = 0
+        self.loader = get_loader(self)
+        self._build()
+        self.run()
+
+    def _build(self):
+        frm = ttk.Frame(self, padding=8)
+        frm.pack(fill='both', expand=True)
+
+        bar = ttk.Frame(frm)
+        bar.pack(fill='x')
+        ttk.Label(bar, text='Report').pack(side='left')
+        self.titles = {title: name for name, (title, _, _) in REPORTS.items()}
+        self.report_var = tk.StringVar(value=next(iter(self.titles)))
+        box = ttk.Combobox(bar, textvariable=self.report_var, values=list(self.titles), state='readonly', width=45)
+        box.pack(side='left', padx=6)
+        box.bind('<<ComboboxSelected>>', lambda e: self.run(reset=True))
+        ttk.Label(bar, text='Days').pack(side='left')
+        self.days_var = tk.StringVar()
+        self.days_ent = ttk.Entry(bar, textvariable=self.days_var, width=6)
+        self.days_ent.pack(side='left', padx=6)
+        self.days_ent.bind('<Return>', lambda e: self.run())
+        ttk.Button(bar, text='Run', command=self.run).pack(side='left')
+
+        body = ttk.Frame(frm)
+        body.pack(fill='both', expand=True, pady=6)
+        self.tree = ttk.Treeview(body, show='headings', height=15)
+        vsb = ttk.Scrollbar(body, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+
+        nav = ttk.Frame(frm)
+        nav.pack(fill='x')
+        self.prev_btn = ttk.Button(nav, text='< Prev', command=lambda: self.show_page(self._offset - PAGE_SIZE))
+        self.prev_btn.pack(side='left', padx=4)
+        self.next_btn = ttk.Button(nav, text='Next >', command=lambda: self.show_page(self._offset + PAGE_SIZE))
+        self.next_btn.pack(side='left', padx=4)
+        self.status = ttk.Label(nav, text='')
+        self.status.pack(side='left', padx=8)
+
+    @property
+    def name(self):
+        return self.titles[self.report_var.get()]
+
+    def run(self, reset=False):
+        """Show the first page; `reset` restores the report's default days."""
+        name = self.name
+        defaults = REPORTS[name][2]
+        if 'days' in defaults:
+            self.days_ent.config(state='normal')
+            if reset or not self.days_var.get().strip():
+                self.days_var.set(str(defaults['days']))
+        else:
+            self.days_var.set('')
+            self.days_ent.config(state='disabled')
+        self.show_page(0)
+
+    def show_page(self, offset):
+        name = self.name
+        params = {}
+        if 'days' in REPORTS[name][2]:
+            try:
+                params['days'] = int(self.days_var.get())
+            except ValueError:
+                self.status.config(text='Days must be a whole number')
+                return
+        offset = max(0, offset)
+        self.status.config(text='Running...')
+        # key='page' supersedes a page still in flight
+        self.loader.submit(self, lambda: self.db.report(name, offset=offset, limit=PAGE_SIZE, **params),
+                           self._show, lambda ex: self.status.config(text=f"Report failed: {ex}"), key='page')
+
+    def _show(self, page):
+        cols = page['columns']
+        if tuple(self.tree['columns']) != tuple(cols):
+            self.tree.delete(*self.tree.get_children())
+            self.tree.configure(columns=cols)
+            for c in cols:
+                self.tree.heading(c, text=c)
+                self.tree.column(c, width=120)
+        self.tree.delete(*self.tree.get_children())
+        for row in page['rows']:
+            self.tree.insert('', 'end', values=tuple('' if row[c] is None else row[c] for c in cols))
+        self._offset = page['offset']
+        self._total = page['total']
+        shown = len(page['rows'])
+        first = self._offset + 1 if shown else 0
+        self.prev_btn.config(state='normal' if self._offset > 0 else 'disabled')
+        self.next_btn.config(state='normal' if self._offset + shown < self._total else 'disabled')
+        source = 'cached' if page['cached'] else f"{page['elapsed_ms']:.0f} ms"
+        self.status.config(text=f"rows {first}-{self._offset + shown} of {self._total} ({source}, seq {page['seq']})")